@@ -22,6 +22,11 @@ app.conf.beat_schedule = {
         'schedule': crontab(minute='59', hour='23'),
         # This runs every day at 23:59
     },
+    'process-price-changes': {
+        'task': 'core.tasks.process_price_changes',
+        'schedule': 60.0,
+        # Price alerts for the shoes whose price dropped, every minute
+    },
 }
 
 
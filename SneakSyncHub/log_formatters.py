@@ -0,0 +1,25 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line, for filebeat to decode into the event.
+    Structured data is passed as `extra={"fields": {...}}` and merged
+    into the object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "@timestamp": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "log.level": record.levelname.lower(),
+            "log.logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["error.stack_trace"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
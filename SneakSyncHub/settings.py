@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "django_elasticsearch_dsl",
     "members",
     "core",
@@ -135,12 +136,33 @@ AUTH_PASSWORD_VALIDATORS = [
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "json": {
+            "()": "SneakSyncHub.log_formatters.JSONFormatter",
+        },
+    },
     "handlers": {
         "file": {
             "level": "DEBUG",
             "class": "logging.FileHandler",
             "filename": "logs/debug.log",
         },
+        # container stdout is what filebeat ships to Elasticsearch
+        "json_stdout": {
+            "level": "INFO",
+            "class": "logging.StreamHandler",
+            "stream": "ext://sys.stdout",
+            "formatter": "json",
+        },
+    },
+    "loggers": {
+        # one record per scraped article with the duration of every stage,
+        # see core.scraping.timing
+        "scrape_timing": {
+            "handlers": ["json_stdout"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
     "root": {
         "handlers": ["file"],
@@ -245,6 +267,121 @@ ELASTICSEARCH_DSL = {
     }
 }
 
+# Selenium driver pool, sessions are reused across scrapes
+NIKE_DRIVER_POOL_SIZE = env.int("NIKE_DRIVER_POOL_SIZE", default=2)
+# only used when the Adidas API fails, one session per degraded article
+ADIDAS_DRIVER_POOL_SIZE = env.int("ADIDAS_DRIVER_POOL_SIZE", default=1)
+DRIVER_POOL_LEASE_TIMEOUT = env.float("DRIVER_POOL_LEASE_TIMEOUT", default=30)
+DRIVER_POOL_MAX_USES = env.int("DRIVER_POOL_MAX_USES", default=50)
+DRIVER_POOL_MAX_IDLE = env.float("DRIVER_POOL_MAX_IDLE", default=240)
+
+# Selenium grid admission: sessions the grid runs at once (keep in line
+# with SE_NODE_MAX_SESSIONS), how long a new session may queue for a
+# slot, and after how many seconds without use a slot counts as
+# abandoned. Lower priorities are admitted first, e.g.
+# SELENIUM_GRID_BRAND_PRIORITY=Adidas=0,Nike=1; brands without one queue
+# at 0, first come first served
+SELENIUM_GRID_SLOTS = env.int("SELENIUM_GRID_SLOTS", default=3)
+SELENIUM_GRID_ADMISSION_TIMEOUT = env.float(
+    "SELENIUM_GRID_ADMISSION_TIMEOUT", default=20
+)
+SELENIUM_GRID_SLOT_TTL = env.float("SELENIUM_GRID_SLOT_TTL", default=300)
+SELENIUM_GRID_BRAND_PRIORITY = env.dict(
+    "SELENIUM_GRID_BRAND_PRIORITY", cast={"value": int}, default={}
+)
+
+# Lightweight browser profile for scraping sessions: no images, fonts,
+# media or trackers, a fixed small window and eager page loads
+SELENIUM_LIGHTWEIGHT_PROFILE = env.bool("SELENIUM_LIGHTWEIGHT_PROFILE", default=True)
+SELENIUM_WINDOW_SIZE = env.list("SELENIUM_WINDOW_SIZE", cast=int, default=[1280, 800])
+SELENIUM_BLOCKED_HOSTS = env.list(
+    "SELENIUM_BLOCKED_HOSTS",
+    default=[
+        "*.doubleclick.net",
+        "*.google-analytics.com",
+        "*.googletagmanager.com",
+        "*.googlesyndication.com",
+        "*.facebook.net",
+        "*.hotjar.com",
+        "*.optimizely.com",
+        "*.demdex.net",
+        "*.omtrdc.net",
+        "*.adobedtm.com",
+        "*.branch.io",
+        "*.qualtrics.com",
+        "*.nr-data.net",
+        "*.criteo.com",
+        "*.tiktok.com",
+        "*.pinterest.com",
+    ],
+)
+
+# Ceiling and polling interval of the page readiness waits
+PAGE_READY_TIMEOUT = env.float("PAGE_READY_TIMEOUT", default=10)
+PAGE_READY_POLL_INTERVAL = env.float("PAGE_READY_POLL_INTERVAL", default=0.1)
+
+# BeautifulSoup tree builder used for scraped pages: "lxml" or "html.parser"
+HTML_PARSER_BACKEND = env("HTML_PARSER_BACKEND", default="lxml")
+
+# Timeouts of the pooled JSON API sessions, in seconds
+API_CLIENT_CONNECT_TIMEOUT = env.float("API_CLIENT_CONNECT_TIMEOUT", default=5)
+API_CLIENT_READ_TIMEOUT = env.float("API_CLIENT_READ_TIMEOUT", default=15)
+# Threads sending the Adidas product info and availability requests
+ADIDAS_FETCH_WORKERS = env.int("ADIDAS_FETCH_WORKERS", default=8)
+
+# Scrape all requested brands at once and keep the first matching result.
+# Start delays hedge the expensive Selenium brands behind the API ones,
+# e.g. SCRAPING_BRAND_START_DELAYS=Adidas=0,Nike=2. Off unless enabled,
+# a fan-out can hold several of the grid's SE_NODE_MAX_SESSIONS slots
+# for one article
+SCRAPING_FANOUT = env.bool("SCRAPING_FANOUT", default=False)
+SCRAPING_FANOUT_WORKERS = env.int("SCRAPING_FANOUT_WORKERS", default=8)
+SCRAPING_BRAND_PRIORITY = env.list(
+    "SCRAPING_BRAND_PRIORITY", default=["Adidas", "Nike"]
+)
+SCRAPING_BRAND_START_DELAYS = env.dict(
+    "SCRAPING_BRAND_START_DELAYS",
+    cast={"value": float},
+    default={"Adidas": 0.0, "Nike": 2.0},
+)
+
+# Scraped product data is served from cache while fresh, and served stale
+# for another PRODUCT_CACHE_STALE_TTL seconds while it is scraped again
+PRODUCT_CACHE_FRESH_TTL = env.int("PRODUCT_CACHE_FRESH_TTL", default=600)
+PRODUCT_CACHE_STALE_TTL = env.int("PRODUCT_CACHE_STALE_TTL", default=3600)
+
+# Concurrent scrapes of the same article are coalesced into one, the
+# lease must outlast a slow Selenium scrape
+SCRAPE_SINGLE_FLIGHT_LEASE = env.int("SCRAPE_SINGLE_FLIGHT_LEASE", default=120)
+SCRAPE_SINGLE_FLIGHT_WAIT = env.int("SCRAPE_SINGLE_FLIGHT_WAIT", default=90)
+
+# Scrape jobs: how long a queued job absorbs requests for the same
+# article, and how long its subscribers may read the result
+SCRAPE_JOB_DEDUP_TTL = env.int("SCRAPE_JOB_DEDUP_TTL", default=300)
+SCRAPE_JOB_RESULT_TTL = env.int("SCRAPE_JOB_RESULT_TTL", default=86400)
+
+# Batch fetch endpoint: most articles per request, and how many of the
+# missing ones are scraped at the same time
+BATCH_SCRAPE_MAX_ARTICLES = env.int("BATCH_SCRAPE_MAX_ARTICLES", default=50)
+BATCH_SCRAPE_CONCURRENCY = env.int("BATCH_SCRAPE_CONCURRENCY", default=4)
+
+# Per-brand circuit breakers: failures in a row that open one, seconds
+# until a probe is let through, seconds a probe may take, and how many
+# recent scrapes the success rate and latency stats cover
+SCRAPER_BREAKER_FAILURE_THRESHOLD = env.int(
+    "SCRAPER_BREAKER_FAILURE_THRESHOLD", default=5
+)
+SCRAPER_BREAKER_OPEN_TIMEOUT = env.float("SCRAPER_BREAKER_OPEN_TIMEOUT", default=60)
+SCRAPER_BREAKER_PROBE_TIMEOUT = env.float("SCRAPER_BREAKER_PROBE_TIMEOUT", default=120)
+SCRAPER_BREAKER_WINDOW = env.int("SCRAPER_BREAKER_WINDOW", default=100)
+
+# Price change stream: entries kept (about), changes read per batch by
+# process_price_changes, and seconds after which changes read by a
+# worker that never acknowledged them go to another one
+PRICE_CHANGES_STREAM_MAXLEN = env.int("PRICE_CHANGES_STREAM_MAXLEN", default=100000)
+PRICE_CHANGES_BATCH_SIZE = env.int("PRICE_CHANGES_BATCH_SIZE", default=500)
+PRICE_CHANGES_CLAIM_IDLE = env.float("PRICE_CHANGES_CLAIM_IDLE", default=300)
+
 # settings.py
 CELERY_BROKER_URL = f'redis://{env("CELERY_HOST")}:6379/0'  # Redis broker URL
 CELERY_RESULT_BACKEND = f'redis://{env("CELERY_HOST")}:6379/0'  # Redis
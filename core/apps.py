@@ -1,5 +1,3 @@
-import importlib
-
 from django.apps import AppConfig
 from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
 from elasticsearch_dsl.connections import connections
@@ -11,9 +9,7 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import members.signals
-        from . import signals
 
-        importlib.import_module("core.signals")
         # Pass the Elasticsearch connections to the RealTimeSignalProcessor
         signal_processor = RealTimeSignalProcessor(connections=connections)
         # Set up signal processor to automatically handle model changes
@@ -0,0 +1,209 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from django.conf import settings
+from django.db import connection
+
+from core.benchmarks.stand_in import StandInSite, StandInWebDriver, load_fixture
+from core.redis_utils.circuit_breaker import CircuitBreaker
+from core.scraping import product_service
+from core.scraping.api_scrapers import AdidasProductScraper, NikeAPIScraper
+from core.scraping.driver_pool import DriverPool
+from core.scraping.selenium_scrapers import NikeProductScraper
+
+# articles the fixtures are written for, replaced by the benchmark ones
+FIXTURE_NIKE_ARTICLE = "FB9658-400"
+FIXTURE_ADIDAS_ARTICLE = "IF8068"
+NIKE_PRODUCT_PATH = f"/t/air-max-90-mens-shoes-6n3vKB/{FIXTURE_NIKE_ARTICLE}"
+
+
+class StandInScraping:
+    """
+    Points core.scraping at a StandInSite while entered.
+
+    The scrapers' URL templates lead to the site, the driver pools hand
+    out stand-in browsers instead of grid sessions, and the circuit
+    breakers are swapped for separate, reset ones, so a benchmark can't
+    trip the production breakers. Articles have to be added before they
+    are scraped, every one of them gets its own copy of the fixtures.
+    """
+
+    def __init__(
+            self, site: StandInSite, render_delay: float = 0.0, pool_size: int = 0
+    ) -> None:
+        self.site = site
+        self.render_delay = render_delay
+        self.pool_size = pool_size
+        self._nike_feed = load_fixture("nike_product_feed.json")
+        self._adidas_product = load_fixture("adidas_product.json")
+        self._adidas_availability = load_fixture("adidas_availability.json")
+        self._patched = []
+        self._pools: List[DriverPool] = []
+
+    def add_nike_article(self, article: str, in_feed: bool = True) -> None:
+        # the search and product pages are the same for every article,
+        # leaving it out of the feed sends NikeSetup down the Selenium path
+        if in_feed:
+            self.site.add_route(
+                f"/product_feed/threads/v2/{article}",
+                self._nike_feed.replace(
+                    FIXTURE_NIKE_ARTICLE.encode(), article.encode()
+                ),
+                "application/json",
+            )
+
+    def add_adidas_article(self, article: str) -> None:
+        for path, body in (
+                (f"/api/products/{article}", self._adidas_product),
+                (f"/api/products/{article}/availability", self._adidas_availability),
+        ):
+            self.site.add_route(
+                path,
+                body.replace(FIXTURE_ADIDAS_ARTICLE.encode(), article.encode()),
+                "application/json",
+            )
+
+    def __enter__(self) -> "StandInScraping":
+        base_url = self.site.base_url
+        for path, fixture in (
+                ("/w", "nike_search.html"),
+                (NIKE_PRODUCT_PATH, "nike_product.html"),
+        ):
+            self.site.add_route(
+                path,
+                load_fixture(fixture).replace(
+                    b"https://www.nike.com", base_url.encode()
+                ),
+                "text/html; charset=utf-8",
+            )
+
+        breakers = {}
+        for name, breaker in product_service.scraper_breakers.items():
+            breakers[name] = CircuitBreaker(
+                name=f"bench:{breaker.name}",
+                failure_threshold=breaker.failure_threshold,
+                open_timeout=breaker.open_timeout,
+                probe_timeout=breaker.probe_timeout,
+                window=breaker.window,
+            )
+            breakers[name].reset()
+
+        self._patch(
+            NikeAPIScraper,
+            "_SEARCH_URL_TEMPLATE",
+            f"{base_url}/product_feed/threads/v2/{{article}}",
+        )
+        self._patch(
+            NikeProductScraper,
+            "_SEARCH_URL_TEMPLATE",
+            f"{base_url}/w?q={{0}}&vst={{1}}",
+        )
+        self._patch(
+            AdidasProductScraper,
+            "_SEARCH_URL_TEMPLATE",
+            f"{base_url}/api/products/{{article}}",
+        )
+        self._patch(product_service, "scraper_breakers", breakers)
+        self._patch(
+            product_service,
+            "nike_driver_pool",
+            self._stand_in_pool(
+                "bench-nike",
+                settings.NIKE_DRIVER_POOL_SIZE,
+                warmup=NikeProductScraper.pass_country_gate,
+            ),
+        )
+        self._patch(
+            product_service,
+            "adidas_driver_pool",
+            self._stand_in_pool("bench-adidas", settings.ADIDAS_DRIVER_POOL_SIZE),
+        )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for target, name, original in reversed(self._patched):
+            setattr(target, name, original)
+        self._patched = []
+        for pool in self._pools:
+            pool.close()
+
+    def _patch(self, target, name: str, value) -> None:
+        self._patched.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def _stand_in_pool(self, name: str, size: int, warmup=None) -> DriverPool:
+        pool = DriverPool(
+            name=name,
+            size=self.pool_size or size,
+            lease_timeout=settings.DRIVER_POOL_LEASE_TIMEOUT,
+            max_uses=settings.DRIVER_POOL_MAX_USES,
+            max_idle=settings.DRIVER_POOL_MAX_IDLE,
+            driver_factory=lambda: StandInWebDriver(
+                self.render_delay, is_warm=False, base_url=self.site.base_url
+            ),
+            warmup=warmup,
+        )
+        self._pools.append(pool)
+        return pool
+
+
+@dataclass
+class LoadResult:
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    failures: int = 0
+    wall_time: float = 0.0
+
+    def percentile(self, percent: float) -> float:
+        if not self.latencies:
+            return 0.0
+        # nearest rank
+        ordered = sorted(self.latencies)
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.wall_time if self.wall_time else 0.0
+
+
+def run_load(
+        scrape: Callable[[str], bool], articles: List[str], concurrency: int
+) -> LoadResult:
+    """
+    Scrape every article with `concurrency` callers at once. `scrape`
+    returns whether the article came back right; latencies are kept for
+    the successful ones only.
+    """
+    result = LoadResult(concurrency=concurrency)
+    lock = threading.Lock()
+
+    def scrape_one(article: str) -> None:
+        started_at = time.perf_counter()
+        try:
+            succeeded = scrape(article)
+        except Exception as e:
+            print(f"Benchmark scrape of {article} failed: {e}")
+            succeeded = False
+        elapsed = time.perf_counter() - started_at
+        # the worker threads outlive the request cycle that would
+        # close their database connection
+        connection.close()
+
+        with lock:
+            if succeeded:
+                result.latencies.append(elapsed)
+            else:
+                result.failures += 1
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="bench-scrape"
+    ) as executor:
+        list(executor.map(scrape_one, articles))
+    result.wall_time = time.perf_counter() - started_at
+    return result
@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from selenium.common import NoSuchElementException
+
+# The fixtures are hand-written to the structure of the shop responses
+# the scrapers read, trimmed to the parts they use. They are not captures
+# of live responses, so sizes and timings measured against them compare
+# code paths, not real page weight.
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_fixture(name: str) -> bytes:
+    return (FIXTURES_DIR / name).read_bytes()
+
+
+class StandInSite:
+    """
+    Local HTTP server that serves the fixtures in place of the real
+    shop sites, with injectable latency and failures.
+
+    Routes are matched on the URL path only, query strings are ignored.
+    Unknown paths answer 404.
+    """
+
+    def __init__(
+            self,
+            latency: float = 0.0,
+            failure_rate: float = 0.0,
+            host: str = "127.0.0.1",
+            port: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._routes: Dict[str, Tuple[str, bytes]] = {}
+        self._lock = threading.Lock()
+        self.requests_served = 0
+        self.bytes_sent = 0
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_route(self, path: str, body: bytes, content_type: str) -> None:
+        self._routes[path] = (content_type, body)
+
+    def add_json(self, path: str, fixture: str) -> None:
+        self.add_route(path, load_fixture(fixture), "application/json")
+
+    def add_html(self, path: str, fixture: str) -> None:
+        self.add_route(path, load_fixture(fixture), "text/html; charset=utf-8")
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests_served = 0
+            self.bytes_sent = 0
+
+    def start(self) -> "StandInSite":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInSite":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if site.latency:
+                    time.sleep(site.latency)
+
+                route = site._routes.get(urlsplit(self.path).path)
+                if random.random() < site.failure_rate:
+                    status, content_type, body = 503, "text/plain", b"injected"
+                elif route is None:
+                    status, content_type, body = 404, "text/plain", b"not found"
+                else:
+                    status, (content_type, body) = 200, route
+
+                # counted before the client can see the response
+                with site._lock:
+                    site.requests_served += 1
+                    site.bytes_sent += len(body)
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                # every load is measured, browsers must not reuse responses
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class StandInBrowser:
+    """
+    The parts of a remote Selenium session the scrapers use, loading
+    pages over plain HTTP instead of through a browser.
+
+    Nothing is rendered: `render_delay` is added to every navigation in
+    place of the browser's own work, and an element counts as present
+    when its locator value appears in the page source. With `base_url`
+    set, every URL is loaded from that host instead, so hardcoded site
+    URLs end up on the stand-in too. Error responses are shown as pages,
+    like a browser does.
+    """
+
+    def __init__(
+            self, render_delay: float = 0.0, base_url: Optional[str] = None
+    ) -> None:
+        self.render_delay = render_delay
+        self.base_url = base_url
+        self.current_url = ""
+        self.page_source = ""
+
+    def get(self, url: str) -> None:
+        if self.base_url:
+            parts = urlsplit(url)
+            url = f"{self.base_url}{parts.path or '/'}"
+            if parts.query:
+                url = f"{url}?{parts.query}"
+        try:
+            with urlopen(url) as response:
+                self.page_source = response.read().decode()
+        except HTTPError as error:
+            self.page_source = error.read().decode()
+        if self.render_delay:
+            time.sleep(self.render_delay)
+        self.current_url = url
+
+    def find_element(self, by, value):
+        if value not in self.page_source:
+            raise NoSuchElementException(f"{by}={value}")
+        return self
+
+    def find_elements(self, by, value):
+        return [self] if value in self.page_source else []
+
+    def maximize_window(self) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+class StandInWebDriver:
+    """core.scraping.selenium_scrapers.WebDriver around a StandInBrowser."""
+
+    def __init__(
+            self,
+            render_delay: float = 0.0,
+            is_warm: bool = True,
+            base_url: Optional[str] = None,
+    ) -> None:
+        self.driver = StandInBrowser(render_delay, base_url)
+        self.is_warm = is_warm
+
+    def is_alive(self) -> bool:
+        return True
+
+    def mark_failed(self) -> None:
+        pass
+
+    def touch_grid_slot(self) -> None:
+        pass
+
+    def quit(self) -> None:
+        self.driver.quit()
@@ -5,6 +5,7 @@ from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
 from core.scraping.product_service import ProductService
+from core.scraping.scrape_jobs import user_group_name
 from restapi.serializers import ShoeSerializer
 
 
@@ -21,10 +22,24 @@ class MockRequest:
 class ScrapingConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
+        self.group_name = None
+        if self.user.is_authenticated:
+            # results of the user's scrape jobs are pushed to this group
+            self.group_name = user_group_name(self.user.id)
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
     async def disconnect(self, close_code):
-        pass
+        if self.group_name:
+            await self.channel_layer.group_discard(
+                self.group_name, self.channel_name
+            )
+
+    async def scrape_result(self, event):
+        """
+        Forward the result of a finished scrape job.
+        """
+        await self.send(text_data=json.dumps(event["payload"]))
 
     async def receive(self, text_data):
         """
@@ -6,6 +6,9 @@ from .models import Shoe
 
 @registry.register_document
 class ShoeDocument(Document):
+    # one exact term per size, for the size filter
+    sizes = fields.KeywordField(multi=True)
+
     class Index:
         name = 'shoes'
         settings = {
@@ -23,7 +26,6 @@ class ShoeDocument(Document):
             'description',
             'image',
             'article',
-            'sizes',
             'parsed_from',
             'created_at',
         ]
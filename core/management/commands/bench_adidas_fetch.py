@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.stand_in import StandInSite
+from core.scraping.api_scrapers import APIClient, AdidasProductScraper
+
+ARTICLE = "IF8068"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch Adidas product info and availability from a local stand-in "
+        "server with injected latency, one after the other and concurrently."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.3,
+            help="Seconds the stand-in server waits before every response",
+        )
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=10,
+            help="Lookups per mode",
+        )
+
+    def handle(self, *args, **options):
+        with StandInSite(latency=options["latency"]) as site:
+            site.add_json(f"/api/products/{ARTICLE}", "adidas_product.json")
+            site.add_json(
+                f"/api/products/{ARTICLE}/availability",
+                "adidas_availability.json",
+            )
+
+            class StandInAdidasScraper(AdidasProductScraper):
+                _SEARCH_URL_TEMPLATE = f"{site.base_url}/api/products/{{article}}"
+
+            api_client = APIClient(name="bench", referer=site.base_url)
+            scraper = StandInAdidasScraper(ARTICLE, api_client)
+
+            def sequential():
+                return scraper.fetch_product_info(), scraper.fetch_product_sizes()
+
+            # open the keep-alive connections before measuring
+            sequential()
+
+            results = {
+                "sequential": self.measure(sequential, options["articles"]),
+                "concurrent": self.measure(
+                    scraper.fetch_product_info_and_sizes, options["articles"]
+                ),
+            }
+            api_client.close()
+
+        for mode, seconds in results.items():
+            self.stdout.write(f"{mode:<12} {seconds * 1000:>8.1f} ms per article")
+
+        overlap = results["sequential"] / results["concurrent"]
+        self.stdout.write(f"speedup: {overlap:.2f}x")
+        if results["concurrent"] >= 1.5 * options["latency"]:
+            raise CommandError(
+                "Concurrent fetch took longer than one and a half round "
+                "trips, the requests did not overlap"
+            )
+
+    @staticmethod
+    def measure(fetch, articles: int) -> float:
+        started_at = time.perf_counter()
+        for _ in range(articles):
+            product_info, product_sizes = fetch()
+            if product_info.get("id") != ARTICLE or not product_sizes.get(
+                    "variation_list"
+            ):
+                raise CommandError("Stand-in server returned unexpected data")
+        return (time.perf_counter() - started_at) / articles
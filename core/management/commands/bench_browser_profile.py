@@ -0,0 +1,131 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from core.benchmarks.stand_in import StandInSite, load_fixture
+from core.scraping.selenium_scrapers import WebDriver
+
+PAGE_PATH = "/t/air-max-90-mens-shoes-6n3vKB/FB9658-400"
+GALLERY_IMAGES = 6
+
+# what a product page pulls in besides its markup, roughly nike.com sized
+HEAVY_MARKUP = "".join(
+    [
+        '<link rel="stylesheet" href="/assets/fonts.css">',
+        '<video src="/assets/promo.mp4" autoplay muted preload="auto"></video>',
+        *(
+            f'<img src="/assets/gallery-{index}.jpg" width="600" alt="">'
+            for index in range(GALLERY_IMAGES)
+        ),
+    ]
+).encode()
+FONTS_CSS = (
+    b"@font-face { font-family: BenchFont; src: url(/assets/font.woff2); }"
+    b" body { font-family: BenchFont, sans-serif; }"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the Nike product page fixture with its images, font and video "
+        "from a local stand-in server through the Selenium grid, with the "
+        "full and the lightweight browser profile, and compare page-load "
+        "time and bytes transferred. The grid's browsers must be able to "
+        "reach the stand-in, see --site-url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            default="0.0.0.0",
+            help="Address the stand-in server listens on",
+        )
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--site-url",
+            default=None,
+            help="Stand-in URL as seen from the grid, e.g. "
+                 "http://host.docker.internal:8765; http://<host>:<port> "
+                 "by default",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Seconds the stand-in server waits before every response",
+        )
+        parser.add_argument(
+            "--loads",
+            type=int,
+            default=5,
+            help="Page loads per profile",
+        )
+
+    def handle(self, *args, **options):
+        site_url = options["site_url"] or f"http://{options['host']}:{options['port']}"
+
+        with StandInSite(
+                latency=options["latency"], host=options["host"], port=options["port"]
+        ) as site:
+            site.add_route(
+                PAGE_PATH,
+                load_fixture("nike_product.html").replace(
+                    b"</main>", HEAVY_MARKUP + b"</main>"
+                ),
+                "text/html; charset=utf-8",
+            )
+            site.add_route("/assets/fonts.css", FONTS_CSS, "text/css")
+            site.add_route("/assets/font.woff2", os.urandom(120 * 1024), "font/woff2")
+            site.add_route("/assets/promo.mp4", os.urandom(3 * 1024 * 1024), "video/mp4")
+            for index in range(GALLERY_IMAGES):
+                site.add_route(
+                    f"/assets/gallery-{index}.jpg",
+                    os.urandom(250 * 1024),
+                    "image/jpeg",
+                )
+
+            results = {
+                profile: self.measure(
+                    site, f"{site_url}{PAGE_PATH}", lightweight, options["loads"]
+                )
+                for profile, lightweight in (("full", False), ("lightweight", True))
+            }
+
+        for profile, (seconds, requests, sent) in results.items():
+            self.stdout.write(
+                f"{profile:<12} {seconds * 1000:>8.1f} ms "
+                f"{requests:>5.1f} requests {sent / 1024:>8.1f} KiB per page load"
+            )
+        full, lightweight = results["full"], results["lightweight"]
+        self.stdout.write(
+            f"page load: {lightweight[0] / full[0]:.0%} of full, "
+            f"bytes: {lightweight[2] / full[2]:.0%} of full"
+        )
+        if lightweight[2] >= full[2]:
+            raise CommandError(
+                "The lightweight profile transferred no less than the full one"
+            )
+
+    @staticmethod
+    def measure(site, page_url, lightweight, loads):
+        web_driver = WebDriver(lightweight=lightweight)
+        try:
+            # the session itself is not what is measured
+            web_driver.driver.get(page_url)
+            site.reset_counters()
+
+            started_at = time.perf_counter()
+            for _ in range(loads):
+                web_driver.driver.get(page_url)
+                WebDriverWait(web_driver.driver, 10).until(
+                    EC.presence_of_element_located((By.ID, "price-container"))
+                )
+            seconds = (time.perf_counter() - started_at) / loads
+        finally:
+            web_driver.quit()
+
+        return seconds, site.requests_served / loads, site.bytes_sent / loads
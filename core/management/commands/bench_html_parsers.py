@@ -0,0 +1,82 @@
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.scraping.selenium_scrapers import BSManager
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse a corpus of saved Nike search and product pages with every "
+        "HTML parser backend and report parse time and peak memory per page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "corpus",
+            help="Directory with saved pages (*.html), e.g. search_*.html "
+                 "and product_*.html",
+        )
+        parser.add_argument(
+            "--backends",
+            nargs="+",
+            default=list(BSManager.PARSER_BACKENDS),
+            help="Parser backends to compare",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Parses per page and backend, the average time is reported",
+        )
+
+    def handle(self, *args, **options):
+        pages = sorted(Path(options["corpus"]).glob("*.html"))
+        if not pages:
+            raise CommandError(f"No *.html pages found in {options['corpus']}")
+
+        self.stdout.write(
+            f"{'page':<40} {'backend':<12} {'size KB':>8} "
+            f"{'avg ms':>8} {'peak MB':>8}"
+        )
+        totals = {backend: [0.0, 0.0] for backend in options["backends"]}
+
+        for page in pages:
+            page_source = page.read_text(encoding="utf-8", errors="ignore")
+            for backend in options["backends"]:
+                avg_ms = self.time_parse(page_source, backend, options["repeat"])
+                peak_mb = self.peak_memory(page_source, backend)
+                totals[backend][0] += avg_ms
+                totals[backend][1] = max(totals[backend][1], peak_mb)
+                self.stdout.write(
+                    f"{page.name:<40} {backend:<12} "
+                    f"{len(page_source) / 1024:>8.1f} "
+                    f"{avg_ms:>8.2f} {peak_mb:>8.2f}"
+                )
+
+        self.stdout.write("")
+        for backend, (total_ms, peak_mb) in totals.items():
+            self.stdout.write(
+                f"{backend}: {total_ms / len(pages):.2f} ms per page on "
+                f"average, {peak_mb:.2f} MB max peak"
+            )
+
+    @staticmethod
+    def time_parse(page_source: str, backend: str, repeat: int) -> float:
+        started_at = time.perf_counter()
+        for _ in range(repeat):
+            BSManager.get_parsed_page(page_source, parser=backend)
+        return (time.perf_counter() - started_at) * 1000 / repeat
+
+    @staticmethod
+    def peak_memory(page_source: str, backend: str) -> float:
+        tracemalloc.start()
+        try:
+            soup = BSManager.get_parsed_page(page_source, parser=backend)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del soup
+        return peak / (1024 * 1024)
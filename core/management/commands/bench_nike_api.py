@@ -0,0 +1,118 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.stand_in import StandInSite, StandInWebDriver, load_fixture
+from core.scraping.api_scrapers import APIClient, NikeAPIScraper, NikeAPIParser
+from core.scraping.selenium_scrapers import NikeProductScraper, NikeProductParser
+
+ARTICLE = "FB9658-400"
+PRODUCT_PATH = f"/t/air-max-90-mens-shoes-6n3vKB/{ARTICLE}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Scrape a Nike article from a local stand-in server through the "
+        "product feed API and through the Selenium pages, and compare "
+        "latency and bytes transferred."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.3,
+            help="Seconds the stand-in server waits before every response",
+        )
+        parser.add_argument(
+            "--render-delay",
+            type=float,
+            default=0.0,
+            help="Seconds added to every page load of the Selenium path in "
+                 "place of browser rendering, which the stand-in doesn't do",
+        )
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=10,
+            help="Scrapes per path",
+        )
+
+    def handle(self, *args, **options):
+        with StandInSite(latency=options["latency"]) as site:
+            site.add_json("/product_feed/threads/v2", "nike_product_feed.json")
+            # links on the fixture pages have to lead back to the stand-in
+            for path, fixture in (
+                    ("/w", "nike_search.html"),
+                    (PRODUCT_PATH, "nike_product.html"),
+            ):
+                site.add_route(
+                    path,
+                    load_fixture(fixture).replace(
+                        b"https://www.nike.com", site.base_url.encode()
+                    ),
+                    "text/html; charset=utf-8",
+                )
+
+            class StandInNikeAPIScraper(NikeAPIScraper):
+                _SEARCH_URL_TEMPLATE = (
+                    f"{site.base_url}/product_feed/threads/v2"
+                    "?filter=productInfo.merchProduct.styleColor({article})"
+                )
+
+            class StandInNikeProductScraper(NikeProductScraper):
+                _SEARCH_URL_TEMPLATE = f"{site.base_url}/w?q={{0}}&vst={{1}}"
+
+            api_client = APIClient(name="bench", referer=site.base_url)
+
+            def scrape_api():
+                product_feed = StandInNikeAPIScraper(
+                    ARTICLE, api_client
+                ).fetch_product_feed()
+                return NikeAPIParser(ARTICLE, product_feed).get_product_data()
+
+            def scrape_selenium():
+                # a warm pooled session, the country gate is already passed
+                driver = StandInWebDriver(options["render_delay"])
+                scraper = StandInNikeProductScraper(driver, ARTICLE)
+                return NikeProductParser(
+                    article=ARTICLE,
+                    driver=driver,
+                    scraped_pages=scraper.scraped_pages,
+                ).get_product_data()
+
+            # open the keep-alive connection before measuring
+            scrape_api()
+
+            results = {}
+            for path, scrape in (("api", scrape_api), ("selenium", scrape_selenium)):
+                site.reset_counters()
+                seconds = self.measure(scrape, options["articles"])
+                results[path] = (
+                    seconds,
+                    site.requests_served / options["articles"],
+                    site.bytes_sent / options["articles"],
+                )
+            api_client.close()
+
+        for path, (seconds, requests, sent) in results.items():
+            self.stdout.write(
+                f"{path:<10} {seconds * 1000:>8.1f} ms "
+                f"{requests:>4.1f} requests {sent / 1024:>8.1f} KiB per article"
+            )
+        self.stdout.write(
+            f"speedup: {results['selenium'][0] / results['api'][0]:.2f}x"
+        )
+
+    @staticmethod
+    def measure(scrape, articles: int) -> float:
+        started_at = time.perf_counter()
+        for _ in range(articles):
+            product_data = scrape()
+            if (
+                    not product_data
+                    or product_data["article"] != ARTICLE
+                    or not product_data["sizes"]
+            ):
+                raise CommandError(f"Unexpected product data: {product_data}")
+        return (time.perf_counter() - started_at) / articles
@@ -0,0 +1,74 @@
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.scraping.selenium_scrapers import BSManager, NikeProductParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare full and region-limited parsing of saved Nike pages: "
+        "tree size and peak memory per page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "corpus",
+            help="Directory with saved pages, search_*.html are treated as "
+                 "search result pages, every other *.html as product pages",
+        )
+        parser.add_argument(
+            "--backend",
+            default=None,
+            help="Parser backend, defaults to HTML_PARSER_BACKEND",
+        )
+
+    def handle(self, *args, **options):
+        pages = sorted(Path(options["corpus"]).glob("*.html"))
+        if not pages:
+            raise CommandError(f"No *.html pages found in {options['corpus']}")
+
+        self.stdout.write(
+            f"{'page':<40} {'nodes full':>10} {'nodes part':>10} "
+            f"{'MB full':>8} {'MB part':>8}"
+        )
+        total_full, total_partial = 0.0, 0.0
+
+        for page in pages:
+            page_source = page.read_text(encoding="utf-8", errors="ignore")
+            regions = (
+                NikeProductParser.SEARCH_PAGE_REGIONS
+                if page.name.startswith("search")
+                else NikeProductParser.PRODUCT_PAGE_REGIONS
+            )
+            full_nodes, full_mb = self.measure(page_source, options["backend"])
+            partial_nodes, partial_mb = self.measure(
+                page_source, options["backend"], regions
+            )
+            total_full += full_mb
+            total_partial += partial_mb
+            self.stdout.write(
+                f"{page.name:<40} {full_nodes:>10} {partial_nodes:>10} "
+                f"{full_mb:>8.2f} {partial_mb:>8.2f}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"average peak per page: full {total_full / len(pages):.2f} MB, "
+            f"partial {total_partial / len(pages):.2f} MB"
+        )
+
+    @staticmethod
+    def measure(page_source: str, backend, parse_only=None):
+        # peak memory while building the tree and the number of nodes kept
+        tracemalloc.start()
+        try:
+            soup = BSManager.get_parsed_page(
+                page_source, parser=backend, parse_only=parse_only
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        nodes = sum(1 for _ in soup.descendants)
+        return nodes, peak / (1024 * 1024)
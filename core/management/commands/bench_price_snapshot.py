@@ -0,0 +1,144 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from core.models import Shoe, ShoePriceHistory, ShoePriceRollup
+from core.tasks import update_price_history
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the daily price snapshot written shoe by shoe with "
+        "update_price_history at several catalog sizes. update_price_history "
+        "is timed for the first run, which starts a price run for every "
+        "shoe, a rerun the same day, and the next day with some prices "
+        "changed. Every size runs in a transaction that is rolled back, "
+        "nothing is left in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shoes",
+            default="10000,100000,1000000",
+            help="Comma separated catalog sizes",
+        )
+        parser.add_argument(
+            "--changed",
+            type=float,
+            default=5,
+            help="Percentage of prices changed for the next day",
+        )
+        parser.add_argument(
+            "--loop-limit",
+            type=int,
+            default=100000,
+            help="Largest catalog the shoe by shoe loop is timed for, it "
+                 "takes minutes beyond that",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["shoes"].split(",")]
+
+        # the loop wrote every shoe every day, so it is compared with both
+        # the first run and a following day of update_price_history
+        self.stdout.write(
+            f"{'shoes':>9} {'loop s':>9} {'first s':>9} {'rerun s':>9} "
+            f"{'next s':>9} {'started':>9} {'rows':>9} {'rollups':>9} "
+            f"{'vs first':>9} {'vs next':>9}"
+        )
+        for size in sizes:
+            with transaction.atomic():
+                (
+                    loop_seconds,
+                    first_seconds,
+                    rerun_seconds,
+                    next_seconds,
+                    started,
+                ) = self.measure(
+                    size, options["changed"], size <= options["loop_limit"]
+                )
+                rows = ShoePriceHistory.objects.count()
+                rollups = ShoePriceRollup.objects.count()
+                transaction.set_rollback(True)
+
+            if loop_seconds is None:
+                loop, vs_first, vs_next = "-", "-", "-"
+            else:
+                loop = f"{loop_seconds:.3f}"
+                vs_first = f"{loop_seconds / first_seconds:.1f}x"
+                vs_next = f"{loop_seconds / next_seconds:.1f}x"
+            self.stdout.write(
+                f"{size:>9} {loop:>9} {first_seconds:>9.3f} "
+                f"{rerun_seconds:>9.3f} {next_seconds:>9.3f} {started:>9} "
+                f"{rows:>9} {rollups:>9} {vs_first:>9} {vs_next:>9}"
+            )
+
+    def measure(self, size, changed, run_loop):
+        self.create_shoes(size)
+        # shoes already in the database are recorded as well
+        ShoePriceHistory.objects.all().delete()
+        ShoePriceRollup.objects.all().delete()
+
+        loop_seconds = None
+        if run_loop:
+            started_at = time.perf_counter()
+            self.snapshot_with_loop(date.today())
+            loop_seconds = time.perf_counter() - started_at
+            ShoePriceHistory.objects.all().delete()
+
+        started_at = time.perf_counter()
+        update_price_history()
+        first_seconds = time.perf_counter() - started_at
+
+        # a rerun on the same day has nothing to add
+        started_at = time.perf_counter()
+        update_price_history()
+        rerun_seconds = time.perf_counter() - started_at
+
+        # the runs started yesterday, and some prices changed since
+        ShoePriceHistory.objects.update(valid_from=F("valid_from") - timedelta(days=1))
+        step = max(round(100 / changed), 1) if changed else None
+        if step:
+            Shoe.objects.annotate(position=F("pk") % step).filter(position=0).update(
+                price=F("price") + 1
+            )
+
+        started_at = time.perf_counter()
+        started = update_price_history()
+        next_seconds = time.perf_counter() - started_at
+
+        return loop_seconds, first_seconds, rerun_seconds, next_seconds, started
+
+    @staticmethod
+    def snapshot_with_loop(today):
+        # update_price_history as it was, one INSERT per shoe
+        for shoe in Shoe.objects.all():
+            ShoePriceHistory.objects.create(
+                shoe=shoe, price=shoe.price, valid_from=today
+            )
+
+    @staticmethod
+    def create_shoes(size):
+        for start in range(0, size, BATCH_SIZE):
+            Shoe.objects.bulk_create(
+                [
+                    Shoe(
+                        name=f"Benchmark shoe {number}",
+                        price=Decimal("100.00") + number % 100,
+                        url=f"https://www.example.com/shoes/{number}",
+                        image=f"https://www.example.com/shoes/{number}.png",
+                        article=f"BENCH-{number}",
+                        sizes=["42", "43"],
+                        parsed_from="Benchmark",
+                        description="",
+                    )
+                    for number in range(start, min(start + BATCH_SIZE, size))
+                ],
+                batch_size=BATCH_SIZE,
+            )
@@ -0,0 +1,172 @@
+import uuid
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework import status
+
+from core.benchmarks.scraping import StandInScraping, run_load
+from core.benchmarks.stand_in import StandInSite
+from core.models import Shoe
+from core.scraping.product_service import AdidasSetup, NikeSetup, ProductService
+from members.models import CustomUser, UserProfile
+
+TARGETS = ("nike", "adidas", "process")
+
+
+class Command(BaseCommand):
+    help = (
+        "Scrape articles end to end from a local stand-in of nike.com, "
+        "adidas.com and the Selenium grid, and report p50/p95/p99 latency "
+        "and articles per second at several concurrency levels."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.1,
+            help="Seconds the stand-in server waits before every response",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.0,
+            help="Share of stand-in responses that fail with a 503",
+        )
+        parser.add_argument(
+            "--render-delay",
+            type=float,
+            default=0.0,
+            help="Seconds added to every stand-in browser page load in place "
+                 "of rendering",
+        )
+        parser.add_argument(
+            "--concurrency",
+            default="1,4,8",
+            help="Comma separated numbers of concurrent scrapes",
+        )
+        parser.add_argument(
+            "--articles",
+            type=int,
+            default=20,
+            help="Articles scraped per target and concurrency level",
+        )
+        parser.add_argument(
+            "--targets",
+            default=",".join(TARGETS),
+            help="Comma separated targets: nike (NikeSetup), adidas "
+                 "(AdidasSetup), process (ProductService.process_scraping, "
+                 "including the database writes)",
+        )
+        parser.add_argument(
+            "--nike-path",
+            choices=("api", "selenium"),
+            default="api",
+            help="Serve Nike articles from the product feed, or leave them "
+                 "out of it so NikeSetup falls back to the Selenium pages",
+        )
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=0,
+            help="Size of the stand-in driver pools, the configured sizes "
+                 "when 0",
+        )
+
+    def handle(self, *args, **options):
+        targets = options["targets"].split(",")
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+        levels = [int(level) for level in options["concurrency"].split(",")]
+
+        # every run scrapes new articles, the product cache must not
+        # answer for the scrapers
+        run_id = uuid.uuid4().hex[:6].upper()
+        scraped_articles = []
+
+        self.stdout.write(
+            f"{'target':<8} {'conc':>4} {'ok':>4} {'fail':>4} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'art/s':>7}"
+        )
+        with StandInSite(
+                latency=options["latency"], failure_rate=options["failure_rate"]
+        ) as site, StandInScraping(
+            site,
+            render_delay=options["render_delay"],
+            pool_size=options["pool_size"],
+        ) as scraping, override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False):
+            user_profile = self.create_bench_user(run_id)
+            try:
+                for target in targets:
+                    for level in levels:
+                        articles = [
+                            f"BN{run_id}-{target[:2].upper()}{level}-{i}"
+                            for i in range(options["articles"])
+                        ]
+                        scraped_articles += articles
+                        scrape = self.prepare_target(
+                            target, articles, scraping, options, user_profile
+                        )
+                        result = run_load(scrape, articles, level)
+                        self.stdout.write(
+                            f"{target:<8} {level:>4} {len(result.latencies):>4} "
+                            f"{result.failures:>4} "
+                            f"{result.percentile(50) * 1000:>8.1f} "
+                            f"{result.percentile(95) * 1000:>8.1f} "
+                            f"{result.percentile(99) * 1000:>8.1f} "
+                            f"{result.throughput:>7.2f}"
+                        )
+            finally:
+                Shoe.objects.filter(article__in=scraped_articles).delete()
+                user_profile.user.delete()
+
+    def prepare_target(self, target, articles, scraping, options, user_profile):
+        in_feed = options["nike_path"] == "api"
+
+        if target == "nike":
+            for article in articles:
+                scraping.add_nike_article(article, in_feed=in_feed)
+            return lambda article: self.matches(
+                NikeSetup(article).initialize_parser().get_product_data(), article
+            )
+
+        if target == "adidas":
+            for article in articles:
+                scraping.add_adidas_article(article)
+            return lambda article: self.matches(
+                AdidasSetup(article).initialize_parser().get_product_data(), article
+            )
+
+        # half of the articles of each brand, each looked up at its own
+        # brand only
+        brands = {}
+        for index, article in enumerate(articles):
+            if index % 2:
+                scraping.add_nike_article(article, in_feed=in_feed)
+                brands[article] = "Nike"
+            else:
+                scraping.add_adidas_article(article)
+                brands[article] = "Adidas"
+
+        def process(article):
+            request = SimpleNamespace(
+                user=user_profile.user, data={"parse_from": brands[article]}
+            )
+            _, _, status_code = ProductService.process_scraping(article, request)
+            return status_code == status.HTTP_200_OK
+
+        return process
+
+    @staticmethod
+    def matches(product_data, article) -> bool:
+        return bool(product_data) and product_data["article"] == article
+
+    @staticmethod
+    def create_bench_user(run_id) -> UserProfile:
+        user = CustomUser.objects.create_user(
+            email=f"scraping-bench-{run_id.lower()}@localhost"
+        )
+        user_profile, _ = UserProfile.objects.get_or_create(user=user)
+        return user_profile
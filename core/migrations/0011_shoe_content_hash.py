@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_alter_shoesnews_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoe",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:00
+
+import ast
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def parse_sizes(text):
+    # sizes were stored as the str() of the scraped list, "['40', '40.5']"
+    try:
+        sizes = ast.literal_eval(text or "[]")
+    except (ValueError, SyntaxError):
+        return []
+    if not isinstance(sizes, (list, tuple)):
+        return []
+    return [str(size) for size in sizes]
+
+
+def sizes_to_array(apps, schema_editor):
+    Shoe = apps.get_model("core", "Shoe")
+    last_pk = 0
+    while True:
+        batch = list(
+            Shoe.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "sizes")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for shoe in batch:
+            shoe.sizes_array = parse_sizes(shoe.sizes)
+        Shoe.objects.bulk_update(batch, ["sizes_array"])
+        last_pk = batch[-1].pk
+
+
+def sizes_to_text(apps, schema_editor):
+    Shoe = apps.get_model("core", "Shoe")
+    last_pk = 0
+    while True:
+        batch = list(
+            Shoe.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "sizes_array")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for shoe in batch:
+            shoe.sizes = str(shoe.sizes_array or [])
+        Shoe.objects.bulk_update(batch, ["sizes"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_shoe_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoe",
+            name="sizes_array",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=10),
+                blank=True,
+                default=list,
+                size=None,
+            ),
+        ),
+        # reversing needs the text column back before the data is copied
+        migrations.AlterField(
+            model_name="shoe",
+            name="sizes",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.RunPython(sizes_to_array, sizes_to_text),
+        migrations.RemoveField(
+            model_name="shoe",
+            name="sizes",
+        ),
+        migrations.RenameField(
+            model_name="shoe",
+            old_name="sizes_array",
+            new_name="sizes",
+        ),
+        migrations.AddIndex(
+            model_name="shoe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["sizes"], name="core_shoe_sizes_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_snapshots(apps, schema_editor):
+    # reruns of the daily job left several snapshots for the same day,
+    # the last one recorded is kept
+    ShoePriceHistory = apps.get_model("core", "ShoePriceHistory")
+    duplicates = (
+        ShoePriceHistory.objects.values("shoe", "date_recorded")
+        .annotate(snapshots=Count("pk"), last_pk=Max("pk"))
+        .filter(snapshots__gt=1)
+    )
+    for duplicate in duplicates:
+        ShoePriceHistory.objects.filter(
+            shoe=duplicate["shoe"], date_recorded=duplicate["date_recorded"]
+        ).exclude(pk=duplicate["last_pk"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_shoe_sizes_array"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_snapshots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="shoepricehistory",
+            constraint=models.UniqueConstraint(
+                fields=("shoe", "date_recorded"), name="unique_shoe_price_per_day"
+            ),
+        ),
+    ]
@@ -0,0 +1,174 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Consecutive snapshots of the same price collapse into the first one,
+# which becomes a run lasting until the next snapshot of another price
+COMPACT_SNAPSHOTS = """
+DELETE FROM core_shoepricehistory AS history
+USING (
+    SELECT id,
+           price IS NOT DISTINCT FROM LAG(price) OVER (
+               PARTITION BY shoe_id ORDER BY date_recorded
+           ) AS repeated
+    FROM core_shoepricehistory
+) AS snapshots
+WHERE history.id = snapshots.id AND snapshots.repeated;
+
+UPDATE core_shoepricehistory AS history
+SET valid_from = runs.date_recorded, valid_to = runs.next_start
+FROM (
+    SELECT id, date_recorded,
+           LEAD(date_recorded) OVER (
+               PARTITION BY shoe_id ORDER BY date_recorded
+           ) AS next_start
+    FROM core_shoepricehistory
+) AS runs
+WHERE history.id = runs.id;
+"""
+
+# Runs expand back into a snapshot per day, the current ones up to today
+EXPAND_RUNS = """
+UPDATE core_shoepricehistory SET date_recorded = valid_from;
+
+INSERT INTO core_shoepricehistory (shoe_id, price, date_recorded)
+SELECT history.shoe_id, history.price, days.day::date
+FROM core_shoepricehistory AS history
+CROSS JOIN LATERAL generate_series(
+    (history.valid_from + 1)::timestamp,
+    (COALESCE(history.valid_to, CURRENT_DATE + 1) - 1)::timestamp,
+    '1 day'::interval
+) AS days (day)
+WHERE history.valid_from IS NOT NULL;
+
+-- the deferred foreign key checks of the new rows would keep the next
+-- operations from altering the table
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+# Every weekly and monthly rollup of the compacted history, the same
+# statement as core.tasks.ROLLUP_SQL run over all of it
+BUILD_ROLLUPS = """
+INSERT INTO core_shoepricerollup
+    (shoe_id, period, period_start, min_price, max_price, close_price)
+SELECT history.shoe_id, periods.period, periods.period_start::date,
+       MIN(history.price), MAX(history.price),
+       (ARRAY_AGG(history.price ORDER BY history.valid_from DESC))[1]
+FROM core_shoepricehistory AS history
+CROSS JOIN (VALUES ('week'), ('month')) AS kinds (period)
+CROSS JOIN LATERAL (
+    SELECT kinds.period, period_start
+    FROM generate_series(
+        date_trunc(kinds.period, history.valid_from::timestamp),
+        date_trunc(
+            kinds.period,
+            LEAST(COALESCE(history.valid_to - 1, CURRENT_DATE), CURRENT_DATE)::timestamp
+        ),
+        ('1 ' || kinds.period)::interval
+    ) AS period_start
+) AS periods
+WHERE history.valid_from <= CURRENT_DATE
+GROUP BY history.shoe_id, periods.period, periods.period_start;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_shoepricehistory_unique_shoe_price_per_day"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoepricehistory",
+            name="valid_from",
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name="shoepricehistory",
+            name="valid_to",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RemoveConstraint(
+            model_name="shoepricehistory",
+            name="unique_shoe_price_per_day",
+        ),
+        # nullable so that unapplying can add the column back to the
+        # runs before expanding them
+        migrations.AlterField(
+            model_name="shoepricehistory",
+            name="date_recorded",
+            field=models.DateField(null=True),
+        ),
+        migrations.RunSQL(COMPACT_SNAPSHOTS, EXPAND_RUNS),
+        migrations.RemoveField(
+            model_name="shoepricehistory",
+            name="date_recorded",
+        ),
+        migrations.AlterField(
+            model_name="shoepricehistory",
+            name="valid_from",
+            field=models.DateField(),
+        ),
+        migrations.AlterModelOptions(
+            name="shoepricehistory",
+            options={"ordering": ["valid_from"]},
+        ),
+        migrations.AddConstraint(
+            model_name="shoepricehistory",
+            constraint=models.UniqueConstraint(
+                fields=("shoe", "valid_from"), name="unique_shoe_price_run_start"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="shoepricehistory",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("valid_to__isnull", True)),
+                fields=("shoe",),
+                name="unique_shoe_current_price",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ShoePriceRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("week", "Week"), ("month", "Month")], max_length=5
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("min_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("max_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("close_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "shoe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_rollups",
+                        to="core.shoe",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["period_start"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("shoe", "period", "period_start"),
+                        name="unique_shoe_price_rollup",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(BUILD_ROLLUPS, migrations.RunSQL.noop),
+    ]
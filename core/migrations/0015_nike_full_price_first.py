@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:00
+
+from django.db import migrations
+
+# Nike shoes used to be scraped as (current price, initial price), so a
+# discounted one had a sale price above its price. Like every other
+# brand, price is now the full price and sale_price the discounted one
+FULL_PRICE_FIRST = """
+UPDATE core_shoe SET price = sale_price, sale_price = price
+WHERE parsed_from = 'nike' AND sale_price > price;
+"""
+
+CURRENT_PRICE_FIRST = """
+UPDATE core_shoe SET price = sale_price, sale_price = price
+WHERE parsed_from = 'nike' AND sale_price < price;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_price_history_runs_and_rollups"),
+    ]
+
+    operations = [
+        migrations.RunSQL(FULL_PRICE_FIRST, CURRENT_PRICE_FIRST),
+    ]
@@ -1,4 +1,7 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import Q
 from django.db.models.signals import post_save
 
 
@@ -11,11 +14,19 @@ class Shoe(models.Model):
     url = models.URLField(max_length=400)
     image = models.URLField(max_length=400)
     article = models.CharField(max_length=200)
-    sizes = models.TextField()
+    sizes = ArrayField(models.CharField(max_length=10), default=list, blank=True)
     parsed_from = models.CharField(max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
     count = models.IntegerField(default=0)
     description = models.TextField()
+    # fingerprint of the scraped data the row was last written from
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            # sizes__contains / sizes__overlap lookups
+            GinIndex(fields=["sizes"], name="core_shoe_sizes_gin"),
+        ]
 
     def __str__(self):
         return self.name
@@ -31,12 +42,80 @@ class Shoe(models.Model):
             )
 
 
+class ShoePriceHistoryQuerySet(models.QuerySet):
+    def valid_on(self, day):
+        """The runs a shoe had its price for on `day`, one per shoe."""
+        return self.filter(
+            Q(valid_to__isnull=True) | Q(valid_to__gt=day), valid_from__lte=day
+        )
+
+    def overlapping(self, start=None, end=None):
+        """The runs with a day in `start` through `end`, both optional."""
+        runs = self
+        if start:
+            runs = runs.filter(Q(valid_to__isnull=True) | Q(valid_to__gt=start))
+        if end:
+            runs = runs.filter(valid_from__lte=end)
+        return runs
+
+
 class ShoePriceHistory(models.Model):
+    """
+    A run of days a shoe kept the same price: from `valid_from` up to,
+    not including, `valid_to`. The current run has no `valid_to`.
+    """
+
     shoe = models.ForeignKey(
         Shoe, on_delete=models.CASCADE, related_name="price_history"
     )
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    date_recorded = models.DateField()
+    valid_from = models.DateField()
+    valid_to = models.DateField(null=True, blank=True)
+
+    objects = ShoePriceHistoryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["valid_from"]
+        constraints = [
+            # also the index of "price on date X" and of chart ranges
+            models.UniqueConstraint(
+                fields=["shoe", "valid_from"], name="unique_shoe_price_run_start"
+            ),
+            # what update_price_history conflicts on
+            models.UniqueConstraint(
+                fields=["shoe"],
+                condition=Q(valid_to__isnull=True),
+                name="unique_shoe_current_price",
+            ),
+        ]
+
+
+class ShoePriceRollup(models.Model):
+    """Lowest, highest and last price of a shoe over a week or a month."""
+
+    PERIOD_CHOICES = [
+        ("week", "Week"),
+        ("month", "Month"),
+    ]
+
+    shoe = models.ForeignKey(
+        Shoe, on_delete=models.CASCADE, related_name="price_rollups"
+    )
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    # Monday of the week, first day of the month
+    period_start = models.DateField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    close_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ["period_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shoe", "period", "period_start"],
+                name="unique_shoe_price_rollup",
+            ),
+        ]
 
 
 class ShoesNews(models.Model):
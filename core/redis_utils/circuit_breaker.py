@@ -0,0 +1,172 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from redis import RedisError
+
+from core.redis_utils import metrics
+from core.redis_utils.rate_limiter import redis_client
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# KEYS: probe
+# ARGV: call token
+# Ends the probe only when the call is the one that took it
+END_PROBE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is skipped because its breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker whose state is shared by every process through Redis.
+
+    After `failure_threshold` failures in a row the breaker opens and
+    calls are rejected right away. Once `open_timeout` seconds have
+    passed, a single caller is let through as a probe (half open): its
+    success closes the breaker again, its failure keeps it open for
+    another `open_timeout`. A probe that never reports back frees the
+    way for the next one after `probe_timeout` seconds. Failures are
+    reported with the token `allow` gave the call, so that a call let
+    through before the breaker opened can't end the probe.
+
+    The outcome of every call is also kept in a rolling window of the
+    last `window` calls, for the success rate and latency stats.
+
+    When Redis is unavailable the breaker stays closed.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            failure_threshold: int,
+            open_timeout: float,
+            probe_timeout: float,
+            window: int,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_timeout = open_timeout
+        self.probe_timeout = probe_timeout
+        self.window = window
+        self._state_key = f"circuit_breaker:{name}"
+        self._probe_key = f"circuit_breaker:{name}:probe"
+        self._calls_key = f"circuit_breaker:{name}:calls"
+        self._metrics_namespace = f"circuit_breaker:{name}"
+        self._end_probe = redis_client.register_script(END_PROBE_SCRIPT)
+
+    def allow(self) -> Optional[str]:
+        """
+        A token for the call to report its outcome with, None when the
+        call is rejected.
+        """
+        token = uuid.uuid4().hex
+        try:
+            state = redis_client.hgetall(self._state_key)
+            if state.get("state", CLOSED) == CLOSED:
+                return token
+            if time.time() - float(state.get("opened_at", 0)) < self.open_timeout:
+                metrics.incr(self._metrics_namespace, "rejected")
+                return None
+            # half open, only one caller gets to probe
+            if redis_client.set(
+                    self._probe_key, token, nx=True, px=int(self.probe_timeout * 1000)
+            ):
+                metrics.incr(self._metrics_namespace, "probes")
+                return token
+        except RedisError as e:
+            logger.warning(f"Failed to read circuit breaker {self.name}: {e}")
+            return token
+
+        metrics.incr(self._metrics_namespace, "rejected")
+        return None
+
+    def record_success(self, seconds: float) -> None:
+        try:
+            pipe = redis_client.pipeline()
+            self._push_call(pipe, True, seconds)
+            pipe.hset(self._state_key, mapping={"state": CLOSED, "failures": 0})
+            pipe.delete(self._probe_key)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to record success of {self.name}: {e}")
+
+    def record_failure(self, seconds: float, token: str) -> None:
+        try:
+            pipe = redis_client.pipeline()
+            self._push_call(pipe, False, seconds)
+            pipe.hincrby(self._state_key, "failures", 1)
+            pipe.hget(self._state_key, "state")
+            *_, failures, state = pipe.execute()
+            probing = self._end_probe(keys=[self._probe_key], args=[token])
+
+            # a failed probe opens the breaker again right away
+            if probing or (
+                    state != OPEN and failures >= self.failure_threshold
+            ):
+                redis_client.hset(
+                    self._state_key,
+                    mapping={"state": OPEN, "opened_at": time.time()},
+                )
+                metrics.incr(self._metrics_namespace, "opened")
+                logger.warning(
+                    f"Circuit breaker {self.name} opened after {failures} "
+                    f"failures in a row"
+                )
+        except RedisError as e:
+            logger.warning(f"Failed to record failure of {self.name}: {e}")
+
+    def reset(self) -> None:
+        """Close the breaker and forget its call history."""
+        try:
+            redis_client.delete(self._state_key, self._probe_key, self._calls_key)
+        except RedisError as e:
+            logger.warning(f"Failed to reset circuit breaker {self.name}: {e}")
+
+    def stats(self) -> dict:
+        try:
+            state = redis_client.hgetall(self._state_key)
+            calls = redis_client.lrange(self._calls_key, 0, -1)
+            probing = redis_client.exists(self._probe_key)
+        except RedisError as e:
+            logger.warning(f"Failed to read circuit breaker {self.name}: {e}")
+            return {}
+
+        current_state = state.get("state", CLOSED)
+        opened_at = float(state.get("opened_at", 0))
+        if current_state == OPEN and (
+                probing or time.time() - opened_at >= self.open_timeout
+        ):
+            current_state = HALF_OPEN
+
+        # calls are stored as "<1|0>:<seconds>", newest first
+        outcomes = [call.split(":") for call in calls]
+        latencies = sorted(float(seconds) for _, seconds in outcomes)
+        successes = sum(1 for ok, _ in outcomes if ok == "1")
+        return {
+            "state": current_state,
+            "failures_in_a_row": int(state.get("failures", 0)),
+            "opened_at": opened_at if current_state != CLOSED else None,
+            "calls": len(outcomes),
+            "success_rate": successes / len(outcomes) if outcomes else None,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p95": (
+                latencies[int(0.95 * (len(latencies) - 1))] if latencies else None
+            ),
+        }
+
+    def _push_call(self, pipe, ok: bool, seconds: float) -> None:
+        pipe.lpush(self._calls_key, f"{int(ok)}:{seconds:.3f}")
+        pipe.ltrim(self._calls_key, 0, self.window - 1)
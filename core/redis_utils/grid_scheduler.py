@@ -0,0 +1,209 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from redis import RedisError
+
+from core.redis_utils import metrics
+from core.redis_utils.rate_limiter import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Waiters are ordered by priority first and by arrival second, arrival
+# is in milliseconds so priorities have to stay below a few hundred
+PRIORITY_WEIGHT = 10 ** 13
+
+# KEYS: holders, waiters, waiter deadlines
+# ARGV: token, slots, priority, wait timeout ms, slot ttl ms, first attempt
+# Returns {1 admitted | 0 still waiting | -1 deadline passed, queue depth}
+ACQUIRE_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+-- slots of holders that died without releasing them
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now)
+-- waiters that gave up or died are dropped once their deadline passed
+local expired = redis.call("ZRANGEBYSCORE", KEYS[3], "-inf", now)
+for _, waiter in ipairs(expired) do
+    redis.call("ZREM", KEYS[2], waiter)
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[3], "-inf", now)
+
+local rank = redis.call("ZRANK", KEYS[2], ARGV[1])
+if not rank then
+    if ARGV[6] ~= "1" then
+        return {-1, redis.call("ZCARD", KEYS[2])}
+    end
+    redis.call("ZADD", KEYS[2], tonumber(ARGV[3]) * 1e13 + now, ARGV[1])
+    redis.call("ZADD", KEYS[3], now + tonumber(ARGV[4]), ARGV[1])
+    rank = redis.call("ZRANK", KEYS[2], ARGV[1])
+end
+
+if rank < tonumber(ARGV[2]) - redis.call("ZCARD", KEYS[1]) then
+    redis.call("ZREM", KEYS[2], ARGV[1])
+    redis.call("ZREM", KEYS[3], ARGV[1])
+    redis.call("ZADD", KEYS[1], now + tonumber(ARGV[5]), ARGV[1])
+    return {1, redis.call("ZCARD", KEYS[2])}
+end
+return {0, redis.call("ZCARD", KEYS[2])}
+"""
+
+# KEYS: holders
+# ARGV: token, slot ttl ms
+TOUCH_SCRIPT = """
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+return redis.call("ZADD", KEYS[1], "XX", now + tonumber(ARGV[2]), ARGV[1])
+"""
+
+
+class GridAdmissionTimeout(Exception):
+    """Raised when no grid slot was free before the admission deadline."""
+
+
+class GridScheduler:
+    """
+    Admission control for the Selenium grid, shared by every process
+    through Redis.
+
+    At most `slots` sessions are admitted at once. Callers beyond that
+    queue up in priority order (lower first), first come first served
+    within a priority, and give up with GridAdmissionTimeout once their
+    `admission_timeout` has passed. A slot is held until it's released,
+    or until its holder stops touching it for `slot_ttl` seconds, so a
+    crashed process can't keep its slots.
+
+    When Redis is unavailable callers are admitted right away.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            slots: int,
+            admission_timeout: float,
+            slot_ttl: float,
+            poll_interval: float = 0.1,
+    ) -> None:
+        self.name = name
+        self.slots = slots
+        self.admission_timeout = admission_timeout
+        self.slot_ttl = slot_ttl
+        self.poll_interval = poll_interval
+        self._holders_key = f"grid_scheduler:{name}:holders"
+        self._waiters_key = f"grid_scheduler:{name}:waiters"
+        self._deadlines_key = f"grid_scheduler:{name}:deadlines"
+        self._metrics_namespace = f"grid_scheduler:{name}"
+        self._acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._touch = redis_client.register_script(TOUCH_SCRIPT)
+
+    def acquire(
+            self, priority: int = 0, timeout: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Wait for a slot and return its token, None when Redis is down.
+        Raises GridAdmissionTimeout after `timeout` seconds, the
+        scheduler's admission timeout by default.
+        """
+        timeout = self.admission_timeout if timeout is None else timeout
+        token = uuid.uuid4().hex
+        started_at = time.monotonic()
+        first_attempt = True
+
+        while True:
+            try:
+                admitted, queue_depth = self._acquire(
+                    keys=[self._holders_key, self._waiters_key, self._deadlines_key],
+                    args=[
+                        token,
+                        self.slots,
+                        priority,
+                        int(timeout * 1000),
+                        int(self.slot_ttl * 1000),
+                        int(first_attempt),
+                    ],
+                )
+            except RedisError as e:
+                logger.warning(f"Failed to schedule on grid {self.name}: {e}")
+                self._cancel(token)
+                return None
+            first_attempt = False
+            metrics.set_gauge(self._metrics_namespace, "queue_depth", queue_depth)
+
+            waited = time.monotonic() - started_at
+            if admitted == 1:
+                metrics.incr(self._metrics_namespace, "admitted")
+                metrics.observe(self._metrics_namespace, "wait", waited)
+                return token
+
+            if admitted == -1 or waited >= timeout:
+                self._cancel(token)
+                metrics.incr(self._metrics_namespace, "timeouts")
+                raise GridAdmissionTimeout(
+                    f"No {self.name} grid slot free after {timeout}s"
+                )
+            time.sleep(min(self.poll_interval, timeout - waited))
+
+    def release(self, token: Optional[str]) -> None:
+        if token is None:
+            return
+        try:
+            redis_client.zrem(self._holders_key, token)
+        except RedisError as e:
+            logger.warning(f"Failed to release grid {self.name} slot: {e}")
+
+    def touch(self, token: Optional[str]) -> None:
+        """Keep a long-lived slot, e.g. of a pooled session, from expiring."""
+        if token is None:
+            return
+        try:
+            self._touch(
+                keys=[self._holders_key], args=[token, int(self.slot_ttl * 1000)]
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to touch grid {self.name} slot: {e}")
+
+    def waiting(self) -> int:
+        """Callers queued for a slot right now, 0 when Redis is down."""
+        try:
+            # waiters past their deadline are only purged by the next acquire
+            return redis_client.zcount(
+                self._deadlines_key, time.time() * 1000, "+inf"
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to read grid {self.name} queue: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        now = time.time()
+        try:
+            pipe = redis_client.pipeline()
+            # expired holders are only purged by the next acquire
+            pipe.zcount(self._holders_key, now * 1000, "+inf")
+            pipe.zcard(self._waiters_key)
+            pipe.zrange(self._waiters_key, 0, 0, withscores=True)
+            in_use, waiting, head = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to read grid {self.name}: {e}")
+            return {}
+
+        # how long the caller admitted next has been waiting
+        head_wait = None
+        if head:
+            _, score = head[0]
+            head_wait = max(now - (score % PRIORITY_WEIGHT) / 1000, 0)
+        return {
+            "slots": self.slots,
+            "in_use": in_use,
+            "waiting": waiting,
+            "head_wait": head_wait,
+        }
+
+    def _cancel(self, token: str) -> None:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.zrem(self._waiters_key, token)
+            pipe.zrem(self._deadlines_key, token)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to leave grid {self.name} queue: {e}")
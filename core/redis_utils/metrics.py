@@ -0,0 +1,62 @@
+import logging
+
+from redis import RedisError
+
+from core.redis_utils.rate_limiter import redis_client
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+METRICS_KEY_TEMPLATE = "metrics:{namespace}"
+
+
+def _metrics_key(namespace: str) -> str:
+    return METRICS_KEY_TEMPLATE.format(namespace=namespace)
+
+
+def incr(namespace: str, name: str, amount: int = 1) -> None:
+    """Increment a counter shared by every worker process."""
+    try:
+        redis_client.hincrby(_metrics_key(namespace), name, amount)
+    except RedisError as e:
+        logger.warning(f"Failed to increment metric {namespace}.{name}: {e}")
+
+
+def set_gauge(namespace: str, name: str, value: float) -> None:
+    """Overwrite a point-in-time value, e.g. a configured pool size."""
+    try:
+        redis_client.hset(_metrics_key(namespace), name, value)
+    except RedisError as e:
+        logger.warning(f"Failed to set metric {namespace}.{name}: {e}")
+
+
+def observe(namespace: str, name: str, seconds: float) -> None:
+    """
+    Record a duration. Stored as count / total / last so that the
+    average can be derived when the metrics are read.
+    """
+    key = _metrics_key(namespace)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hincrby(key, f"{name}.count", 1)
+        pipe.hincrbyfloat(key, f"{name}.total", seconds)
+        pipe.hset(key, f"{name}.last", seconds)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to observe metric {namespace}.{name}: {e}")
+
+
+def get_metrics(namespace: str) -> dict:
+    """Return every metric of a namespace, with averages for durations."""
+    try:
+        raw = redis_client.hgetall(_metrics_key(namespace))
+    except RedisError as e:
+        logger.warning(f"Failed to read metrics {namespace}: {e}")
+        return {}
+
+    metrics = {name: float(value) for name, value in raw.items()}
+    for name in list(metrics):
+        if name.endswith(".count") and metrics[name]:
+            base = name[: -len(".count")]
+            metrics[f"{base}.avg"] = metrics.get(f"{base}.total", 0) / metrics[name]
+    return metrics
@@ -0,0 +1,140 @@
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional
+
+from redis import RedisError, ResponseError
+
+from core.redis_utils import metrics
+from core.redis_utils.rate_limiter import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PriceChange:
+    id: str
+    shoe_id: int
+    old_price: Optional[Decimal]
+    new_price: Optional[Decimal]
+    old_sale_price: Optional[Decimal]
+    new_sale_price: Optional[Decimal]
+    timestamp: float
+
+    @staticmethod
+    def effective_price(price, sale_price) -> Optional[Decimal]:
+        # the price a shoe is sold at, as price alerts compare it
+        if sale_price is not None and price is not None and sale_price < price:
+            return sale_price
+        return price
+
+    @property
+    def is_drop(self) -> bool:
+        old = self.effective_price(self.old_price, self.old_sale_price)
+        new = self.effective_price(self.new_price, self.new_sale_price)
+        return new is not None and (old is None or new < old)
+
+
+def _encode(value: Optional[Decimal]) -> str:
+    return "" if value is None else str(value)
+
+
+def _decode(value: str) -> Optional[Decimal]:
+    return Decimal(value) if value else None
+
+
+class PriceChangeStream:
+    """
+    Price changes of shoes appended to a Redis stream when a scrape is
+    saved, so that consumers only look at the shoes that changed.
+
+    Every consumer group reads the whole stream once, its consumers
+    share the work. Entries a consumer read but never acknowledged,
+    e.g. because its worker died, are handed to another consumer of
+    the group after `claim_idle` seconds. The stream is capped at about
+    `maxlen` entries.
+    """
+
+    def __init__(self, key: str, maxlen: int, claim_idle: float) -> None:
+        self.key = key
+        self.maxlen = maxlen
+        self.claim_idle = claim_idle
+        self._metrics_namespace = f"price_changes:{key}"
+
+    def publish(
+            self,
+            shoe_id: int,
+            old_price: Optional[Decimal],
+            new_price: Optional[Decimal],
+            old_sale_price: Optional[Decimal],
+            new_sale_price: Optional[Decimal],
+    ) -> None:
+        try:
+            redis_client.xadd(
+                self.key,
+                {
+                    "shoe": shoe_id,
+                    "old_price": _encode(old_price),
+                    "new_price": _encode(new_price),
+                    "old_sale_price": _encode(old_sale_price),
+                    "new_sale_price": _encode(new_sale_price),
+                    "ts": f"{time.time():.3f}",
+                },
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+            metrics.incr(self._metrics_namespace, "published")
+        except RedisError as e:
+            # the polling check_price_updates still catches the change
+            logger.warning(f"Failed to publish price change of shoe {shoe_id}: {e}")
+
+    def read(self, group: str, consumer: str, count: int) -> List[PriceChange]:
+        """
+        Up to `count` entries for the consumer: abandoned ones of its
+        group first, then new ones. Raises RedisError.
+        """
+        self._ensure_group(group)
+        _, entries, *_ = redis_client.xautoclaim(
+            self.key,
+            group,
+            consumer,
+            min_idle_time=int(self.claim_idle * 1000),
+            start_id="0-0",
+            count=count,
+        )
+        if entries:
+            metrics.incr(self._metrics_namespace, f"{group}.claimed", len(entries))
+        else:
+            response = redis_client.xreadgroup(
+                group, consumer, {self.key: ">"}, count=count
+            )
+            entries = response[0][1] if response else []
+        return [self._parse(entry_id, fields) for entry_id, fields in entries]
+
+    def ack(self, group: str, changes: List[PriceChange]) -> None:
+        if not changes:
+            return
+        redis_client.xack(self.key, group, *[change.id for change in changes])
+        metrics.incr(self._metrics_namespace, f"{group}.consumed", len(changes))
+
+    def _ensure_group(self, group: str) -> None:
+        try:
+            # a new group reads what is left in the stream, changes
+            # published before the group's first read aren't skipped
+            redis_client.xgroup_create(self.key, group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @staticmethod
+    def _parse(entry_id: str, fields: dict) -> PriceChange:
+        return PriceChange(
+            id=entry_id,
+            shoe_id=int(fields["shoe"]),
+            old_price=_decode(fields["old_price"]),
+            new_price=_decode(fields["new_price"]),
+            old_sale_price=_decode(fields["old_sale_price"]),
+            new_sale_price=_decode(fields["new_sale_price"]),
+            timestamp=float(fields["ts"]),
+        )
@@ -0,0 +1,114 @@
+import time
+import uuid
+from typing import Any, Callable
+
+from django.core.cache import cache
+
+from core.redis_utils import metrics
+from core.redis_utils.rate_limiter import redis_client
+
+# KEYS: lock
+# ARGV: token
+# Deletes the lock only while it is still the caller's lease
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlightTimeout(Exception):
+    """Raised when the leader did not publish a result in time."""
+
+
+class SingleFlightLeaderError(Exception):
+    """Raised in the waiters when the leader's call raised."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key across every process
+    sharing the Redis cache (gunicorn workers, Celery, Channels).
+
+    The first caller takes a lease on the key and runs the function,
+    the others poll for the result it publishes. If the leader dies, its
+    lease expires and one of the waiters takes over. If the leader's call
+    raises, the waiters raise SingleFlightLeaderError instead of running
+    it again.
+    """
+
+    def __init__(
+            self,
+            namespace: str,
+            lease_timeout: float,
+            wait_timeout: float,
+            poll_interval: float = 0.25,
+    ) -> None:
+        self.namespace = namespace
+        self.lease_timeout = lease_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._metrics_namespace = f"single_flight:{namespace}"
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        lock_key = f"single_flight:{self.namespace}:{key}:lock"
+        result_key = f"single_flight:{self.namespace}:{key}:result"
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+
+        while True:
+            # once another caller was seen leading, its result comes first,
+            # otherwise the freed lease would just be taken again
+            if waited:
+                result = cache.get(result_key)
+                if result is not None:
+                    if "error" in result:
+                        metrics.incr(self._metrics_namespace, "leader_errors")
+                        raise SingleFlightLeaderError(
+                            f"{self.namespace} {key} failed in the leader: "
+                            f"{result['error']}"
+                        )
+                    return result["value"]
+
+            token = uuid.uuid4().hex
+            if redis_client.set(
+                    lock_key, token, nx=True, px=int(self.lease_timeout * 1000)
+            ):
+                return self._lead(lock_key, result_key, token, fn)
+
+            if not waited:
+                waited = True
+                metrics.incr(self._metrics_namespace, "coalesced")
+
+            if time.monotonic() >= deadline:
+                metrics.incr(self._metrics_namespace, "timeouts")
+                raise SingleFlightTimeout(
+                    f"No result for {self.namespace} {key} after "
+                    f"{self.wait_timeout}s"
+                )
+            time.sleep(self.poll_interval)
+
+    def _lead(self, lock_key: str, result_key: str, token: str, fn) -> Any:
+        metrics.incr(self._metrics_namespace, "leaders")
+        # a result left over from an earlier flight must not be picked up
+        cache.delete(result_key)
+        try:
+            value = fn()
+        except Exception as e:
+            # waiters raise as well, rather than run it again or take a
+            # transient error for an empty result
+            cache.set(
+                result_key,
+                {"error": f"{type(e).__name__}: {e}"},
+                timeout=self.wait_timeout,
+            )
+            raise
+        else:
+            cache.set(result_key, {"value": value}, timeout=self.wait_timeout)
+            return value
+        finally:
+            # a lease that expired during the call may be another
+            # leader's by now
+            self._release(keys=[lock_key], args=[token])
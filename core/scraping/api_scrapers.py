@@ -1,30 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
 
+from curl_cffi import CurlInfo
 from curl_cffi import requests as cureq
 from curl_cffi.requests import exceptions
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from selenium.common import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from SneakSyncHub.settings import env
-from core.scraping.base import ScraperBase
-from core.scraping.selenium_scrapers import ProductData
+from django.conf import settings
+
+from core.formatting.sizes import Formatter
+from core.redis_utils import metrics
+from core.scraping import timing
+from core.scraping.base import ProductNotFoundError, ScraperBase
+from core.scraping.driver_pool import DriverPool
+from core.scraping.selenium_scrapers import ProductData, BSManager, WebDriver
 
 
 class APIClient:
+    """
+    JSON API client that keeps one curl_cffi session, and with it the
+    open keep-alive connections, for every request it makes. curl
+    handles are thread local, so a client can be shared by threads.
+    """
+
+    # connection phases copied onto every response, see _record_timings
+    TIMING_INFOS = [
+        CurlInfo.CONNECT_TIME,
+        CurlInfo.APPCONNECT_TIME,
+        CurlInfo.PRETRANSFER_TIME,
+        CurlInfo.TOTAL_TIME,
+        CurlInfo.NUM_CONNECTS,
+    ]
+
+    DEFAULT_HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Connection": "keep-alive",
+    }
+
+    def __init__(
+            self,
+            name: str,
+            referer: str,
+            connect_timeout: Optional[float] = None,
+            read_timeout: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self._metrics_namespace = f"api_client:{name}"
+        self._session = cureq.Session(
+            headers={**self.DEFAULT_HEADERS, "Referer": referer},
+            impersonate="chrome",
+            timeout=(
+                connect_timeout or settings.API_CLIENT_CONNECT_TIMEOUT,
+                read_timeout or settings.API_CLIENT_READ_TIMEOUT,
+            ),
+            curl_infos=self.TIMING_INFOS,
+        )
+
     def get(self, url: str) -> Dict:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Connection": "keep-alive",
-            "Referer": "https://www.adidas.com/",
-        }
         try:
-            response = cureq.get(url, headers=headers, impersonate="chrome")
+            response = self._session.get(url)
+            self._record_timings(response)
             # Check if the status code indicates success
             if response.status_code == 200:
                 try:
@@ -36,6 +79,10 @@ class APIClient:
                         f"{json_error}. "
                         f"Response content: {response.content}"
                     )
+            elif response.status_code == 404:
+                raise ProductNotFoundError(
+                    f"Request to {url} found nothing (404)"
+                )
             else:
                 # Raise an exception for non-200 status codes
                 raise ValueError(
@@ -50,61 +97,172 @@ class APIClient:
                 f"Error occurred while making request to {url}: {req_error}"
             )
 
+    def close(self) -> None:
+        self._session.close()
+
+    def _record_timings(self, response) -> None:
+        # split the request into its phases, connect and tls are 0 when
+        # a pooled connection was reused
+        infos = response.infos
+        connect_time = infos[CurlInfo.CONNECT_TIME]
+        tls_time = max(infos[CurlInfo.APPCONNECT_TIME] - connect_time, 0)
+        transfer_time = (
+            infos[CurlInfo.TOTAL_TIME] - infos[CurlInfo.PRETRANSFER_TIME]
+        )
+        reused = infos[CurlInfo.NUM_CONNECTS] == 0
+
+        metrics.observe(self._metrics_namespace, "connect", connect_time)
+        metrics.observe(self._metrics_namespace, "tls", tls_time)
+        metrics.observe(self._metrics_namespace, "transfer", transfer_time)
+        metrics.incr(
+            self._metrics_namespace,
+            "connections.reused" if reused else "connections.new",
+        )
+
+
+# Long-lived threads, so that their thread local curl handles and the
+# connections they hold are reused between articles
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=settings.ADIDAS_FETCH_WORKERS, thread_name_prefix="adidas-fetch"
+)
+
 
 class AdidasProductScraper(ScraperBase):
     brand = "Adidas"
     is_api_based = True
-    __SEARCH_URL_TEMPLATE = "https://www.adidas.com/api/products/{article}"
+    _SEARCH_URL_TEMPLATE = "https://www.adidas.com/api/products/{article}"
+    _FALLBACK_METRICS_NAMESPACE = "selenium_fallback:adidas"
 
-    def __init__(self, article: str, api_client: APIClient):
+    def __init__(
+            self,
+            article: str,
+            api_client: APIClient,
+            driver_pool: Optional[DriverPool] = None,
+    ):
         self._api_client = api_client
+        self._driver_pool = driver_pool
         self._article = article
-        self._search_url = self.__SEARCH_URL_TEMPLATE.format(article=self._article)
+        self._search_url = self._SEARCH_URL_TEMPLATE.format(article=self._article)
+        # the API answers 404 to some clients for listed products too,
+        # the pages have the last word
+        self._api_found_nothing = False
 
     def fetch_product_info(self) -> Dict:
+        product_info, _ = self.fetch_missing_with_selenium(
+            self._fetch_product_info_api(), {}
+        )
+        return product_info
+
+    def fetch_product_sizes(self) -> Dict:
+        _, product_sizes = self.fetch_missing_with_selenium(
+            {}, self._fetch_product_sizes_api()
+        )
+        return product_sizes
+
+    def fetch_product_info_and_sizes(self) -> Tuple[Dict, Dict]:
+        # the two endpoints don't depend on each other, send both at once;
+        # whatever the API failed to return is then loaded in a single
+        # browser session
+        with timing.stage("api"):
+            product_info = _fetch_executor.submit(self._fetch_product_info_api)
+            product_sizes = _fetch_executor.submit(self._fetch_product_sizes_api)
+            product_info, product_sizes = product_info.result(), product_sizes.result()
+        return self.fetch_missing_with_selenium(product_info, product_sizes)
+
+    def _fetch_product_info_api(self) -> Optional[Dict]:
+        metrics.incr(self._FALLBACK_METRICS_NAMESPACE, "api_requests")
         try:
-            # Try fetching product info via API
             return self._api_client.get(self._search_url)
+        except ProductNotFoundError as e:
+            self._api_found_nothing = True
+            print(f"API request found nothing: {e}. Falling back to Selenium...")
+            return None
         except (ValueError, ConnectionError) as e:
-            # If an error occurs (e.g., API fails), fallback to Selenium
             print(f"API request failed with error: {e}. Falling back to Selenium...")
-            return self.fetch_product_info_selenium()
+            return None
 
-    def fetch_product_sizes(self) -> Dict:
+    def _fetch_product_sizes_api(self) -> Optional[Dict]:
+        metrics.incr(self._FALLBACK_METRICS_NAMESPACE, "api_requests")
         try:
             return self._api_client.get(self._search_url + "/availability")
+        except ProductNotFoundError as e:
+            self._api_found_nothing = True
+            print(
+                f"API request found no sizes: {e}. Falling back to Selenium..."
+            )
+            return None
         except (ValueError, ConnectionError) as e:
             print(
                 f"API request failed for sizes with error: {e}. Falling back to Selenium..."
             )
-            return self.fetch_product_sizes_selenium()
-
-    def fetch_product_info_selenium(self) -> Dict:
-        # Set up Selenium WebDriver
-        driver_options = Options()
-        user_agent = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko)"
-            "Chrome/91.0.4472.124 Safari/537.36"
-        )
-        driver_options.add_argument(f"user-agent={user_agent}")
-        driver = webdriver.Remote(
-            command_executor=f"http://" f'{env("SELENIUM_HOST")}:4444/wd/hub',
-            options=driver_options,
-        )
-        driver.maximize_window()
+            return None
+
+    def fetch_missing_with_selenium(
+            self, product_info: Optional[Dict], product_sizes: Optional[Dict]
+    ) -> Tuple[Dict, Dict]:
+        """
+        Load whichever of the two the API didn't return (None) with
+        Selenium, both in the same browser session.
+        """
+        if product_info is not None and product_sizes is not None:
+            return product_info, product_sizes
+
+        metrics.incr(self._FALLBACK_METRICS_NAMESPACE, "fallbacks")
+        started_at = time.monotonic()
+        with timing.stage("driver"):
+            driver = self._open_driver()
+        try:
+            if product_info is None:
+                metrics.incr(self._FALLBACK_METRICS_NAMESPACE, "fallbacks.info")
+                timing.fallback("selenium_info")
+                with timing.stage("product_page"):
+                    product_info = self.fetch_product_info_selenium(driver)
+            if product_sizes is None:
+                metrics.incr(self._FALLBACK_METRICS_NAMESPACE, "fallbacks.sizes")
+                timing.fallback("selenium_sizes")
+                with timing.stage("sizes_page"):
+                    product_sizes = self.fetch_product_sizes_selenium(driver)
+        except Exception as e:
+            # hand a pooled session back, recycling it if the browser
+            # failed; a page that never got ready says nothing about it
+            error = e.__cause__ if isinstance(e, ValueError) else e
+            browser_failed = isinstance(error, WebDriverException) and not isinstance(
+                error, TimeoutException
+            )
+            if browser_failed:
+                driver.mark_failed()
+            metrics.incr(self._FALLBACK_METRICS_NAMESPACE, "fallbacks.failed")
+            if self._api_found_nothing and not browser_failed:
+                # neither the API nor the pages list it
+                raise ProductNotFoundError(
+                    f"Adidas doesn't list {self._article}"
+                ) from e
+            raise
+        finally:
+            driver.quit()
+            metrics.observe(
+                self._FALLBACK_METRICS_NAMESPACE,
+                "duration",
+                time.monotonic() - started_at,
+            )
 
+        return product_info, product_sizes
+
+    def _open_driver(self) -> WebDriver:
+        if self._driver_pool is not None:
+            return self._driver_pool.lease()
+        return WebDriver(brand="Adidas")
+
+    def fetch_product_info_selenium(self, driver: WebDriver) -> Dict:
         # Navigate to the product page
         product_url = self._search_url
-        driver.get(product_url)
+        driver.driver.get(product_url)
 
         try:
             # Extract all the text from the page
-            page_source = driver.page_source
+            page_source = driver.driver.page_source
             # You can use a parser to extract just the text content
-            from bs4 import BeautifulSoup
-
-            soup = BeautifulSoup(page_source, "html.parser")
+            soup = BSManager.get_parsed_page(page_source)
             all_text = soup.get_text(separator=" ", strip=True)
 
             product_data = {
@@ -112,45 +270,25 @@ class AdidasProductScraper(ScraperBase):
                 # This will contain all the textual content on the page
             }
         except Exception as e:
-            raise ValueError(f"Error while scraping data with Selenium: {e}")
-        finally:
-            driver.quit()
+            raise ValueError(f"Error while scraping data with Selenium: {e}") from e
 
         return product_data
 
-    def fetch_product_sizes_selenium(self) -> Dict:
-        # Similar method for fetching sizes via Selenium if API fails
-        driver_options = Options()
-
-        user_agent = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko)"
-            "Chrome/91.0.4472.124 Safari/537.36"
-        )
-        # Create Chrome options and set the user agent
-        driver_options.add_argument(f"user-agent={user_agent}")
-        driver = webdriver.Remote(
-            command_executor=f"http://" f'{env("SELENIUM_HOST")}:4444/wd/hub',
-            options=driver_options,
-        )
-        driver.maximize_window()
-
+    def fetch_product_sizes_selenium(self, driver: WebDriver) -> Dict:
         product_url = self._search_url + "/availability"
-        driver.get(product_url)
+        driver.driver.get(product_url)
 
         # Wait until the sizes section is available
-        WebDriverWait(driver, 10).until(
+        WebDriverWait(driver.driver, 10).until(
             EC.presence_of_element_located((By.ID, "size-availability"))
         )
 
         try:
             sizes = self._extract_sizes(
-                driver
+                driver.driver
             )  # Using the existing method to extract sizes
         except Exception as e:
-            raise ValueError(f"Error while scraping sizes with Selenium: {e}")
-        finally:
-            driver.quit()
+            raise ValueError(f"Error while scraping sizes with Selenium: {e}") from e
 
         return {"sizes": sizes}
 
@@ -215,5 +353,101 @@ class AdidasProductParser:
         self._product_data = __product_data
 
     def get_product_data(self) -> ProductData:
-        self.__compose_product_data()
+        with timing.stage("parse"):
+            self.__compose_product_data()
+        return self._product_data
+
+
+class NikeAPIScraper(ScraperBase):
+    brand = "Nike"
+    is_api_based = True
+    # the product feed nike.com itself renders product pages from
+    _SEARCH_URL_TEMPLATE = (
+        "https://api.nike.com/product_feed/threads/v2"
+        "?filter=marketplace(US)"
+        "&filter=language(en)"
+        "&filter=channelId(d9a5bc42-4b9c-4976-858a-f159cf99c647)"
+        "&filter=productInfo.merchProduct.styleColor({article})"
+    )
+
+    def __init__(self, article: str, api_client: APIClient):
+        self._api_client = api_client
+        self._article = article
+        self._search_url = self._SEARCH_URL_TEMPLATE.format(article=self._article)
+
+    def fetch_product_feed(self) -> Dict:
+        return self._api_client.get(self._search_url)
+
+
+class NikeAPIParser:
+    PRODUCT_URL_TEMPLATE = "https://www.nike.com/t/{slug}/{article}"
+
+    def __init__(self, article: str, product_feed: Dict):
+        self._article = article
+        self._product_info = self.__find_product_info(product_feed)
+        self._product_data = None
+
+    def __find_product_info(self, product_feed: Dict) -> Dict:
+        # a thread lists every colorway of the model, pick the one
+        # that was asked for
+        for thread in product_feed.get("objects", []):
+            for product_info in thread.get("productInfo", []):
+                style_color = product_info.get("merchProduct", {}).get("styleColor")
+                if style_color == self._article:
+                    return product_info
+        raise ProductNotFoundError(
+            f"Article {self._article} not found in Nike product feed"
+        )
+
+    def __format_product_sizes(self) -> List[str]:
+        available_sku_ids = {
+            sku.get("id")
+            for sku in self._product_info.get("availableSkus", [])
+            if sku.get("available")
+        }
+        available_sizes = []
+        for sku in self._product_info.get("skus", []):
+            if sku.get("id") not in available_sku_ids:
+                continue
+            # localized sizes look like "M 10 / W 11.5", same as the page
+            country_specifications = sku.get("countrySpecifications") or [{}]
+            size = Formatter.get_stripped_sizes(
+                country_specifications[0].get("localizedSize")
+                or sku.get("nikeSize", "")
+            )
+            if size and size not in available_sizes:
+                available_sizes.append(size)
+        return available_sizes
+
+    def __compose_product_data(self):
+        try:
+            merch_price = self._product_info["merchPrice"]
+            product_content = self._product_info["productContent"]
+            __product_data: ProductData = {
+                "article": self._article,
+                "url": self.PRODUCT_URL_TEMPLATE.format(
+                    slug=product_content.get("slug", ""), article=self._article
+                ),
+                "name": product_content.get("title", ""),
+                # prices come as JSON floats, str keeps them exact for Decimal
+                "price": str(merch_price.get("fullPrice", "")),
+                "sale_price": (
+                    str(merch_price.get("currentPrice", ""))
+                    if merch_price.get("discounted")
+                    else ""
+                ),
+                "sizes": self.__format_product_sizes(),
+                "description": product_content.get("description", ""),
+                "image": self._product_info.get("imageUrls", {}).get(
+                    "productImageUrl", ""
+                ),
+            }
+        except KeyError as e:
+            raise ValueError(f"Missing expected key: {e}")
+
+        self._product_data = __product_data
+
+    def get_product_data(self) -> ProductData:
+        with timing.stage("parse"):
+            self.__compose_product_data()
         return self._product_data
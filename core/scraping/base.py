@@ -1,3 +1,7 @@
+class ProductNotFoundError(ValueError):
+    """The site answered, but doesn't list the article."""
+
+
 class ScraperBase:
     brand: str = ""
     is_api_based: bool = False
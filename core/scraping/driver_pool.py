@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from core.redis_utils import metrics
+from core.scraping.selenium_scrapers import WebDriver
+
+logger = logging.getLogger(__name__)
+
+
+class DriverPoolTimeout(Exception):
+    """Raised when no session could be leased before the lease timeout."""
+
+
+class PooledWebDriver:
+    """
+    A session leased from a DriverPool. Exposes the same interface as
+    WebDriver, but quit() hands the session back to the pool instead of
+    closing it.
+    """
+
+    def __init__(self, pool: "DriverPool", web_driver: WebDriver):
+        self._pool = pool
+        self._web_driver = web_driver
+        self.uses: int = 0
+        self.released_at: float = time.monotonic()
+        self.failed: bool = False
+
+    @property
+    def driver(self):
+        return self._web_driver.driver
+
+    @property
+    def is_warm(self) -> bool:
+        return self._web_driver.is_warm
+
+    def is_alive(self) -> bool:
+        return self._web_driver.is_alive()
+
+    def mark_failed(self) -> None:
+        self.failed = True
+
+    def touch_grid_slot(self) -> None:
+        self._web_driver.touch_grid_slot()
+
+    def quit(self) -> None:
+        self._pool.release(self)
+
+    def close_session(self) -> None:
+        self._web_driver.quit()
+
+
+class DriverPool:
+    """
+    Bounded pool of long-lived Selenium sessions.
+
+    Sessions are created lazily up to `size`, passed through `warmup`
+    (e.g. the Nike country gate) once, and then leased to scrapers.
+    A session is health-checked before every lease and recycled after
+    `max_uses` leases, after `max_idle` seconds without use, or when the
+    lease holder marked it as failed.
+
+    Idle sessions hold grid slots other processes may be queued for.
+    While `grid_waiters` reports callers waiting for the grid, sessions
+    are closed instead of going idle, and a background thread closes
+    as many idle ones every `reap_interval` seconds. The same thread
+    closes sessions idle for longer than `max_idle`.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            size: int,
+            lease_timeout: float,
+            max_uses: int,
+            max_idle: float,
+            driver_factory: Callable[[], WebDriver] = WebDriver,
+            warmup: Optional[Callable[[WebDriver], None]] = None,
+            grid_waiters: Optional[Callable[[], int]] = None,
+            reap_interval: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.size = size
+        self.lease_timeout = lease_timeout
+        self.max_uses = max_uses
+        self.max_idle = max_idle
+        self._driver_factory = driver_factory
+        self._warmup = warmup
+        self._grid_waiters = grid_waiters
+        self.reap_interval = reap_interval
+
+        self._idle: list[PooledWebDriver] = []
+        self._created: int = 0
+        self._in_use: int = 0
+        self._condition = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+
+        self._metrics_namespace = f"driver_pool:{name}"
+
+    def lease(self) -> PooledWebDriver:
+        started_at = time.monotonic()
+        deadline = started_at + self.lease_timeout
+
+        while True:
+            session = self._take_idle_or_reserve(deadline)
+            if session is None:
+                # A slot was reserved for us, open a new session in it
+                session = self._create_session()
+            elif time.monotonic() - session.released_at > self.max_idle:
+                # the grid drops idle sessions on its own, don't risk it
+                self._discard(session, reason="idle")
+                continue
+            elif not session.is_alive():
+                self._discard(session, reason="unhealthy")
+                continue
+
+            session.uses += 1
+            session.failed = False
+            session.touch_grid_slot()
+            with self._condition:
+                self._in_use += 1
+
+            metrics.incr(self._metrics_namespace, "leases")
+            metrics.observe(
+                self._metrics_namespace, "lease_wait",
+                time.monotonic() - started_at
+            )
+            return session
+
+    def release(self, session: PooledWebDriver) -> None:
+        with self._condition:
+            self._in_use -= 1
+
+        if session.failed:
+            self._discard(session, reason="error")
+        elif session.uses >= self.max_uses:
+            self._discard(session, reason="max_uses")
+        elif self._grid_waiting() > 0:
+            self._discard(session, reason="grid_waiters")
+        else:
+            session.released_at = time.monotonic()
+            session.touch_grid_slot()
+            with self._condition:
+                self._idle.append(session)
+                self._condition.notify()
+                self._start_reaper()
+
+    def close(self) -> None:
+        """Quit every idle session, e.g. on worker shutdown."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._discard(session, reason="shutdown")
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+            }
+
+    def reap(self) -> None:
+        """
+        Close the sessions idle for longer than `max_idle`, then as many
+        of the least recently used ones as there are grid waiters.
+        """
+        now = time.monotonic()
+        with self._condition:
+            expired = [
+                session for session in self._idle
+                if now - session.released_at > self.max_idle
+            ]
+            self._idle = [session for session in self._idle if session not in expired]
+            has_idle = bool(self._idle)
+        for session in expired:
+            self._discard(session, reason="idle")
+
+        waiting = self._grid_waiting() if has_idle else 0
+        with self._condition:
+            # leases pop from the end, the front was used least recently
+            yielded, self._idle = self._idle[:waiting], self._idle[waiting:]
+        for session in yielded:
+            self._discard(session, reason="grid_waiters")
+
+    def _grid_waiting(self) -> int:
+        return self._grid_waiters() if self._grid_waiters else 0
+
+    def _start_reaper(self) -> None:
+        # Called with the condition held. Threads don't survive a fork,
+        # worker processes start their own
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._reaper = threading.Thread(
+            target=self._reap_forever, name=f"driver-pool-{self.name}", daemon=True
+        )
+        self._reaper.start()
+
+    def _reap_forever(self) -> None:
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.reap()
+            except Exception as e:
+                logger.warning(f"Failed to reap {self.name} drivers: {e}")
+
+    def _take_idle_or_reserve(self, deadline: float) -> Optional[PooledWebDriver]:
+        # Returns an idle session, or None after reserving a slot for a
+        # new one. Waits while the pool is exhausted.
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.incr(self._metrics_namespace, "lease_timeouts")
+                    raise DriverPoolTimeout(
+                        f"No {self.name} driver available after "
+                        f"{self.lease_timeout}s"
+                    )
+                self._condition.wait(remaining)
+
+    def _create_session(self) -> PooledWebDriver:
+        web_driver = None
+        try:
+            web_driver = self._driver_factory()
+            if self._warmup:
+                self._warmup(web_driver)
+            web_driver.is_warm = True
+        except Exception:
+            if web_driver:
+                web_driver.quit()
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+        metrics.set_gauge(self._metrics_namespace, "size", self.size)
+        metrics.incr(self._metrics_namespace, "created")
+        return PooledWebDriver(self, web_driver)
+
+    def _discard(self, session: PooledWebDriver, reason: str) -> None:
+        try:
+            session.close_session()
+        except Exception as e:
+            logger.warning(f"Failed to quit {self.name} driver: {e}")
+
+        with self._condition:
+            self._created -= 1
+            self._condition.notify()
+        metrics.incr(self._metrics_namespace, f"recycled.{reason}")
@@ -0,0 +1,106 @@
+import logging
+import time
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.redis_utils import metrics
+from core.redis_utils.single_flight import SingleFlight
+from core.scraping.selenium_scrapers import ProductData
+
+logger = logging.getLogger(__name__)
+
+METRICS_NAMESPACE = "product_cache"
+
+# One scrape per (brand, article) at a time, concurrent misses wait for it
+scrape_flight = SingleFlight(
+    namespace="scrape",
+    lease_timeout=settings.SCRAPE_SINGLE_FLIGHT_LEASE,
+    wait_timeout=settings.SCRAPE_SINGLE_FLIGHT_WAIT,
+)
+
+
+class ProductDataCache:
+    """
+    Parsed ProductData per (brand, article), kept in the Redis cache.
+
+    An entry is fresh for PRODUCT_CACHE_FRESH_TTL seconds and served
+    stale for PRODUCT_CACHE_STALE_TTL seconds after that, while a
+    background task scrapes the article again.
+    """
+
+    @staticmethod
+    def key(brand: str, article: str) -> str:
+        return f"product_data:{brand}:{article}"
+
+    @staticmethod
+    def get_or_scrape(
+            brand: str, article: str, scrape: Callable[[], Optional[ProductData]]
+    ) -> Optional[ProductData]:
+        entry = cache.get(ProductDataCache.key(brand, article))
+
+        if entry:
+            age = time.time() - entry["fetched_at"]
+            if age < settings.PRODUCT_CACHE_FRESH_TTL:
+                metrics.incr(METRICS_NAMESPACE, "hits")
+            else:
+                metrics.incr(METRICS_NAMESPACE, "stale")
+                ProductDataCache.schedule_refresh(brand, article)
+            return entry["data"]
+
+        metrics.incr(METRICS_NAMESPACE, "misses")
+
+        def scrape_and_store():
+            product_data = scrape()
+            ProductDataCache.store(brand, article, product_data)
+            return product_data
+
+        return scrape_flight.do(f"{brand}:{article}", scrape_and_store)
+
+    @staticmethod
+    def store(brand: str, article: str, product_data: Optional[ProductData]) -> None:
+        # failed scrapes are not cached, the next request tries again
+        if not product_data:
+            return
+        cache.set(
+            ProductDataCache.key(brand, article),
+            {"data": product_data, "fetched_at": time.time()},
+            timeout=settings.PRODUCT_CACHE_FRESH_TTL
+            + settings.PRODUCT_CACHE_STALE_TTL,
+        )
+
+    @staticmethod
+    def schedule_refresh(brand: str, article: str) -> None:
+        # only one refresh per entry at a time, the marker expires on its own
+        refresh_key = f"{ProductDataCache.key(brand, article)}:refreshing"
+        if not cache.add(refresh_key, True, timeout=settings.PRODUCT_CACHE_FRESH_TTL):
+            return
+
+        from core.tasks import refresh_product_data
+
+        try:
+            refresh_product_data.delay(brand, article)
+        except Exception as e:
+            cache.delete(refresh_key)
+            logger.warning(f"Failed to schedule refresh of {brand} {article}: {e}")
+
+    @staticmethod
+    def finish_refresh(brand: str, article: str) -> None:
+        cache.delete(f"{ProductDataCache.key(brand, article)}:refreshing")
+
+    @staticmethod
+    def stats() -> dict:
+        counters = metrics.get_metrics(METRICS_NAMESPACE)
+        hits = counters.get("hits", 0)
+        stale = counters.get("stale", 0)
+        misses = counters.get("misses", 0)
+        total = hits + stale + misses
+        return {
+            "hits": hits,
+            "stale": stale,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0,
+            "stale_ratio": stale / total if total else 0,
+            "miss_ratio": misses / total if total else 0,
+        }
@@ -1,47 +1,202 @@
 import asyncio
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
-from typing import Tuple, Optional
+from functools import partial
+from typing import Tuple, Optional, List
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework import status
+from selenium.common import WebDriverException
 
 from core.models import Shoe
+from core.redis_utils import metrics
+from core.redis_utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.redis_utils.grid_scheduler import GridAdmissionTimeout
+from core.redis_utils.price_changes import PriceChangeStream
 from core.scraping.api_scrapers import (
     APIClient,
     AdidasProductScraper,
     AdidasProductParser,
+    NikeAPIScraper,
+    NikeAPIParser,
 )
+from core.scraping import timing
+from core.scraping.base import ProductNotFoundError
+from core.scraping.driver_pool import DriverPool, DriverPoolTimeout
+from core.scraping.product_cache import ProductDataCache
 from core.scraping.selenium_scrapers import (
-    WebDriver,
     NikeProductScraper,
     NikeProductParser,
+    ProductData,
+    WebDriver,
+    grid_scheduler,
 )
 from core.utils import get_user_profile
 
+WRITES_METRICS_NAMESPACE = "product_writes"
 
-class NikeSetup:
+# Price changes found when scrapes are saved, consumed by the
+# process_price_changes task
+price_change_stream = PriceChangeStream(
+    key="price_changes",
+    maxlen=settings.PRICE_CHANGES_STREAM_MAXLEN,
+    claim_idle=settings.PRICE_CHANGES_CLAIM_IDLE,
+)
+
+# outcome of an article scrape in its timing record, by response status
+SCRAPE_OUTCOMES = {
+    status.HTTP_200_OK: "scraped",
+    status.HTTP_404_NOT_FOUND: "mismatch",
+}
+
+# Sessions are kept past the Nike country selector, so a lease can go
+# straight to the search page
+nike_driver_pool = DriverPool(
+    name="nike",
+    size=settings.NIKE_DRIVER_POOL_SIZE,
+    lease_timeout=settings.DRIVER_POOL_LEASE_TIMEOUT,
+    max_uses=settings.DRIVER_POOL_MAX_USES,
+    max_idle=settings.DRIVER_POOL_MAX_IDLE,
+    driver_factory=partial(WebDriver, brand="Nike"),
+    # other processes may be queued for the grid slots idle sessions hold
+    grid_waiters=grid_scheduler.waiting,
+    warmup=NikeProductScraper.pass_country_gate,
+)
+
+
+class NikeSeleniumSetup:
     def __init__(self, article):
         self.article = article
-        self.web_driver = WebDriver()
-        self.scraper = NikeProductScraper(self.web_driver, article)
-        self.product_page = self.scraper.product_page
+        with timing.stage("driver"):
+            self.web_driver = nike_driver_pool.lease()
+        try:
+            scraper = NikeProductScraper(self.web_driver, article)
+        except Exception as e:
+            # hand the session back, recycling it if the browser itself failed
+            if isinstance(e, WebDriverException):
+                self.web_driver.mark_failed()
+            self.web_driver.quit()
+            raise
+        self.scraped_pages = scraper.scraped_pages
 
     def initialize_parser(self) -> NikeProductParser:
+        # the parser becomes the only owner of the parsed pages, so they
+        # are freed as soon as it is done with them
+        scraped_pages, self.scraped_pages = self.scraped_pages, None
         return NikeProductParser(
-            article=self.article, driver=self.web_driver, product_page=self.product_page
+            article=self.article,
+            driver=self.web_driver,
+            scraped_pages=scraped_pages,
         )
 
 
+# Shared so that connections to api.nike.com stay open between articles
+nike_api_client = APIClient(name="nike", referer="https://www.nike.com/")
+
+
+class NikeAPISetup:
+    def __init__(self, article):
+        self.api_client = nike_api_client
+        self.scraper = NikeAPIScraper(article, self.api_client)
+        with timing.stage("api"):
+            product_feed = self.scraper.fetch_product_feed()
+        # fails right here when the feed doesn't list the article
+        self.parser = NikeAPIParser(article, product_feed)
+
+    def initialize_parser(self) -> NikeAPIParser:
+        return self.parser
+
+
+class NikeSetup:
+    """
+    Reads the article from Nike's product feed, and only leases a
+    browser from the pool when the feed fails or doesn't list it.
+    """
+
+    def __init__(self, article):
+        try:
+            self.setup = NikeAPISetup(article)
+        except (ValueError, ConnectionError) as e:
+            print(f"Nike API failed with error: {e}. Falling back to Selenium...")
+            timing.fallback("selenium")
+            self.setup = NikeSeleniumSetup(article)
+
+    def initialize_parser(self):
+        return self.setup.initialize_parser()
+
+
+# Shared so that connections to adidas.com stay open between articles
+adidas_api_client = APIClient(name="adidas", referer="https://www.adidas.com/")
+
+# Sessions for the Selenium fallback of the Adidas API
+adidas_driver_pool = DriverPool(
+    name="adidas",
+    size=settings.ADIDAS_DRIVER_POOL_SIZE,
+    lease_timeout=settings.DRIVER_POOL_LEASE_TIMEOUT,
+    max_uses=settings.DRIVER_POOL_MAX_USES,
+    max_idle=settings.DRIVER_POOL_MAX_IDLE,
+    driver_factory=partial(WebDriver, brand="Adidas"),
+    grid_waiters=grid_scheduler.waiting,
+)
+
+
 class AdidasSetup:
     def __init__(self, article):
-        self.api_client = APIClient()
-        self.scraper = AdidasProductScraper(article, self.api_client)
-        self.product_info = self.scraper.fetch_product_info()
-        self.product_sizes = self.scraper.fetch_product_sizes()
+        self.api_client = adidas_api_client
+        self.scraper = AdidasProductScraper(
+            article, self.api_client, driver_pool=adidas_driver_pool
+        )
+        self.product_info, self.product_sizes = (
+            self.scraper.fetch_product_info_and_sizes()
+        )
 
     def initialize_parser(self) -> AdidasProductParser:
         return AdidasProductParser(self.product_info, self.product_sizes)
 
 
+brand_setup_mapping = {
+    "Adidas": AdidasSetup,
+    "Nike": NikeSetup,
+}
+
+# The scrapers a brand is read with, each with the setup that runs it.
+# The next one is tried when one fails, doesn't find the article or is
+# skipped by its breaker, the fallbacks load the pages with Selenium
+brand_scrape_paths = {
+    "Adidas": [(AdidasProductScraper, AdidasSetup)],
+    "Nike": [
+        (NikeAPIScraper, NikeAPISetup),
+        (NikeProductScraper, NikeSeleniumSetup),
+    ],
+}
+
+# One breaker per scraper, named after its class, so a broken site, API
+# or grid is skipped instead of waited out on every request
+scraper_breakers = {
+    scraper.__name__: CircuitBreaker(
+        name=scraper.__name__,
+        failure_threshold=settings.SCRAPER_BREAKER_FAILURE_THRESHOLD,
+        open_timeout=settings.SCRAPER_BREAKER_OPEN_TIMEOUT,
+        probe_timeout=settings.SCRAPER_BREAKER_PROBE_TIMEOUT,
+        window=settings.SCRAPER_BREAKER_WINDOW,
+    )
+    for scrape_paths in brand_scrape_paths.values()
+    for scraper, _ in scrape_paths
+}
+
+# Runs the brands of a fan-out scrape side by side
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=settings.SCRAPING_FANOUT_WORKERS, thread_name_prefix="brand-fanout"
+)
+
+
 class ProductService:
     @staticmethod
     async def process_scraping_async(shoe_article, request):
@@ -60,11 +215,6 @@ class ProductService:
         """
         Handles the entire scraping workflow for a shoe article.
         """
-        brand_map = {
-            "Adidas": AdidasSetup,
-            "Nike": NikeSetup,
-        }
-
         # Get the user profile
         user_profile = get_user_profile(request)
         if not user_profile:
@@ -74,35 +224,67 @@ class ProductService:
         print(f"User ID: {request.user.id if request.user else 'No user provided'}")
         print(f"Parse From: {request.data.get('parse_from')}")
 
+        parse_from = ProductService.resolve_parse_from(
+            request.data.get("parse_from")
+        )
+
+        if not parse_from:
+            return (
+                None,
+                {"statusText": "No valid brand found in parse_from"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        return ProductService.scrape_article(shoe_article, parse_from, user_profile)
+
+    @staticmethod
+    def resolve_parse_from(parse_from) -> List[str]:
+        """
+        Known brands of a `parse_from` value, all brands when it is missing.
+        """
+        brand_map = brand_setup_mapping
+
         # Get the `parse_from` field from the request or default to all available brands
-        parse_from = request.data.get(
-            "parse_from", list(brand_map.keys())
-        )  # Convert dict_keys to a list
+        if parse_from is None:
+            parse_from = list(brand_map.keys())  # Convert dict_keys to a list
 
         # Ensure parse_from is always a list, even if it's a single string
         if isinstance(parse_from, str):
             parse_from = [parse_from]  # Convert single string to list
 
         # Now you can safely iterate over parse_from
-        parse_from = [brand for brand in parse_from if brand in brand_map]
+        return [brand for brand in parse_from if brand in brand_map]
 
-        if not parse_from:
-            return (
-                None,
-                {"statusText": "No valid brand found in parse_from"},
-                status.HTTP_400_BAD_REQUEST,
+    @staticmethod
+    def scrape_article(shoe_article, parse_from, user_profile):
+        """
+        Scrape an article from the given brands and save it for the user.
+        Shared by the request handlers and the scrape job worker.
+        """
+        with timing.timed_scrape(shoe_article) as timer:
+            new_article, error_response, status_code = (
+                ProductService._scrape_article(shoe_article, parse_from, user_profile)
+            )
+            timer.outcome = SCRAPE_OUTCOMES.get(status_code, "failed")
+            return new_article, error_response, status_code
+
+    @staticmethod
+    def _scrape_article(shoe_article, parse_from, user_profile):
+        if settings.SCRAPING_FANOUT:
+            return ProductService.process_scraping_fanout(
+                shoe_article, parse_from, user_profile
             )
 
         # Try scraping the shoe for the specified article
         for brand in parse_from:
-            setup_class = brand_map.get(brand)
-            if not setup_class:
+            if brand not in brand_setup_mapping:
                 continue
             try:
-                setup_instance = setup_class(shoe_article)
-                parser = setup_instance.initialize_parser()
-                new_article, created = ProductService.get_and_save_product_data(
-                    parser, user_profile, brand
+                product_data = ProductService.scrape_product_data(
+                    brand, shoe_article
+                )
+                new_article, created = ProductService.save_product_data(
+                    product_data, user_profile, brand
                 )
 
                 if new_article:
@@ -130,6 +312,214 @@ class ProductService:
             status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
+    @staticmethod
+    def process_scraping_fanout(shoe_article, parse_from, user_profile):
+        """
+        Scrape all brands at once and save the first matching result.
+        """
+        product_data, brand, mismatched_brand = ProductService.scrape_first_match(
+            shoe_article, parse_from
+        )
+
+        if product_data:
+            new_article, created = ProductService.save_product_data(
+                product_data, user_profile, brand
+            )
+            if new_article:
+                return new_article, None, status.HTTP_200_OK
+
+        if mismatched_brand:
+            error_message = (
+                f"The shoe article '{shoe_article}' does not match the fetched "
+                f"article from {mismatched_brand}. We couldn't find this shoe "
+                f"on the original site, and attempts to scrape from other "
+                f"sites also failed."
+            )
+            return None, {"statusText": error_message}, status.HTTP_404_NOT_FOUND
+
+        return (
+            None,
+            {"statusText": "Failed to scrape data for the article."},
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    @staticmethod
+    def scrape_first_match(
+        shoe_article, brands: List[str]
+    ) -> Tuple[Optional[ProductData], Optional[str], Optional[str]]:
+        """
+        Start every brand at once (after its configured start delay) and
+        return the first product data whose article matches, with its
+        brand. A failed brand cuts the delays of the waiting ones short.
+        The remaining brands are abandoned: the ones still waiting out
+        their delay never start, running ones finish in the background
+        and hand their driver back to the pool as usual.
+
+        The third value names a brand that returned a different article,
+        if any did.
+        """
+        priority = settings.SCRAPING_BRAND_PRIORITY
+        brands = sorted(
+            brands,
+            key=lambda brand: priority.index(brand)
+            if brand in priority
+            else len(priority),
+        )
+        brands = [brand for brand in brands if brand in brand_setup_mapping]
+        abandoned = threading.Event()
+        hurry = threading.Event()
+        futures = {
+            # the brands record their stages into the caller's scrape timer
+            _fanout_executor.submit(
+                contextvars.copy_context().run,
+                ProductService._scrape_brand_after_delay,
+                brand,
+                shoe_article,
+                # the delays hedge behind faster brands, the first one
+                # has nothing to wait for
+                settings.SCRAPING_BRAND_START_DELAYS.get(brand, 0) if position else 0,
+                abandoned,
+                hurry,
+            ): brand
+            for position, brand in enumerate(brands)
+        }
+
+        mismatched_brand = None
+        try:
+            for future in as_completed(futures):
+                brand = futures[future]
+                try:
+                    product_data = future.result()
+                except Exception as e:
+                    print(f"Failed scraping with {brand}: {e}")
+                    product_data = None
+
+                if product_data and product_data["article"] == shoe_article:
+                    return product_data, brand, None
+                if product_data:
+                    mismatched_brand = brand
+                # no use waiting for the hedge delay of the other brands
+                hurry.set()
+        finally:
+            abandoned.set()
+            hurry.set()
+            for future in futures:
+                future.cancel()
+
+        return None, None, mismatched_brand
+
+    @staticmethod
+    def _scrape_brand_after_delay(
+        brand,
+        shoe_article,
+        delay: float,
+        abandoned: threading.Event,
+        hurry: threading.Event,
+    ) -> Optional[ProductData]:
+        # hedging: slower brands only start if the faster ones have not
+        # produced a result within their delay
+        hurry.wait(delay)
+        if abandoned.is_set():
+            return None
+        return ProductService.scrape_product_data(brand, shoe_article)
+
+    @staticmethod
+    def scrape_product_data(brand, shoe_article) -> Optional[ProductData]:
+        """
+        Product data of a brand, served from the scrape result cache when
+        it was scraped recently.
+        """
+        with timing.timed_scrape(shoe_article), timing.brand_scrape(brand):
+            return ProductDataCache.get_or_scrape(
+                brand,
+                shoe_article,
+                lambda: ProductService.scrape_product_data_uncached(
+                    brand, shoe_article
+                ),
+            )
+
+    @staticmethod
+    def scrape_product_data_uncached(brand, shoe_article) -> Optional[ProductData]:
+        """
+        Run the scrapers and parser of a brand, without touching the
+        database. Raises CircuitOpenError while the breakers of all of
+        the brand's scrapers are open.
+        """
+        with timing.timed_scrape(shoe_article), timing.brand_scrape(brand):
+            scrape_paths = brand_scrape_paths[brand]
+            for scraper, setup_class in scrape_paths[:-1]:
+                try:
+                    return ProductService._scrape_with_breaker(
+                        scraper, setup_class, shoe_article
+                    )
+                except (ValueError, ConnectionError, CircuitOpenError) as e:
+                    print(
+                        f"{scraper.__name__} failed with error: {e}. "
+                        f"Falling back to Selenium..."
+                    )
+                    timing.fallback("selenium")
+
+            scraper, setup_class = scrape_paths[-1]
+            return ProductService._scrape_with_breaker(
+                scraper, setup_class, shoe_article
+            )
+
+    @staticmethod
+    def _scrape_with_breaker(
+            scraper, setup_class, shoe_article
+    ) -> Optional[ProductData]:
+        """
+        Scrape and parse the article with one scraper, its outcome counted
+        by the scraper's breaker.
+        """
+        breaker = scraper_breakers[scraper.__name__]
+        token = breaker.allow()
+        if token is None:
+            raise CircuitOpenError(
+                f"{scraper.__name__} is skipped after repeated scraping failures"
+            )
+
+        started_at = time.monotonic()
+        product_data = None
+        # an article the site doesn't list still means the scraper works
+        succeeded = False
+        # a full grid or an exhausted driver pool in this process says
+        # nothing about the brand's site
+        turned_away = False
+        try:
+            parser = setup_class(shoe_article).initialize_parser()
+            product_data = parser.get_product_data()
+            succeeded = bool(product_data)
+            return product_data
+        except ProductNotFoundError:
+            succeeded = True
+            raise
+        except (GridAdmissionTimeout, DriverPoolTimeout):
+            turned_away = True
+            raise
+        finally:
+            elapsed = time.monotonic() - started_at
+            if succeeded:
+                breaker.record_success(elapsed)
+            elif not turned_away:
+                breaker.record_failure(elapsed, token)
+
+    @staticmethod
+    def content_hash(fields: dict) -> str:
+        """Fingerprint of the Shoe fields written from a scrape."""
+        # prices as Decimal strings, so 130, 130.0 and "130" hash the same
+        normalized = {
+            name: (
+                str(value.quantize(Decimal("0.01")))
+                if isinstance(value, Decimal)
+                else value
+            )
+            for name, value in fields.items()
+        }
+        return hashlib.sha256(
+            json.dumps(normalized, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
     @staticmethod
     def get_and_save_product_data(
         parser, user_profile, parse_from
@@ -140,6 +530,22 @@ class ProductService:
         try:
             # Get product data from the parser instance
             product_data = parser.get_product_data()
+        except Exception as e:
+            print(f"Error with scraper {parse_from}: {e}")
+            return None, False
+
+        return ProductService.save_product_data(
+            product_data, user_profile, parse_from
+        )
+
+    @staticmethod
+    def save_product_data(
+        product_data, user_profile, parse_from
+    ) -> Tuple[Optional[Shoe], bool]:
+        """
+        Save scraped product data to the database and the user's profile.
+        """
+        try:
             product_data["parsed_from"] = parse_from  # Set parsed_from field
 
             sale_price = (
@@ -149,25 +555,69 @@ class ProductService:
             )
             price = Decimal(product_data["price"]) if product_data["price"] else None
 
-            # Check if the product already exists in the database
+            # Check if the product already exists in the database. Callers
+            # waiting on the same scrape save at the same time, the lock
+            # keeps them from creating the row twice
             article = product_data["article"]
-            shoe, created = Shoe.objects.update_or_create(
-                article=article,
-                defaults={
-                    "name": product_data["name"],
-                    "sale_price": sale_price,
-                    "price": price,
-                    "sizes": product_data["sizes"],
-                    "url": product_data["url"],
-                    "description": product_data["description"],
-                    "image": product_data["image"],
-                    "parsed_from": parse_from,
-                },
-            )
+            defaults = {
+                "name": product_data["name"],
+                "sale_price": sale_price,
+                "price": price,
+                "sizes": product_data["sizes"],
+                "url": product_data["url"],
+                "description": product_data["description"],
+                "image": product_data["image"],
+                "parsed_from": parse_from,
+            }
+            content_hash = ProductService.content_hash(defaults)
+
+            timer = timing.current_timer()
+            if timer:
+                timer.brand = parse_from
+
+            with timing.stage("write"), cache.lock(f"shoe_save:{article}", timeout=30):
+                # nothing changed since the last write: no UPDATE, no
+                # post_save handlers and no search re-index
+                shoe = (
+                    Shoe.objects.filter(article=article, content_hash=content_hash)
+                    .order_by("pk")
+                    .first()
+                )
+                if shoe:
+                    created = False
+                    metrics.incr(WRITES_METRICS_NAMESPACE, "skipped")
+                else:
+                    previous_prices = (
+                        Shoe.objects.filter(article=article)
+                        .order_by("pk")
+                        .values_list("price", "sale_price")
+                        .first()
+                    )
+                    shoe, created = Shoe.objects.update_or_create(
+                        article=article,
+                        defaults={**defaults, "content_hash": content_hash},
+                    )
+                    metrics.incr(WRITES_METRICS_NAMESPACE, "applied")
+
+                    if previous_prices and previous_prices != (price, sale_price):
+                        old_price, old_sale_price = previous_prices
+                        # consumers must find the new prices in the database
+                        transaction.on_commit(
+                            partial(
+                                price_change_stream.publish,
+                                shoe.pk,
+                                old_price,
+                                price,
+                                old_sale_price,
+                                sale_price,
+                            )
+                        )
 
-            # Add the scraped article to the user's profile
-            user_profile.scraped_articles.add(shoe)
-            print(f"Saving product for user profile: {user_profile}")
+            # Add the scraped article to the user's profile, background
+            # refreshes save without one
+            if user_profile:
+                user_profile.scraped_articles.add(shoe)
+                print(f"Saving product for user profile: {user_profile}")
             return shoe, created
         except Exception as e:
             # Log the error for debugging
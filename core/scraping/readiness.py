@@ -0,0 +1,69 @@
+import logging
+import time
+from typing import Iterable, Tuple
+
+from selenium.common import TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from core.redis_utils import metrics
+
+logger = logging.getLogger(__name__)
+
+Locator = Tuple[str, str]
+
+
+class PageReadiness:
+    """
+    Waits for the elements a page is read for instead of sleeping a
+    fixed amount of time after driver.get.
+
+    Every wait is recorded under the `page_readiness` metrics namespace
+    per page kind, so the ceiling can be tuned from real load times.
+    """
+
+    METRICS_NAMESPACE = "page_readiness"
+
+    def __init__(self, timeout: float, poll_frequency: float) -> None:
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+
+    def wait(
+            self,
+            driver,
+            page_kind: str,
+            locators: Iterable[Locator],
+            alternatives: Iterable[Locator] = (),
+    ) -> float:
+        """
+        Block until every locator is present, or any of the alternatives
+        is (e.g. the marker of a search without results), or the timeout
+        passes. Returns the time the page took to become ready. A
+        timeout is recorded but not raised, the caller parses whatever
+        was loaded.
+        """
+        condition = EC.all_of(
+            *[EC.presence_of_element_located(loc) for loc in locators]
+        )
+        if alternatives:
+            condition = EC.any_of(
+                condition,
+                *[EC.presence_of_element_located(loc) for loc in alternatives],
+            )
+        started_at = time.monotonic()
+        try:
+            WebDriverWait(
+                driver, self.timeout, poll_frequency=self.poll_frequency
+            ).until(condition)
+        except TimeoutException:
+            elapsed = time.monotonic() - started_at
+            logger.warning(
+                f"{page_kind} page not ready after {elapsed:.2f}s, "
+                f"parsing partially loaded page"
+            )
+            metrics.incr(self.METRICS_NAMESPACE, f"{page_kind}.timeouts")
+            return elapsed
+
+        elapsed = time.monotonic() - started_at
+        metrics.observe(self.METRICS_NAMESPACE, page_kind, elapsed)
+        return elapsed
@@ -0,0 +1,97 @@
+import logging
+import uuid
+from typing import List, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from redis import RedisError
+
+from core.redis_utils.rate_limiter import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def user_group_name(user_id) -> str:
+    """Channels group every ws/scrape/ connection of a user joins."""
+    return f"scrape_user_{user_id}"
+
+
+class ScrapeJobs:
+    """
+    Scrape jobs run by the Celery worker instead of inside a request.
+
+    Jobs are deduplicated by article and brands: while a job for them is
+    queued or running, further requests subscribe to it and get its id.
+    A request for other brands scrapes other sites, and gets its own job.
+    Every subscriber gets the shoe added to their profile and the result
+    pushed to their ws/scrape/ connections.
+    """
+
+    @staticmethod
+    def _dedup_key(article: str, parse_from: List[str]) -> str:
+        # the order is kept, the brands are tried in it
+        return f"scrape_job:article:{article}:{','.join(parse_from)}"
+
+    @staticmethod
+    def _subscribers_key(job_id: str) -> str:
+        return f"scrape_job:{job_id}:users"
+
+    @staticmethod
+    def enqueue(article: str, parse_from: List[str], user_id) -> Tuple[str, bool]:
+        """Return the job id for the article and whether it was newly queued."""
+        from core.tasks import scrape_article_job
+
+        job_id = uuid.uuid4().hex
+        if cache.add(
+                ScrapeJobs._dedup_key(article, parse_from),
+                job_id,
+                timeout=settings.SCRAPE_JOB_DEDUP_TTL,
+        ):
+            ScrapeJobs.subscribe(job_id, user_id)
+            scrape_article_job.apply_async(args=(article, parse_from), task_id=job_id)
+            return job_id, True
+
+        existing_job_id = cache.get(ScrapeJobs._dedup_key(article, parse_from))
+        if existing_job_id is None:
+            # the running job finished in the meantime
+            return ScrapeJobs.enqueue(article, parse_from, user_id)
+        ScrapeJobs.subscribe(existing_job_id, user_id)
+        return existing_job_id, False
+
+    @staticmethod
+    def finish(article: str, parse_from: List[str]) -> None:
+        cache.delete(ScrapeJobs._dedup_key(article, parse_from))
+
+    @staticmethod
+    def subscribe(job_id: str, user_id) -> None:
+        key = ScrapeJobs._subscribers_key(job_id)
+        pipe = redis_client.pipeline()
+        pipe.sadd(key, user_id)
+        pipe.expire(key, settings.SCRAPE_JOB_RESULT_TTL)
+        pipe.execute()
+
+    @staticmethod
+    def subscribers(job_id: str) -> List[int]:
+        return [int(user_id) for user_id in redis_client.smembers(
+            ScrapeJobs._subscribers_key(job_id)
+        )]
+
+    @staticmethod
+    def is_subscriber(job_id: str, user_id) -> bool:
+        return bool(redis_client.sismember(
+            ScrapeJobs._subscribers_key(job_id), user_id
+        ))
+
+    @staticmethod
+    def push_result(user_ids: List[int], payload: dict) -> None:
+        channel_layer = get_channel_layer()
+        for user_id in user_ids:
+            try:
+                async_to_sync(channel_layer.group_send)(
+                    user_group_name(user_id),
+                    {"type": "scrape.result", "payload": payload},
+                )
+            except (RedisError, OSError) as e:
+                logger.warning(f"Failed to push scrape result to user {user_id}: {e}")
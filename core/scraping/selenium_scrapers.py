@@ -1,17 +1,20 @@
-import time
 from abc import ABC, abstractmethod
 from collections import namedtuple
-from typing import TypedDict, Optional
+from typing import TypedDict, Optional, Iterable
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from django.conf import settings
 from selenium import webdriver
-from selenium.common import NoSuchElementException
+from selenium.common import NoSuchElementException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 
 from SneakSyncHub.settings import env
 from core.formatting.sizes import Formatter
-from core.scraping.base import ScraperBase
+from core.redis_utils.grid_scheduler import GridScheduler
+from core.scraping import timing
+from core.scraping.base import ProductNotFoundError, ScraperBase
+from core.scraping.readiness import PageReadiness
 
 
 class ProductData(TypedDict):
@@ -38,10 +41,57 @@ html_identifiers_tuple = namedtuple(
     ],
 )
 
+# everything the parser needs from a single pass of NikeProductScraper
+scraped_pages_tuple = namedtuple(
+    "ScrapedPages",
+    [
+        "search_result_page",
+        "product_url",
+        "product_page",
+    ],
+)
+
+
+# Every session opened on the grid takes one of its slots, callers
+# queue for a free one instead of oversubscribing the grid
+grid_scheduler = GridScheduler(
+    name="selenium",
+    slots=settings.SELENIUM_GRID_SLOTS,
+    admission_timeout=settings.SELENIUM_GRID_ADMISSION_TIMEOUT,
+    slot_ttl=settings.SELENIUM_GRID_SLOT_TTL,
+)
+
 
 class WebDriver:
-    def __init__(self):
+    # Lightweight profile: the scrapers only read text and attributes, so
+    # nothing is downloaded for images, fonts, media or trackers
+    LIGHTWEIGHT_PREFS = {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.media_stream": 2,
+        "profile.managed_default_content_settings.notifications": 2,
+        "profile.managed_default_content_settings.geolocation": 2,
+    }
+    LIGHTWEIGHT_ARGUMENTS = [
+        "--blink-settings=imagesEnabled=false",
+        "--disable-remote-fonts",
+        "--autoplay-policy=user-gesture-required",
+        "--mute-audio",
+    ]
+
+    def __init__(
+            self, lightweight: Optional[bool] = None, brand: Optional[str] = None
+    ):
         self.driver: webdriver.Remote | None = None
+        # the brand decides the session's place in the grid queue
+        self.brand = brand
+        self.grid_slot: Optional[str] = None
+        # set once the session went through site specific preparation
+        # (e.g. Nike country selector), see DriverPool
+        self.is_warm: bool = False
+        self.lightweight: bool = (
+            settings.SELENIUM_LIGHTWEIGHT_PROFILE if lightweight is None
+            else lightweight
+        )
         self.__setup()
 
     def __setup(self) -> None:
@@ -55,52 +105,177 @@ class WebDriver:
         )
         # Create Chrome options and set the user agent
         driver_options.add_argument(f"user-agent={user_agent}")
-        # Headless mode for Firefox
+        if self.lightweight:
+            self.__apply_lightweight_profile(driver_options)
 
-        self.driver = webdriver.Remote(
-            command_executor=f"http://" f'{env("SELENIUM_HOST")}:4444/wd/hub',
-            options=driver_options,
+        # raises GridAdmissionTimeout when the grid stays full
+        self.grid_slot = grid_scheduler.acquire(
+            priority=settings.SELENIUM_GRID_BRAND_PRIORITY.get(self.brand, 0)
         )
-        self.driver.maximize_window()
+        try:
+            self.driver = webdriver.Remote(
+                command_executor=f"http://" f'{env("SELENIUM_HOST")}:4444/wd/hub',
+                options=driver_options,
+            )
+        except Exception:
+            grid_scheduler.release(self.grid_slot)
+            self.grid_slot = None
+            raise
+        if self.lightweight:
+            self.driver.set_window_size(*settings.SELENIUM_WINDOW_SIZE)
+        else:
+            self.driver.maximize_window()
+
+    @classmethod
+    def __apply_lightweight_profile(cls, driver_options: Options) -> None:
+        driver_options.add_experimental_option("prefs", cls.LIGHTWEIGHT_PREFS)
+        for argument in cls.LIGHTWEIGHT_ARGUMENTS:
+            driver_options.add_argument(argument)
+
+        # webdriver.Remote can't send CDP commands to block URLs, so
+        # tracker hosts are made unresolvable instead
+        if settings.SELENIUM_BLOCKED_HOSTS:
+            host_rules = ", ".join(
+                f"MAP {host} ~NOTFOUND" for host in settings.SELENIUM_BLOCKED_HOSTS
+            )
+            driver_options.add_argument(f"--host-resolver-rules={host_rules}")
+
+        width, height = settings.SELENIUM_WINDOW_SIZE
+        driver_options.add_argument(f"--window-size={width},{height}")
+        # return once the DOM is there, the readiness waits cover the
+        # rest and subresources are not waited for
+        driver_options.page_load_strategy = "eager"
+
+    def is_alive(self) -> bool:
+        # cheapest round trip to the grid that fails on a dead session
+        try:
+            _ = self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def mark_failed(self) -> None:
+        # a standalone session is closed after every scrape anyway
+        pass
+
+    def touch_grid_slot(self) -> None:
+        # pooled sessions hold their slot across many scrapes
+        grid_scheduler.touch(self.grid_slot)
 
     def quit(self) -> None:
-        if self.driver:
-            self.driver.quit()
+        try:
+            if self.driver:
+                self.driver.quit()
+        finally:
+            grid_scheduler.release(self.grid_slot)
+            self.grid_slot = None
 
 
 # Beautiful Soup4 manager
 class BSManager:
+    # tree builders the extraction methods of ParserBase are written
+    # against, lxml is a C parser and several times faster on full pages
+    PARSER_BACKENDS = ("lxml", "html.parser")
+
     @staticmethod
-    def get_parsed_page(page_source: str) -> BeautifulSoup:
-        soup = BeautifulSoup(page_source, "html.parser")
+    def get_parsed_page(
+            page_source: str,
+            parser: Optional[str] = None,
+            parse_only: Optional[SoupStrainer] = None,
+    ) -> BeautifulSoup:
+        parser = parser or settings.HTML_PARSER_BACKEND
+        if parser not in BSManager.PARSER_BACKENDS:
+            raise ValueError(
+                f"Unknown HTML parser backend '{parser}', "
+                f"expected one of {BSManager.PARSER_BACKENDS}"
+            )
+        soup = BeautifulSoup(page_source, parser, parse_only=parse_only)
         return soup
 
+    @staticmethod
+    def get_region_strainer(
+            ids: Iterable[str] = (),
+            classes: Iterable[str] = (),
+            test_ids: Iterable[str] = (),
+    ) -> SoupStrainer:
+        """
+        Build a SoupStrainer that keeps only the elements matching one of
+        the given ids, classes or data-testid values, together with
+        their whole subtree. Everything else is dropped while parsing.
+        """
+        ids, classes, test_ids = set(ids), set(classes), set(test_ids)
+
+        def is_region(name, attrs) -> bool:
+            if not attrs:
+                return False
+            # while parsing, class is still the raw attribute string
+            element_classes = attrs.get("class") or []
+            if isinstance(element_classes, str):
+                element_classes = element_classes.split()
+            return (
+                attrs.get("id") in ids
+                or attrs.get("data-testid") in test_ids
+                or not classes.isdisjoint(element_classes)
+            )
+
+        return SoupStrainer(is_region)
+
 
 class NikeProductScraper(ScraperBase):
     brand = "Nike"
     is_api_based = False
     _SEARCH_URL_TEMPLATE = "https://www.nike.com/w?q={0}&vst={1}"
+    # elements that have to be rendered before a page is parsed
+    _READY_LOCATORS = {
+        "search": [(By.CLASS_NAME, "product-card__body")],
+        "product": [
+            (By.ID, "price-container"),
+            (By.CLASS_NAME, "pdp-grid-selector-grid"),
+        ],
+    }
+    # pages that are done rendering without those elements: a search
+    # for an article Nike doesn't list
+    _EMPTY_PAGE_LOCATORS = {
+        "search": [(By.CLASS_NAME, "nr-nav-container")],
+    }
+    _page_readiness = PageReadiness(
+        timeout=settings.PAGE_READY_TIMEOUT,
+        poll_frequency=settings.PAGE_READY_POLL_INTERVAL,
+    )
 
     def __init__(self, driver: WebDriver, article: str):
         self._driver = driver
-        self._setup()
+        if not driver.is_warm:
+            self._setup()
+        self._article = article
         self._product_url: str = ""
         self._search_page_url = self.__compose_search_page_url(article)
         self._search_result_page = self._set_search_result_page()
         self.product_page = self._set_product_page()
 
-    def scrape_page_source(self, url: str) -> str:
-        self._driver.driver.get(url)
-        time.sleep(2)
-        page_source = self._driver.driver.page_source
+    def scrape_page_source(self, url: str, page_kind: str) -> str:
+        with timing.stage(f"{page_kind}_page"):
+            self._driver.driver.get(url)
+            self._page_readiness.wait(
+                self._driver.driver,
+                page_kind,
+                self._READY_LOCATORS[page_kind],
+                self._EMPTY_PAGE_LOCATORS.get(page_kind, ()),
+            )
+            page_source = self._driver.driver.page_source
         return page_source
 
     def _setup(self):
+        with timing.stage("country_gate"):
+            self.pass_country_gate(self._driver)
+
+    @staticmethod
+    def pass_country_gate(driver: WebDriver) -> None:
         # nike will ask for country when entered, choose US to
         # proceed scraping
-        self._driver.driver.get("https://www.nike.com")
+        driver.driver.get("https://www.nike.com")
         try:
-            USA_country_element = self._driver.driver.find_element(
+            USA_country_element = driver.driver.find_element(
                 By.XPATH,
                 "/html[1]/body[1]/div[6]/div[1]/div[1]/div[1]/div["
                 "1]/section[1]/div[2]/div[2]/div[1]/ul[2]/li[10]/a["
@@ -114,18 +289,25 @@ class NikeProductScraper(ScraperBase):
         #  Retrieves the HTML source of the search result page,
         #  parses it using BeautifulSoup and returns the parsed HTML
         search_result_page_source = self.scrape_page_source(
-            self._search_page_url)
-        parsed_search_result_page_source = BSManager.get_parsed_page(
-            search_result_page_source
-        )
+            self._search_page_url, "search")
+        with timing.stage("search_page_soup"):
+            parsed_search_result_page_source = BSManager.get_parsed_page(
+                search_result_page_source,
+                parse_only=NikeProductParser.SEARCH_PAGE_REGIONS,
+            )
         return parsed_search_result_page_source
 
     def _set_product_page(self) -> BeautifulSoup:
         # extract product page source code with WebDriver to get
         # access to product details
         self._product_url = self._extract_product_url()
-        product_page_source = self.scrape_page_source(self._product_url)
-        product_page = BSManager.get_parsed_page(product_page_source)
+        product_page_source = self.scrape_page_source(
+            self._product_url, "product")
+        with timing.stage("product_page_soup"):
+            product_page = BSManager.get_parsed_page(
+                product_page_source,
+                parse_only=NikeProductParser.PRODUCT_PAGE_REGIONS,
+            )
         return product_page
 
     def __compose_search_page_url(self, article) -> str:
@@ -139,6 +321,8 @@ class NikeProductScraper(ScraperBase):
         first_matching_product = self._search_result_page.find(
             "div", {"class": NikeProductParser.HTML_IDENTIFIERS.product_card_id}
         )
+        if first_matching_product is None:
+            raise ProductNotFoundError(f"No Nike search results for {self._article}")
         product_url = first_matching_product.find("a", href=True)["href"]
         return product_url
 
@@ -146,6 +330,14 @@ class NikeProductScraper(ScraperBase):
     def product_url(self) -> str:
         return self._product_url
 
+    @property
+    def scraped_pages(self) -> scraped_pages_tuple:
+        return scraped_pages_tuple(
+            search_result_page=self._search_result_page,
+            product_url=self._product_url,
+            product_page=self.product_page,
+        )
+
 
 class ParserBase(ABC):
     _SEARCH_PAGE_URL_TEMPLATE: str
@@ -172,7 +364,10 @@ class ParserBase(ABC):
 
     @abstractmethod
     def _extract_and_format_product_price(self):
-        """Extract the product price"""
+        """
+        Extract the full price and the sale price, which is only set
+        while the product is discounted
+        """
         pass
 
     @abstractmethod
@@ -202,8 +397,7 @@ class ParserBase(ABC):
 
     def __compose_product_info(self) -> None:
         try:
-            product_price,initial_product_price = (
-                self._extract_and_format_product_price())
+            product_price, sale_price = self._extract_and_format_product_price()
             product_sizes = self._extract_product_sizes()
             product_image = self._extract_product_image_url()
             product_description = self._extract_product_description()
@@ -216,7 +410,7 @@ class ParserBase(ABC):
                 "article": self.article,
                 "name": name,
                 "price": product_price,
-                "sale_price": initial_product_price,
+                "sale_price": sale_price,
                 "sizes": available_sizes,
                 "description": product_description,
                 "image": product_image,
@@ -224,10 +418,13 @@ class ParserBase(ABC):
         except Exception as e:
             print(f"Error occurred while scraping product {self.article}: {e}")
         finally:
+            # the soup is not needed once the product info is composed
+            self._product_page = None
             self._driver.quit()
 
     def get_product_data(self) -> ProductData:
-        self.__compose_product_info()
+        with timing.stage("parse"):
+            self.__compose_product_info()
         return self.__product_info
 
 
@@ -241,15 +438,30 @@ class NikeProductParser(ParserBase):
         product_description_id="product-description",
         product_details_id="benefit-section",
     )
+    # the only parts of the pages the extraction methods read
+    SEARCH_PAGE_REGIONS = BSManager.get_region_strainer(
+        classes=[HTML_IDENTIFIERS.product_card_id],
+    )
+    PRODUCT_PAGE_REGIONS = BSManager.get_region_strainer(
+        ids=[
+            HTML_IDENTIFIERS.product_price_id,
+            HTML_IDENTIFIERS.product_image_id,
+        ],
+        classes=[HTML_IDENTIFIERS.product_sizes_id],
+        test_ids=[HTML_IDENTIFIERS.product_description_id],
+    )
 
-    def __init__(self, article, driver: WebDriver, product_page) -> None:
-        nike_scraper = NikeProductScraper(driver, article)
+    def __init__(
+            self, article, driver: WebDriver, scraped_pages: scraped_pages_tuple
+    ) -> None:
+        # pages come from the NikeProductScraper run of the same request,
+        # so nothing is loaded again here
         super().__init__(
             article,
-            product_page,
+            scraped_pages.product_page,
             self.HTML_IDENTIFIERS,
             driver,
-            nike_scraper.product_url,
+            scraped_pages.product_url,
         )
 
     def _extract_product_sizes(self):
@@ -304,7 +516,11 @@ class NikeProductParser(ParserBase):
             else None
         )
 
-        return current_price, initial_price
+        # the initial price is only shown next to a discounted one,
+        # prices follow the model: price is the full price
+        if initial_price is not None:
+            return initial_price, current_price
+        return current_price, None
 
     def _extract_product_description(self):
         # extract product description
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# routed to the JSON stdout handler, see LOGGING
+logger = logging.getLogger("scrape_timing")
+
+_current_timer: ContextVar[Optional["ScrapeTimer"]] = ContextVar(
+    "scrape_timer", default=None
+)
+# the brand stages are attributed to while a brand is being scraped
+_current_brand: ContextVar[Optional[str]] = ContextVar(
+    "scrape_timer_brand", default=None
+)
+
+
+class ScrapeTimer:
+    """
+    Durations of the stages of one article scrape, across every brand
+    tried for it. Fan-out brands run in other threads and record into
+    the same timer, hence the lock.
+    """
+
+    def __init__(self, article: str) -> None:
+        self.article = article
+        # brand whose data was saved
+        self.brand: Optional[str] = None
+        self.outcome: Optional[str] = None
+        self.stages: dict = {}
+        self.brands: dict = {}
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+
+    def add_stage(self, name: str, seconds: float, brand: Optional[str]) -> None:
+        with self._lock:
+            stages = self._brand(brand)["stages"] if brand else self.stages
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def add_fallback(self, name: str, brand: Optional[str]) -> None:
+        with self._lock:
+            self._brand(brand or "unknown")["fallbacks"][name] = True
+
+    def finish_brand(self, brand: str, outcome: str, seconds: float) -> None:
+        with self._lock:
+            self._brand(brand).update(outcome=outcome, duration=seconds)
+
+    def record(self) -> dict:
+        with self._lock:
+            return {
+                "article": self.article,
+                "brand": self.brand,
+                "outcome": self.outcome,
+                "duration": time.monotonic() - self._started_at,
+                "stages": dict(self.stages),
+                # fan-out brands still running when the scrape ended
+                # are abandoned
+                "brands": {
+                    brand: {
+                        "outcome": "unfinished",
+                        **values,
+                        "stages": dict(values["stages"]),
+                        "fallbacks": dict(values["fallbacks"]),
+                    }
+                    for brand, values in self.brands.items()
+                },
+            }
+
+    def _brand(self, brand: str) -> dict:
+        # keys end up as field names in Elasticsearch
+        return self.brands.setdefault(
+            brand.lower(), {"stages": {}, "fallbacks": {}}
+        )
+
+
+def current_timer() -> Optional[ScrapeTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def timed_scrape(article: str) -> Iterator[ScrapeTimer]:
+    """
+    Time an article scrape and log its record when done. Nested calls
+    join the scrape already being timed, only the outermost one logs.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        yield timer
+        return
+
+    timer = ScrapeTimer(article)
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    except Exception:
+        timer.outcome = timer.outcome or "error"
+        raise
+    finally:
+        _current_timer.reset(token)
+        timer.outcome = timer.outcome or "ok"
+        record = timer.record()
+        logger.info(
+            f"Scraped {article}: {record['outcome']} in {record['duration']:.3f}s",
+            extra={"fields": {"event.dataset": "scrape_timing", "scrape": record}},
+        )
+
+
+@contextmanager
+def brand_scrape(brand: str) -> Iterator[None]:
+    """
+    Attribute the stages run inside to `brand`, and record how the
+    brand's scrape ended: "ok" or the name of the exception it raised.
+    """
+    timer = _current_timer.get()
+    if timer is None or _current_brand.get() == brand:
+        yield
+        return
+
+    token = _current_brand.set(brand)
+    started_at = time.monotonic()
+    outcome = "ok"
+    try:
+        yield
+    except Exception as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        _current_brand.reset(token)
+        timer.finish_brand(brand, outcome, time.monotonic() - started_at)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current scrape, does nothing outside of one."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+
+    started_at = time.monotonic()
+    try:
+        yield
+    finally:
+        timer.add_stage(name, time.monotonic() - started_at, _current_brand.get())
+
+
+def fallback(name: str) -> None:
+    """Flag that the current brand fell back, e.g. from its API to Selenium."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_fallback(name, _current_brand.get())
@@ -1,30 +1,203 @@
 from datetime import date
 
 from celery import shared_task
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, When
 
 from core.models import Shoe
-from core.models import ShoePriceHistory
-from core.telegram_bot.bot import notify_user
-from members.models import ShoeNotificationPreference
+from core.models import ShoePriceHistory, ShoePriceRollup
+from core.scraping.product_cache import ProductDataCache
+from core.scraping.product_service import ProductService, price_change_stream
+from core.scraping.scrape_jobs import ScrapeJobs
+from core.telegram_bot.notifications import notify_price_alert
+from members.models import ShoeNotificationPreference, UserProfile
+from restapi.serializers import ShoeSerializer
+
+# consumer group of the price change stream that evaluates price alerts
+PRICE_ALERTS_GROUP = "price_alerts"
+
+
+# Lowest, highest and last price of every shoe per period, from the
+# price runs overlapping the periods of %(start)s through %(end)s. The
+# period containing %(end)s is closed at its price on that day
+ROLLUP_SQL = """
+WITH bounds AS (
+    SELECT date_trunc(%(period)s, %(start)s::timestamp)::date AS first_day,
+           %(end)s::date AS last_day
+)
+INSERT INTO {rollup_table}
+    (shoe_id, period, period_start, min_price, max_price, close_price)
+SELECT history.shoe_id, %(period)s, periods.period_start::date,
+       MIN(history.price), MAX(history.price),
+       (ARRAY_AGG(history.price ORDER BY history.valid_from DESC))[1]
+FROM {history_table} AS history
+CROSS JOIN bounds
+CROSS JOIN LATERAL generate_series(
+    date_trunc(
+        %(period)s, GREATEST(history.valid_from, bounds.first_day)::timestamp
+    ),
+    date_trunc(
+        %(period)s,
+        LEAST(COALESCE(history.valid_to - 1, bounds.last_day), bounds.last_day)::timestamp
+    ),
+    ('1 ' || %(period)s)::interval
+) AS periods (period_start)
+WHERE history.valid_from <= bounds.last_day
+  AND (history.valid_to IS NULL OR history.valid_to > bounds.first_day)
+GROUP BY history.shoe_id, periods.period_start
+ON CONFLICT (shoe_id, period, period_start) DO UPDATE
+SET min_price = EXCLUDED.min_price,
+    max_price = EXCLUDED.max_price,
+    close_price = EXCLUDED.close_price
+WHERE ({rollup_table}.min_price, {rollup_table}.max_price, {rollup_table}.close_price)
+      IS DISTINCT FROM (EXCLUDED.min_price, EXCLUDED.max_price, EXCLUDED.close_price)
+"""
 
 
 @shared_task
 def update_price_history():
+    """
+    Record today's price of every shoe whose price changed since its
+    current run started: the run is closed and a new one starts today.
+    Shoes seen for the first time start their first run. A run started
+    today is left as it is. Returns the number of runs started.
+    """
+    history_table = connection.ops.quote_name(ShoePriceHistory._meta.db_table)
+    shoe_table = connection.ops.quote_name(Shoe._meta.db_table)
     today = date.today()
-    shoes = Shoe.objects.all()
-    for shoe in shoes:
-        ShoePriceHistory.objects.create(
-            shoe=shoe, price=shoe.price, date_recorded=today
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {history_table} AS history SET valid_to = %s "
+            f"FROM {shoe_table} AS shoe "
+            f"WHERE history.shoe_id = shoe.id AND history.valid_to IS NULL "
+            f"AND history.valid_from < %s AND history.price <> shoe.price",
+            [today, today],
+        )
+        cursor.execute(
+            f"INSERT INTO {history_table} (shoe_id, price, valid_from) "
+            f"SELECT id, price, %s FROM {shoe_table} "
+            f"ON CONFLICT (shoe_id) WHERE valid_to IS NULL DO NOTHING",
+            [today],
+        )
+        started = cursor.rowcount
+
+        refresh_price_rollups(today, today)
+    return started
+
+
+def refresh_price_rollups(start, end):
+    """
+    Recompute the weekly and monthly rollups of the periods of `start`
+    through `end`. Rollups that come out the same aren't written.
+    """
+    rollup_sql = ROLLUP_SQL.format(
+        rollup_table=connection.ops.quote_name(ShoePriceRollup._meta.db_table),
+        history_table=connection.ops.quote_name(ShoePriceHistory._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        for period, _ in ShoePriceRollup.PERIOD_CHOICES:
+            cursor.execute(rollup_sql, {"period": period, "start": start, "end": end})
+
+
+def price_alert_matches():
+    """
+    Preferences whose desired price their shoe has reached, loaded with
+    everything notify_price_alert needs.
+    """
+    return (
+        ShoeNotificationPreference.objects.select_related("user", "user__user", "shoe")
+        .annotate(
+            # the sale price when it is below the price, as notified
+            effective_price=Case(
+                When(shoe__sale_price__lt=F("shoe__price"), then=F("shoe__sale_price")),
+                default=F("shoe__price"),
+            )
+        )
+        # only users with a linked Telegram account, "" and NULL excluded
+        .filter(
+            effective_price__lte=F("desired_price"),
+            user__user__telegram_chat_id__gt="",
         )
+    )
 
 
 @shared_task
 def check_price_updates():
-    shoes = Shoe.objects.all()
-    for shoe in shoes:
-        preferences = ShoeNotificationPreference.objects.filter(shoe=shoe)
-        for preference in preferences:
-            if shoe.sale_price and shoe.sale_price <= preference.desired_price:
-                notify_user(preference.user, shoe)
-            elif shoe.price <= preference.desired_price:
-                notify_user(preference.user, shoe)
+    """
+    Notify every user whose desired price a watched shoe has reached.
+    Matching runs as one query over the preferences, shoes nobody
+    watches are never read.
+    """
+    for preference in price_alert_matches().iterator(chunk_size=500):
+        notify_price_alert(preference)
+
+
+@shared_task(bind=True)
+def process_price_changes(self):
+    """
+    Evaluate price alerts for the shoes whose price dropped since the
+    last run, as published by ProductService when scrapes are saved.
+    """
+    consumer = self.request.hostname or "worker"
+    while True:
+        changes = price_change_stream.read(
+            PRICE_ALERTS_GROUP, consumer, settings.PRICE_CHANGES_BATCH_SIZE
+        )
+        if not changes:
+            return
+
+        dropped = {change.shoe_id for change in changes if change.is_drop}
+        if dropped:
+            for preference in price_alert_matches().filter(shoe_id__in=dropped):
+                notify_price_alert(preference)
+        price_change_stream.ack(PRICE_ALERTS_GROUP, changes)
+
+
+@shared_task
+def refresh_product_data(brand, article):
+    """Scrape an article again after its cache entry went stale."""
+    try:
+        product_data = ProductService.scrape_product_data_uncached(brand, article)
+        ProductDataCache.store(brand, article, product_data)
+        if product_data and product_data["article"] == article:
+            ProductService.save_product_data(product_data, None, brand)
+    finally:
+        ProductDataCache.finish_refresh(brand, article)
+
+
+@shared_task(bind=True)
+def scrape_article_job(self, article, parse_from):
+    """
+    Scrape an article for every user subscribed to the job and push the
+    result to their ws/scrape/ connections.
+    """
+    job_id = self.request.id
+    try:
+        new_article, error_response, status_code = ProductService.scrape_article(
+            article, parse_from, None
+        )
+    finally:
+        # requests coming in from now on start a new job
+        ScrapeJobs.finish(article, parse_from)
+
+    user_ids = ScrapeJobs.subscribers(job_id)
+    if new_article:
+        for user_profile in UserProfile.objects.filter(user_id__in=user_ids):
+            user_profile.scraped_articles.add(new_article)
+        payload = {
+            "job_id": job_id,
+            "article": article,
+            "status": "success",
+            "data": ShoeSerializer(new_article).data,
+        }
+    else:
+        payload = {
+            "job_id": job_id,
+            "article": article,
+            "status": "error",
+            "error": error_response.get("statusText", "Unknown error"),
+        }
+
+    ScrapeJobs.push_result(user_ids, payload)
+    return payload
@@ -0,0 +1,1186 @@
+import json
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from selenium.webdriver.support.ui import WebDriverWait
+
+from core.benchmarks.stand_in import (
+    StandInBrowser,
+    StandInSite,
+    StandInWebDriver,
+    load_fixture,
+)
+from core.models import Shoe, ShoePriceHistory
+from core.redis_utils.circuit_breaker import CircuitBreaker
+from core.redis_utils.price_changes import PriceChangeStream
+from core.redis_utils.rate_limiter import redis_client
+from core.redis_utils.single_flight import SingleFlight, SingleFlightLeaderError
+from core.scraping import product_service
+from core.scraping.api_scrapers import (
+    APIClient,
+    AdidasProductScraper,
+    NikeAPIParser,
+    NikeAPIScraper,
+)
+from core.scraping.base import ProductNotFoundError
+from core.scraping.driver_pool import DriverPool, DriverPoolTimeout
+from core.scraping.product_cache import ProductDataCache
+from core.scraping.product_service import NikeSeleniumSetup, ProductService
+from core.scraping.scrape_jobs import ScrapeJobs
+from core.scraping.selenium_scrapers import NikeProductScraper
+from core.tasks import price_alert_matches, update_price_history
+from core.views import BatchFetchShoesView, ShoePriceHistoryView, ShoesView
+from members.models import CustomUser, ShoeNotificationPreference, UserProfile
+from restapi.serializers import ShoeSerializer
+
+ADIDAS_ARTICLE = "IF8068"
+NIKE_ARTICLE = "FB9658-400"
+NIKE_PRODUCT_PATH = f"/t/air-max-90-mens-shoes-6n3vKB/{NIKE_ARTICLE}"
+
+
+def create_shoe(article=NIKE_ARTICLE, price=Decimal("130"), **fields):
+    fields.setdefault("parsed_from", "nike")
+    return Shoe.objects.create(
+        name="Nike Air Max 90",
+        price=price,
+        url=f"https://www.nike.com{NIKE_PRODUCT_PATH}",
+        image="https://static.nike.com/a/images/t_default/air-max-90.png",
+        article=article,
+        description="",
+        **fields,
+    )
+
+
+class RecordingBrowser(StandInBrowser):
+    """StandInBrowser that remembers every URL it was sent to."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.visited = []
+
+    def get(self, url: str) -> None:
+        self.visited.append(url)
+        super().get(url)
+
+
+class RecordingWebDriver(StandInWebDriver):
+    def __init__(self, base_url: str, is_warm: bool) -> None:
+        super().__init__(is_warm=is_warm, base_url=base_url)
+        self.driver = RecordingBrowser(base_url=base_url)
+
+
+class NikeSeleniumPageLoadsTests(SimpleTestCase):
+    """Every Nike page is loaded once per article, parsing loads none."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.site = StandInSite().start()
+        # the browser sends every nike.com URL to the stand-in
+        cls.site.add_html("/w", "nike_search.html")
+        cls.site.add_html(NIKE_PRODUCT_PATH, "nike_product.html")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.site.stop()
+        super().tearDownClass()
+
+    def scrape(self, is_warm: bool) -> RecordingWebDriver:
+        web_driver = RecordingWebDriver(self.site.base_url, is_warm)
+        with mock.patch.object(
+                product_service.nike_driver_pool, "lease", return_value=web_driver
+        ):
+            product_data = (
+                NikeSeleniumSetup(NIKE_ARTICLE).initialize_parser().get_product_data()
+            )
+        self.assertEqual(product_data["article"], NIKE_ARTICLE)
+        return web_driver
+
+    def test_cold_session_loads_country_gate_search_and_product_page(self):
+        web_driver = self.scrape(is_warm=False)
+        self.assertEqual(len(web_driver.driver.visited), 3)
+
+    def test_warm_session_skips_the_country_gate(self):
+        web_driver = self.scrape(is_warm=True)
+        self.assertEqual(len(web_driver.driver.visited), 2)
+        self.assertIn("/w?q=", web_driver.driver.visited[0])
+        self.assertIn(NIKE_PRODUCT_PATH, web_driver.driver.visited[1])
+
+
+class NikeSearchWithoutResultsTests(SimpleTestCase):
+    def test_miss_fails_without_waiting_for_product_cards(self):
+        with StandInSite() as site:
+            site.add_html("/w", "nike_search_no_results.html")
+            web_driver = RecordingWebDriver(site.base_url, is_warm=True)
+
+            started_at = time.perf_counter()
+            with self.assertRaises(ProductNotFoundError):
+                NikeProductScraper(web_driver, ADIDAS_ARTICLE)
+            elapsed = time.perf_counter() - started_at
+
+        self.assertLess(elapsed, NikeProductScraper._page_readiness.timeout / 2)
+        self.assertEqual(len(web_driver.driver.visited), 1)
+
+
+class AdidasConcurrentFetchTests(SimpleTestCase):
+    """Product info and availability are requested at the same time."""
+
+    LATENCY = 0.5
+
+    def test_fetch_takes_one_round_trip(self):
+        with StandInSite(latency=self.LATENCY) as site:
+            site.add_json(f"/api/products/{ADIDAS_ARTICLE}", "adidas_product.json")
+            site.add_json(
+                f"/api/products/{ADIDAS_ARTICLE}/availability",
+                "adidas_availability.json",
+            )
+
+            class StandInAdidasScraper(AdidasProductScraper):
+                _SEARCH_URL_TEMPLATE = f"{site.base_url}/api/products/{{article}}"
+
+            api_client = APIClient(name="test", referer=site.base_url)
+            scraper = StandInAdidasScraper(ADIDAS_ARTICLE, api_client)
+            # connect first, so only the requests themselves are timed
+            scraper.fetch_product_info_and_sizes()
+
+            started_at = time.perf_counter()
+            product_info, product_sizes = scraper.fetch_product_info_and_sizes()
+            elapsed = time.perf_counter() - started_at
+            api_client.close()
+
+        self.assertEqual(product_info["id"], ADIDAS_ARTICLE)
+        self.assertTrue(product_sizes["variation_list"])
+        self.assertEqual(site.requests_served, 4)
+        # sequential requests would take two round trips
+        self.assertGreaterEqual(elapsed, self.LATENCY)
+        self.assertLess(elapsed, 1.5 * self.LATENCY)
+
+
+class AdidasNotFoundFallbackTests(SimpleTestCase):
+    """An API 404 is checked against the product pages."""
+
+    def scrape(self, site, method):
+        class StandInAdidasScraper(AdidasProductScraper):
+            _SEARCH_URL_TEMPLATE = f"{site.base_url}/api/products/{{article}}"
+
+        web_driver = RecordingWebDriver(base_url=site.base_url, is_warm=True)
+        pool = DriverPool(
+            name="test-adidas",
+            size=1,
+            lease_timeout=5,
+            max_uses=10,
+            max_idle=60,
+            driver_factory=lambda: web_driver,
+        )
+        api_client = APIClient(name="test", referer=site.base_url)
+        self.addCleanup(api_client.close)
+        scraper = StandInAdidasScraper(ADIDAS_ARTICLE, api_client, pool)
+        return getattr(scraper, method)(), web_driver.driver.visited
+
+    def test_a_404_falls_back_to_the_product_page(self):
+        with StandInSite() as site:
+            product_info, visited = self.scrape(site, "fetch_product_info")
+
+        self.assertEqual(visited, [f"{site.base_url}/api/products/{ADIDAS_ARTICLE}"])
+        # the page is whatever the browser was shown
+        self.assertEqual(product_info, {"all_text": "not found"})
+
+    def test_an_article_the_pages_dont_list_either_is_not_found(self):
+        def short_wait(driver, timeout):
+            return WebDriverWait(driver, 0.1)
+
+        with StandInSite() as site, mock.patch(
+            "core.scraping.api_scrapers.WebDriverWait", side_effect=short_wait
+        ):
+            with self.assertRaises(ProductNotFoundError):
+                self.scrape(site, "fetch_product_sizes")
+
+
+class NikeAPIParserTests(SimpleTestCase):
+    """Parsing of the product feed fixture, which lists two colorways."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.product_feed = json.loads(load_fixture("nike_product_feed.json"))
+
+    def parse(self, article: str) -> dict:
+        return NikeAPIParser(article, self.product_feed).get_product_data()
+
+    def test_fields(self):
+        product_data = self.parse(NIKE_ARTICLE)
+        self.assertEqual(product_data["article"], NIKE_ARTICLE)
+        self.assertEqual(product_data["name"], "Nike Air Max 90")
+        self.assertEqual(
+            product_data["url"], f"https://www.nike.com{NIKE_PRODUCT_PATH}"
+        )
+        self.assertEqual(
+            product_data["image"],
+            "https://static.nike.com/a/images/t_default/"
+            "air-max-90-mens-shoes-6n3vKB.png",
+        )
+        self.assertTrue(product_data["description"].startswith("Nothing as fly"))
+
+    def test_sizes_are_the_available_ones_in_feed_order(self):
+        self.assertEqual(
+            self.parse(NIKE_ARTICLE)["sizes"], ["8", "9", "9.5", "10", "12"]
+        )
+
+    def test_discounted_colorway_has_full_price_and_sale_price(self):
+        product_data = self.parse(NIKE_ARTICLE)
+        self.assertEqual(Decimal(product_data["price"]), Decimal("130"))
+        self.assertEqual(Decimal(product_data["sale_price"]), Decimal("103.97"))
+
+    def test_full_price_colorway_has_no_sale_price(self):
+        product_data = self.parse("FB9658-002")
+        self.assertEqual(Decimal(product_data["price"]), Decimal("130"))
+        self.assertEqual(product_data["sale_price"], "")
+        self.assertEqual(product_data["sizes"], ["10"])
+
+    def test_colorway_missing_from_the_feed(self):
+        with self.assertRaises(ProductNotFoundError):
+            self.parse("FB9658-999")
+
+    def test_prices_match_the_selenium_parser(self):
+        # an article switching between the two paths keeps its prices
+        with StandInSite() as site:
+            site.add_html("/w", "nike_search.html")
+            site.add_html(NIKE_PRODUCT_PATH, "nike_product.html")
+            web_driver = RecordingWebDriver(site.base_url, is_warm=True)
+            with mock.patch.object(
+                    product_service.nike_driver_pool,
+                    "lease",
+                    return_value=web_driver,
+            ):
+                page_data = (
+                    NikeSeleniumSetup(NIKE_ARTICLE)
+                    .initialize_parser()
+                    .get_product_data()
+                )
+
+        feed_data = self.parse(NIKE_ARTICLE)
+        for field in ("price", "sale_price"):
+            self.assertEqual(Decimal(page_data[field]), Decimal(feed_data[field]))
+        self.assertEqual(page_data["sizes"], feed_data["sizes"])
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs the core migrations from `migrate_from` to `migrate_to`."""
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        super().setUp()
+        self.migrate(self.migrate_from)
+
+    def tearDown(self):
+        # back to the latest migration for the other tests
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def migrate(self, name: str):
+        """Migrate core to `name` and return the app registry as of it."""
+        executor = MigrationExecutor(connection)
+        executor.migrate([("core", name)])
+        executor.loader.build_graph()
+        return executor.loader.project_state([("core", name)]).apps
+
+
+class NikeFullPriceFirstMigrationTests(MigrationTestCase):
+    migrate_from = "0014_price_history_runs_and_rollups"
+    migrate_to = "0015_nike_full_price_first"
+
+    # the schema of 0014 is the current one, shoes are created as usual
+
+    def assertPrices(self, shoe, price, sale_price):
+        shoe.refresh_from_db()
+        self.assertEqual((shoe.price, shoe.sale_price), (price, sale_price))
+
+    def test_discounted_nike_shoes_get_the_full_price_first(self):
+        discounted = create_shoe(price="103.97", sale_price="130")
+        full_price = create_shoe(price="130")
+        adidas = create_shoe(price="130", sale_price="103.97", parsed_from="adidas")
+
+        self.migrate(self.migrate_to)
+
+        self.assertPrices(discounted, Decimal("130"), Decimal("103.97"))
+        self.assertPrices(full_price, Decimal("130"), None)
+        self.assertPrices(adidas, Decimal("130"), Decimal("103.97"))
+
+    def test_unapplying_restores_the_current_price_first(self):
+        self.migrate(self.migrate_to)
+        discounted = create_shoe(price="130", sale_price="103.97")
+
+        self.migrate(self.migrate_from)
+
+        self.assertPrices(discounted, Decimal("103.97"), Decimal("130"))
+
+
+class SizesArrayMigrationTests(MigrationTestCase):
+    migrate_from = "0011_shoe_content_hash"
+    migrate_to = "0012_shoe_sizes_array"
+
+    def create_shoes(self, *sizes):
+        Shoe = self.migrate(self.migrate_from).get_model("core", "Shoe")
+        return [
+            Shoe.objects.create(
+                name="Nike Air Max 90",
+                price=Decimal("130"),
+                url=f"https://www.nike.com{NIKE_PRODUCT_PATH}",
+                image="https://static.nike.com/a/images/t_default/air-max-90.png",
+                article=f"FB9658-{number:03}",
+                description="",
+                sizes=text,
+            ).pk
+            for number, text in enumerate(sizes)
+        ]
+
+    def sizes(self, pks, name):
+        Shoe = self.migrate(name).get_model("core", "Shoe")
+        return [Shoe.objects.get(pk=pk).sizes for pk in pks]
+
+    def test_the_stored_lists_become_arrays(self):
+        pks = self.create_shoes("['40', '40.5']", "[42, 43.5]", "40, 40.5", "[]", "")
+
+        self.assertEqual(
+            self.sizes(pks, self.migrate_to),
+            [["40", "40.5"], ["42", "43.5"], ["40", "40.5"], [], []],
+        )
+
+    def test_malformed_sizes_become_empty(self):
+        pks = self.create_shoes("['40', '40.5'", "sizes: 40", "{'40': 1}", "None")
+
+        self.assertEqual(self.sizes(pks, self.migrate_to), [[], [], [], []])
+
+    def test_unapplying_stores_the_lists_as_text(self):
+        pks = self.create_shoes("['40', '40.5']")
+        self.migrate(self.migrate_to)
+
+        self.assertEqual(self.sizes(pks, self.migrate_from), ["['40', '40.5']"])
+
+
+class ShoesSizeFilterTests(TestCase):
+    def setUp(self):
+        self.shoes = [
+            create_shoe(article="FB9658-001", sizes=["9", "10"]),
+            create_shoe(article="FB9658-002", sizes=["11"]),
+            create_shoe(article="FB9658-003", sizes=[]),
+        ]
+        self.user = CustomUser.objects.create_user("sizes@example.com", "password")
+
+    def get(self, query):
+        request = APIRequestFactory().get(f"/api/shoes{query}")
+        force_authenticate(request, user=self.user)
+        response = ShoesView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return sorted(shoe["article"] for shoe in response.data)
+
+    def test_shoes_with_any_of_the_sizes_are_listed(self):
+        self.assertEqual(self.get("?size=10,12"), ["FB9658-001"])
+        self.assertEqual(self.get("?size= 11 , 9"), ["FB9658-001", "FB9658-002"])
+
+    def test_sizes_are_matched_exactly(self):
+        self.assertEqual(self.get("?size=1"), [])
+
+    def test_without_a_size_every_shoe_is_listed(self):
+        self.assertEqual(
+            self.get(""), ["FB9658-001", "FB9658-002", "FB9658-003"]
+        )
+
+
+class ShoePriceHistoryViewTests(TestCase):
+    def setUp(self):
+        self.shoe = create_shoe()
+        for valid_from, valid_to, price in (
+                (date(2026, 9, 1), date(2026, 9, 10), "130"),
+                (date(2026, 9, 10), date(2026, 10, 1), "103.97"),
+                (date(2026, 10, 1), None, "120"),
+        ):
+            ShoePriceHistory.objects.create(
+                shoe=self.shoe, price=price, valid_from=valid_from, valid_to=valid_to
+            )
+        self.user = CustomUser.objects.create_user("chart@example.com", "password")
+
+    def get(self, **query_params):
+        request = APIRequestFactory().get("/price-history", query_params)
+        force_authenticate(request, user=self.user)
+        return ShoePriceHistoryView.as_view()(request, shoe_article=NIKE_ARTICLE)
+
+    def test_shoe_responses_leave_the_history_to_the_charts(self):
+        self.assertNotIn("price_history", ShoeSerializer(self.shoe).data)
+
+    def test_all_runs(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [run["price"] for run in response.data], ["130.00", "103.97", "120.00"]
+        )
+        self.assertEqual(response.data[0]["date_recorded"], "2026-09-01")
+        self.assertIsNone(response.data[-1]["valid_to"])
+
+    def test_runs_overlapping_the_range(self):
+        # the first run ends the day the range starts
+        response = self.get(start="2026-09-10", end="2026-09-30")
+        self.assertEqual([run["price"] for run in response.data], ["103.97"])
+
+        response = self.get(start="2026-09-20")
+        self.assertEqual(
+            [run["price"] for run in response.data], ["103.97", "120.00"]
+        )
+
+    def test_invalid_range(self):
+        self.assertEqual(self.get(start="last week").status_code, 400)
+
+
+class SingleFlightTests(SimpleTestCase):
+    KEY = "IF8068"
+    LOCK_KEY = f"single_flight:test:{KEY}:lock"
+
+    def setUp(self):
+        self.flight = SingleFlight(
+            namespace="test", lease_timeout=5, wait_timeout=5, poll_interval=0.01
+        )
+        redis_client.delete(self.LOCK_KEY)
+
+    def tearDown(self):
+        redis_client.delete(self.LOCK_KEY)
+
+    def test_an_expired_lease_taken_over_is_left_to_its_new_leader(self):
+        def call_outliving_its_lease():
+            redis_client.set(self.LOCK_KEY, "next-leader")
+            return "product data"
+
+        self.assertEqual(
+            self.flight.do(self.KEY, call_outliving_its_lease), "product data"
+        )
+        self.assertEqual(redis_client.get(self.LOCK_KEY), "next-leader")
+
+    def test_the_lease_is_released_after_the_call(self):
+        self.flight.do(self.KEY, lambda: None)
+        self.assertFalse(redis_client.exists(self.LOCK_KEY))
+
+    def test_waiters_raise_when_the_leader_fails(self):
+        leading = threading.Event()
+        fail = threading.Event()
+        leader_errors = []
+
+        def failing_scrape():
+            leading.set()
+            fail.wait(5)
+            raise ConnectionError("connection reset")
+
+        def lead():
+            try:
+                self.flight.do(self.KEY, failing_scrape)
+            except ConnectionError as e:
+                leader_errors.append(e)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        leading.wait(5)
+        waiter_calls = []
+        threading.Timer(0.1, fail.set).start()
+        with self.assertRaisesRegex(SingleFlightLeaderError, "connection reset"):
+            self.flight.do(self.KEY, lambda: waiter_calls.append(1))
+        leader.join(5)
+
+        self.assertEqual(len(leader_errors), 1)
+        self.assertEqual(waiter_calls, [])
+
+
+class PriceChangeStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.stream = PriceChangeStream("test_price_changes", maxlen=100, claim_idle=60)
+        redis_client.delete(self.stream.key)
+
+    def tearDown(self):
+        redis_client.delete(self.stream.key)
+
+    def test_changes_published_before_the_first_read_are_read(self):
+        self.stream.publish(1, Decimal("130"), Decimal("120"), None, None)
+
+        changes = self.stream.read("alerts", "worker", count=10)
+
+        self.assertEqual([change.shoe_id for change in changes], [1])
+        self.assertTrue(changes[0].is_drop)
+        self.stream.ack("alerts", changes)
+        self.assertEqual(redis_client.xpending(self.stream.key, "alerts")["pending"], 0)
+
+
+def create_breaker(name: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(
+        name=f"test:{name}",
+        failure_threshold=2,
+        open_timeout=60,
+        probe_timeout=60,
+        window=10,
+    )
+    breaker.reset()
+    return breaker
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = create_breaker("probe")
+
+    def tearDown(self):
+        self.breaker.reset()
+
+    def open_for_probing(self):
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.record_failure(1.0, self.breaker.allow())
+        # as if open_timeout had passed
+        redis_client.hset(self.breaker._state_key, "opened_at", 0)
+
+    def test_a_straggler_failing_leaves_the_probe_running(self):
+        straggler = self.breaker.allow()
+        self.open_for_probing()
+        probe = self.breaker.allow()
+        self.assertIsNotNone(probe)
+
+        self.breaker.record_failure(1.0, straggler)
+
+        # still probing: nobody else is let through, and the breaker
+        # wasn't opened again
+        self.assertIsNone(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["state"], "half_open")
+        self.breaker.record_success(1.0)
+        self.assertEqual(self.breaker.stats()["state"], "closed")
+
+    def test_a_failed_probe_opens_the_breaker_again(self):
+        self.open_for_probing()
+        probe = self.breaker.allow()
+
+        self.breaker.record_failure(1.0, probe)
+
+        self.assertIsNone(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["state"], "open")
+
+
+class ScraperBreakerTests(SimpleTestCase):
+    """Every scraper a brand is read with counts against its own breaker."""
+
+    PRODUCT_DATA = {"article": NIKE_ARTICLE, "price": "130"}
+
+    def setUp(self):
+        self.breakers = {
+            scraper.__name__: create_breaker(scraper.__name__)
+            for scraper in (NikeAPIScraper, NikeProductScraper)
+        }
+        self.feed_calls = []
+        self.page_calls = []
+        test_case = self
+
+        class FailingFeedSetup:
+            def __init__(self, article):
+                test_case.feed_calls.append(article)
+                raise ConnectionError("feed unavailable")
+
+        class PageSetup:
+            def __init__(self, article):
+                test_case.page_calls.append(article)
+
+            def initialize_parser(self):
+                return mock.Mock(get_product_data=lambda: dict(test_case.PRODUCT_DATA))
+
+        patches = (
+            mock.patch.object(product_service, "scraper_breakers", self.breakers),
+            mock.patch.dict(
+                product_service.brand_scrape_paths,
+                {
+                    "Nike": [
+                        (NikeAPIScraper, FailingFeedSetup),
+                        (NikeProductScraper, PageSetup),
+                    ]
+                },
+            ),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        for breaker in self.breakers.values():
+            breaker.reset()
+
+    def scrape(self):
+        return ProductService.scrape_product_data_uncached("Nike", NIKE_ARTICLE)
+
+    def test_a_fallback_is_counted_against_the_scraper_that_ran(self):
+        self.assertEqual(self.scrape(), self.PRODUCT_DATA)
+
+        api_stats = self.breakers["NikeAPIScraper"].stats()
+        page_stats = self.breakers["NikeProductScraper"].stats()
+        self.assertEqual((api_stats["calls"], api_stats["success_rate"]), (1, 0))
+        self.assertEqual((page_stats["calls"], page_stats["success_rate"]), (1, 1))
+
+    def test_an_open_api_breaker_goes_straight_to_the_pages(self):
+        for _ in range(2):
+            self.scrape()
+
+        self.assertEqual(self.breakers["NikeAPIScraper"].stats()["state"], "open")
+        self.assertEqual(self.scrape(), self.PRODUCT_DATA)
+        self.assertEqual(len(self.feed_calls), 2)
+        self.assertEqual(len(self.page_calls), 3)
+        self.assertEqual(self.breakers["NikeProductScraper"].stats()["state"], "closed")
+
+
+class BrandFanoutTests(SimpleTestCase):
+    """scrape_first_match keeps the first matching brand and drops the rest."""
+
+    def setUp(self):
+        self.started = []
+        self.finished = {brand: threading.Event() for brand in ("Adidas", "Nike")}
+        self.scrapers = {}
+        scrape_after_delay = ProductService._scrape_brand_after_delay
+
+        def scrape_product_data(brand, shoe_article):
+            self.started.append(brand)
+            return self.scrapers[brand](shoe_article)
+
+        def scrape_brand_after_delay(brand, *args):
+            try:
+                return scrape_after_delay(brand, *args)
+            finally:
+                self.finished[brand].set()
+
+        patches = (
+            mock.patch.object(
+                ProductService, "scrape_product_data", side_effect=scrape_product_data
+            ),
+            mock.patch.object(
+                ProductService,
+                "_scrape_brand_after_delay",
+                side_effect=scrape_brand_after_delay,
+            ),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def wait_for_brands(self):
+        for finished in self.finished.values():
+            self.assertTrue(finished.wait(5))
+
+    def test_the_first_match_abandons_the_hedged_brands(self):
+        self.scrapers["Adidas"] = lambda article: {"article": article}
+
+        with self.settings(
+            SCRAPING_BRAND_PRIORITY=["Adidas", "Nike"],
+            SCRAPING_BRAND_START_DELAYS={"Nike": 5},
+        ):
+            product_data, brand, mismatched_brand = ProductService.scrape_first_match(
+                ADIDAS_ARTICLE, ["Nike", "Adidas"]
+            )
+
+        self.assertEqual(product_data, {"article": ADIDAS_ARTICLE})
+        self.assertEqual((brand, mismatched_brand), ("Adidas", None))
+        self.wait_for_brands()
+        self.assertEqual(self.started, ["Adidas"])
+
+    def test_a_failure_starts_the_next_brand_without_its_delay(self):
+        def failing_scraper(article):
+            raise ConnectionError("feed unavailable")
+
+        self.scrapers["Nike"] = failing_scraper
+        self.scrapers["Adidas"] = lambda article: {"article": article}
+
+        started_at = time.monotonic()
+        with self.settings(
+            SCRAPING_BRAND_PRIORITY=["Nike", "Adidas"],
+            # the first brand has no one to hedge behind
+            SCRAPING_BRAND_START_DELAYS={"Nike": 5, "Adidas": 5},
+        ):
+            _, brand, _ = ProductService.scrape_first_match(
+                NIKE_ARTICLE, ["Adidas", "Nike"]
+            )
+
+        self.assertEqual(brand, "Adidas")
+        self.assertLess(time.monotonic() - started_at, 5)
+        self.assertEqual(self.started, ["Nike", "Adidas"])
+
+    def test_a_mismatched_article_is_reported(self):
+        self.scrapers["Adidas"] = lambda article: {"article": ADIDAS_ARTICLE}
+        self.scrapers["Nike"] = lambda article: None
+
+        with self.settings(
+            SCRAPING_BRAND_PRIORITY=["Adidas", "Nike"],
+            SCRAPING_BRAND_START_DELAYS={},
+        ):
+            result = ProductService.scrape_first_match(
+                NIKE_ARTICLE, ["Adidas", "Nike"]
+            )
+
+        self.assertEqual(result, (None, None, "Adidas"))
+
+    def test_the_losing_brand_returns_its_driver_to_the_pool(self):
+        pool = DriverPool(
+            name="test-fanout",
+            size=1,
+            lease_timeout=5,
+            max_uses=10,
+            max_idle=60,
+            driver_factory=StandInWebDriver,
+            reap_interval=60,
+        )
+        self.addCleanup(pool.close)
+        leased = threading.Event()
+        outpaced = threading.Event()
+
+        def slow_scraper(article):
+            web_driver = pool.lease()
+            leased.set()
+            try:
+                outpaced.wait(5)
+                return {"article": article}
+            finally:
+                web_driver.quit()
+
+        def fast_scraper(article):
+            leased.wait(5)
+            return {"article": article}
+
+        self.scrapers["Nike"] = slow_scraper
+        self.scrapers["Adidas"] = fast_scraper
+
+        with self.settings(
+            SCRAPING_BRAND_PRIORITY=["Adidas", "Nike"],
+            SCRAPING_BRAND_START_DELAYS={},
+        ):
+            _, brand, _ = ProductService.scrape_first_match(
+                NIKE_ARTICLE, ["Adidas", "Nike"]
+            )
+
+        self.assertEqual(brand, "Adidas")
+        self.assertEqual(pool.stats()["in_use"], 1)
+        outpaced.set()
+        self.wait_for_brands()
+        self.assertEqual(pool.stats(), {"size": 1, "created": 1, "in_use": 0, "idle": 1})
+
+
+class ScrapeJobDedupTests(SimpleTestCase):
+    """Requests share a job only when they scrape the same brands."""
+
+    def setUp(self):
+        patch = mock.patch("core.tasks.scrape_article_job.apply_async")
+        self.apply_async = patch.start()
+        self.addCleanup(patch.stop)
+
+    def enqueue(self, parse_from, user_id=1):
+        self.addCleanup(ScrapeJobs.finish, NIKE_ARTICLE, parse_from)
+        return ScrapeJobs.enqueue(NIKE_ARTICLE, parse_from, user_id)
+
+    def test_the_same_brands_share_a_job(self):
+        job_id, created = self.enqueue(["Nike"], user_id=1)
+        shared_job_id, shared = self.enqueue(["Nike"], user_id=2)
+
+        self.assertEqual((shared_job_id, created, shared), (job_id, True, False))
+        self.assertEqual(sorted(ScrapeJobs.subscribers(job_id)), [1, 2])
+        self.assertEqual(self.apply_async.call_count, 1)
+
+    def test_other_brands_get_their_own_job(self):
+        job_id, _ = self.enqueue(["Nike"])
+        other_job_id, created = self.enqueue(["Adidas", "Nike"])
+
+        self.assertNotEqual(other_job_id, job_id)
+        self.assertTrue(created)
+        self.apply_async.assert_called_with(
+            args=(NIKE_ARTICLE, ["Adidas", "Nike"]), task_id=other_job_id
+        )
+
+
+class UnchangedScrapeWriteTests(TestCase):
+    """A scrape that found what is already stored doesn't write."""
+
+    def setUp(self):
+        self.saved = []
+        # the search index is updated from post_save
+        post_save.connect(self.record_save, sender=Shoe)
+        self.addCleanup(post_save.disconnect, self.record_save, sender=Shoe)
+
+    def record_save(self, instance, **kwargs):
+        self.saved.append(instance.pk)
+
+    @staticmethod
+    def scraped(**fields):
+        return {
+            "article": NIKE_ARTICLE,
+            "name": "Nike Air Max 90",
+            "price": "130",
+            "sale_price": "",
+            "sizes": ["9", "10"],
+            "url": f"https://www.nike.com{NIKE_PRODUCT_PATH}",
+            "description": "",
+            "image": "https://static.nike.com/a/images/t_default/air-max-90.png",
+            **fields,
+        }
+
+    def save(self, product_data):
+        with CaptureQueriesContext(connection) as queries:
+            shoe, created = ProductService.save_product_data(product_data, None, "nike")
+        updates = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "core_shoe"')
+        ]
+        return shoe, updates
+
+    def test_an_identical_scrape_is_not_written(self):
+        shoe, _ = self.save(self.scraped())
+        self.saved.clear()
+
+        same_shoe, updates = self.save(self.scraped())
+
+        self.assertEqual(same_shoe.pk, shoe.pk)
+        self.assertEqual(updates, [])
+        self.assertEqual(self.saved, [])
+
+    def test_a_changed_price_is_written(self):
+        shoe, _ = self.save(self.scraped())
+        self.saved.clear()
+
+        _, updates = self.save(self.scraped(sale_price="99.99"))
+
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.saved, [shoe.pk])
+        shoe.refresh_from_db()
+        self.assertEqual(shoe.sale_price, Decimal("99.99"))
+
+    def test_prices_hash_the_same_however_they_were_written(self):
+        hashes = {
+            ProductService.content_hash({"price": price, "sale_price": None})
+            for price in (Decimal("130"), Decimal("130.0"), Decimal("130.00"))
+        }
+
+        self.assertEqual(len(hashes), 1)
+        self.assertNotEqual(
+            hashes.pop(),
+            ProductService.content_hash({"price": Decimal("130.01"), "sale_price": None}),
+        )
+
+
+class PriceHistorySnapshotTests(TestCase):
+    def setUp(self):
+        self.shoe = create_shoe(price=Decimal("130"))
+        self.today = date.today()
+
+    def runs(self):
+        return list(
+            self.shoe.price_history.values_list("price", "valid_from", "valid_to")
+        )
+
+    def test_a_rerun_starts_nothing(self):
+        self.assertEqual(update_price_history(), 1)
+        runs = self.runs()
+
+        self.assertEqual(update_price_history(), 0)
+        self.assertEqual(self.runs(), runs)
+        self.assertEqual(runs, [(Decimal("130"), self.today, None)])
+
+    def test_a_price_change_closes_the_run_and_starts_one(self):
+        yesterday = self.today - timedelta(days=1)
+        ShoePriceHistory.objects.create(
+            shoe=self.shoe, price=Decimal("150"), valid_from=yesterday
+        )
+
+        self.assertEqual(update_price_history(), 1)
+        self.assertEqual(
+            self.runs(),
+            [
+                (Decimal("150"), yesterday, self.today),
+                (Decimal("130"), self.today, None),
+            ],
+        )
+
+    def test_an_unchanged_price_keeps_its_run(self):
+        started = self.today - timedelta(days=30)
+        ShoePriceHistory.objects.create(
+            shoe=self.shoe, price=Decimal("130"), valid_from=started
+        )
+
+        self.assertEqual(update_price_history(), 0)
+        self.assertEqual(self.runs(), [(Decimal("130"), started, None)])
+
+
+class PriceAlertMatchTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="alerts@example.com", password="password"
+        )
+        UserProfile.objects.filter(user=self.user).update(telegram_chat_id="42")
+
+    def matches(self, desired_price, **shoe_fields):
+        shoe = create_shoe(price=Decimal("130"), **shoe_fields)
+        preference = ShoeNotificationPreference.objects.create(
+            user=self.user, shoe=shoe, desired_price=desired_price
+        )
+        return list(price_alert_matches()) == [preference]
+
+    def test_the_price_is_matched_without_a_sale_price(self):
+        self.assertTrue(self.matches(Decimal("130")))
+
+    def test_a_price_above_the_desired_one_is_not_matched(self):
+        self.assertFalse(self.matches(Decimal("129.99")))
+
+    def test_the_sale_price_is_matched(self):
+        self.assertTrue(self.matches(Decimal("100"), sale_price=Decimal("99")))
+
+    def test_a_sale_price_above_the_price_is_ignored(self):
+        self.assertTrue(self.matches(Decimal("130"), sale_price=Decimal("150")))
+
+    def test_users_without_telegram_are_not_matched(self):
+        UserProfile.objects.filter(user=self.user).update(telegram_chat_id="")
+
+        self.assertFalse(self.matches(Decimal("130")))
+
+
+class ClosingWebDriver(StandInWebDriver):
+    """StandInWebDriver that remembers whether it was quit."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.closed = False
+
+    def quit(self) -> None:
+        self.closed = True
+        super().quit()
+
+
+class DriverPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.web_drivers = []
+        self.grid_waiters = 0
+
+    def closed(self):
+        return [web_driver.closed for web_driver in self.web_drivers]
+
+    def create_pool(self, **options):
+        def driver_factory():
+            web_driver = ClosingWebDriver()
+            self.web_drivers.append(web_driver)
+            return web_driver
+
+        options = {
+            "size": 2,
+            "lease_timeout": 5,
+            "max_uses": 10,
+            "max_idle": 60,
+            "reap_interval": 60,
+            **options,
+        }
+        pool = DriverPool(
+            name="test",
+            driver_factory=driver_factory,
+            grid_waiters=lambda: self.grid_waiters,
+            **options,
+        )
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_a_released_session_is_leased_again(self):
+        pool = self.create_pool()
+        pool.lease().quit()
+        session = pool.lease()
+
+        self.assertEqual(session.uses, 2)
+        self.assertEqual(len(self.web_drivers), 1)
+        self.assertEqual(pool.stats(), {"size": 2, "created": 1, "in_use": 1, "idle": 0})
+
+    def test_failed_and_worn_out_sessions_are_closed_on_release(self):
+        pool = self.create_pool(max_uses=1)
+        failed = pool.lease()
+        failed.mark_failed()
+        failed.quit()
+        pool.lease().quit()
+
+        self.assertEqual(self.closed(), [True, True])
+        self.assertEqual(pool.stats()["created"], 0)
+
+    def test_a_lease_waits_for_a_release(self):
+        pool = self.create_pool(size=1)
+        session = pool.lease()
+        threading.Timer(0.1, session.quit).start()
+
+        self.assertIs(pool.lease(), session)
+
+    def test_an_exhausted_pool_times_out(self):
+        pool = self.create_pool(size=1, lease_timeout=0.1)
+        pool.lease()
+
+        with self.assertRaises(DriverPoolTimeout):
+            pool.lease()
+
+    def test_the_reaper_closes_expired_sessions(self):
+        pool = self.create_pool(max_idle=0.05)
+        pool.lease().quit()
+        time.sleep(0.1)
+
+        pool.reap()
+
+        self.assertEqual(self.closed(), [True])
+        self.assertEqual(pool.stats(), {"size": 2, "created": 0, "in_use": 0, "idle": 0})
+
+    def test_idle_sessions_make_way_for_grid_waiters(self):
+        pool = self.create_pool()
+        first, second = pool.lease(), pool.lease()
+        first.quit()
+        second.quit()
+
+        self.grid_waiters = 1
+        pool.reap()
+
+        # the least recently used one goes
+        self.assertEqual(self.closed(), [True, False])
+        held = pool.lease()
+        held.quit()
+        # and so does a session released while they wait
+        self.assertEqual(self.closed(), [True, True])
+        self.assertEqual(pool.stats()["idle"], 0)
+
+
+class ProductDataCacheTests(SimpleTestCase):
+    PRODUCT_DATA = {"article": ADIDAS_ARTICLE, "price": "100"}
+
+    def setUp(self):
+        self.key = ProductDataCache.key("Adidas", ADIDAS_ARTICLE)
+        self.scrapes = []
+        patch = mock.patch("core.tasks.refresh_product_data.delay")
+        self.refresh = patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(cache.delete_many, [self.key, f"{self.key}:refreshing"])
+
+    def get(self, product_data=PRODUCT_DATA):
+        def scrape():
+            self.scrapes.append(ADIDAS_ARTICLE)
+            return product_data
+
+        return ProductDataCache.get_or_scrape("Adidas", ADIDAS_ARTICLE, scrape)
+
+    def test_a_miss_is_scraped_once_and_served_from_the_cache(self):
+        self.assertEqual(self.get(), self.PRODUCT_DATA)
+        self.assertEqual(self.get(), self.PRODUCT_DATA)
+
+        self.assertEqual(len(self.scrapes), 1)
+        self.refresh.assert_not_called()
+
+    def test_a_failed_scrape_is_not_cached(self):
+        self.assertIsNone(self.get(product_data=None))
+        self.assertEqual(self.get(), self.PRODUCT_DATA)
+
+        self.assertEqual(len(self.scrapes), 2)
+
+    def test_a_stale_entry_is_served_and_refreshed_once(self):
+        cache.set(
+            self.key,
+            {
+                "data": self.PRODUCT_DATA,
+                "fetched_at": time.time() - settings.PRODUCT_CACHE_FRESH_TTL - 1,
+            },
+        )
+
+        self.assertEqual(self.get(), self.PRODUCT_DATA)
+        self.assertEqual(self.get(), self.PRODUCT_DATA)
+
+        self.assertEqual(self.scrapes, [])
+        self.refresh.assert_called_once_with("Adidas", ADIDAS_ARTICLE)
+
+        # the refresh is done, the next stale read schedules another
+        ProductDataCache.finish_refresh("Adidas", ADIDAS_ARTICLE)
+        self.get()
+        self.assertEqual(self.refresh.call_count, 2)
+
+
+class BatchFetchStreamTests(TestCase):
+    """Known shoes and scrape results come back as one NDJSON line each."""
+
+    def setUp(self):
+        self.known = create_shoe(article="FB9658-001")
+        # saved by the scrape, which is mocked
+        self.scraped = Shoe(
+            name="Nike Air Max 90", price=Decimal("130"), article="FB9658-002"
+        )
+        self.user = CustomUser.objects.create_user("batch@example.com", "password")
+        self.addCleanup(redis_client.delete, f"user:{self.user.id}:rate_limit")
+
+        self.scraping = 0
+        self.most_scraping = 0
+        self.lock = threading.Lock()
+        patch = mock.patch.object(
+            ProductService, "scrape_article", side_effect=self.scrape_article
+        )
+        self.scrape_article = patch.start()
+        self.addCleanup(patch.stop)
+
+    def scrape_article(self, article, parse_from, user_profile):
+        with self.lock:
+            self.scraping += 1
+            self.most_scraping = max(self.most_scraping, self.scraping)
+        try:
+            time.sleep(0.05)
+            if article == self.scraped.article:
+                return self.scraped, None, 200
+            if article == "FB9658-404":
+                return None, {"statusText": "Not found"}, 404
+            raise ConnectionError("feed unavailable")
+        finally:
+            with self.lock:
+                self.scraping -= 1
+
+    def post(self, articles):
+        request = APIRequestFactory().post(
+            "/api/fetch/batch",
+            {"articles": articles, "parse_from": ["Nike"]},
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        return BatchFetchShoesView.as_view()(request)
+
+    def test_every_article_gets_one_line(self):
+        response = self.post(
+            ["FB9658-001", "FB9658-002", " FB9658-002 ", "FB9658-404", "FB9658-500", ""]
+        )
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        # the known shoe first, the scrapes as they finish
+        self.assertEqual(lines[0]["article"], "FB9658-001")
+        statuses = {
+            line["article"]: (line["status"], line.get("status_code")) for line in lines
+        }
+        self.assertEqual(
+            statuses,
+            {
+                "FB9658-001": ("found", None),
+                "FB9658-002": ("scraped", None),
+                "FB9658-404": ("error", 404),
+                "FB9658-500": ("error", 500),
+            },
+        )
+        self.assertEqual(self.scrape_article.call_count, 3)
+
+    def test_scrapes_are_bounded_by_the_concurrency(self):
+        articles = [f"FB9658-5{number:02}" for number in range(6)]
+
+        with self.settings(BATCH_SCRAPE_CONCURRENCY=2):
+            lines = b"".join(self.post(articles).streaming_content).splitlines()
+
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(self.most_scraping, 2)
+
+    def test_an_empty_list_is_rejected(self):
+        self.assertEqual(self.post([" "]).status_code, 400)
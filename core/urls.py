@@ -15,10 +15,21 @@ router = routers.DefaultRouter()
 urlpatterns = [
     path("", views.HomeView.as_view()),
     path("fetch", views.FetchShoesView.as_view()),
+    path("fetch/batch", views.BatchFetchShoesView.as_view()),
+    path("scrape-jobs", views.ScrapeJobView.as_view()),
+    path("scrape-jobs/<str:job_id>", views.ScrapeJobStatusView.as_view()),
     path("shoes", views.ShoesView.as_view()),
     path("shoes/clear", views.ClearUserParsedArticles.as_view()),
     path("shoes/<int:shoe_id>/delete", views.ParsedShoeDeleteAPIView.as_view()),
     path("shoes/<str:shoe_article>", views.ShoeDetailedView.as_view()),
+    path(
+        "shoes/<str:shoe_article>/price-history",
+        views.ShoePriceHistoryView.as_view(),
+    ),
+    path(
+        "shoes/<str:shoe_article>/price-rollups",
+        views.ShoePriceRollupsView.as_view(),
+    ),
     path("shoes/<int:shoe_id>/remove", views.DeleteShoeView.as_view()),
     path("search/<str:query>/", views.ShoeSearchView.as_view()),
     path("suggestions", views.SearchSuggestionView.as_view()),
@@ -38,4 +49,5 @@ urlpatterns = [
         "notification-preferences/",
         UserNotificationPreferencesView.as_view(),
     ),
+    path("ops/metrics", views.ScrapingMetricsView.as_view()),
 ]
@@ -1,8 +1,7 @@
 from typing import List, Dict, Type
 
-from core.scraping.api_scrapers import AdidasProductScraper
+from core.scraping.api_scrapers import AdidasProductScraper, NikeAPIScraper
 from core.scraping.base import ScraperBase
-from core.scraping.selenium_scrapers import NikeProductScraper
 from members.models import UserProfile
 
 lorem_ipsum = (
@@ -20,7 +19,7 @@ lorem_ipsum = (
 
 scrapers_mapping = {
     "Adidas": AdidasProductScraper,
-    "Nike": NikeProductScraper,
+    "Nike": NikeAPIScraper,
 }
 
 
@@ -1,26 +1,51 @@
+import json
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import lorem
+from celery.result import AsyncResult
+from django.conf import settings
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import F
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404  # type: ignore
 from elasticsearch_dsl.query import Q
 from rest_framework import generics
 from rest_framework import status, permissions
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from core.auth.auth_utils import HttponlyCookieAuthentication
-from core.models import Shoe, ShoesNews
+from core.models import Shoe, ShoePriceRollup, ShoesNews
 from core.utils import get_user_profile, filter_api_based_brands, scrapers_mapping
 from members.models import UserProfile, CustomUser, ShoeNotificationPreference
 from restapi.serializers import (
     ShoeSerializer,
+    ShoePriceHistorySerializer,
+    ShoePriceRollupSerializer,
     ShoesNewsSerializer,
     ShoeNotificationPreferenceSerializer,
 )
 from .documents import ShoeDocument
+from .redis_utils import metrics
 from .redis_utils.rate_limiter import rate_limit
-from .scraping.product_service import ProductService, NikeSetup, AdidasSetup
+from .scraping import timing
+from .scraping.product_cache import ProductDataCache
+from .scraping.scrape_jobs import ScrapeJobs
+from .scraping.product_service import (
+    ProductService,
+    brand_setup_mapping,
+    nike_driver_pool,
+    nike_api_client,
+    adidas_api_client,
+    adidas_driver_pool,
+    scraper_breakers,
+    price_change_stream,
+)
+from .scraping.selenium_scrapers import grid_scheduler
 
 
 class ShoeSearchView(generics.ListAPIView):
@@ -34,6 +59,7 @@ class ShoeSearchView(generics.ListAPIView):
         keyword = self.request.query_params.get(
             "keyword", None
         )  # Can be multiple keywords
+        size = self.request.query_params.get("size", None)  # Can be multiple sizes
 
         # Initialize the base Elasticsearch query
         elasticsearch_query = Q(
@@ -70,6 +96,11 @@ class ShoeSearchView(generics.ListAPIView):
             keyword_queries = [Q("match", description=kw.strip()) for kw in keywords]
             elasticsearch_query &= Q("bool", must=keyword_queries)
 
+        # Apply the size filter, any of the given sizes has to be in stock
+        if size:
+            sizes = [value.strip() for value in size.split(",") if value.strip()]
+            elasticsearch_query &= Q("terms", sizes=sizes)
+
         # Get the authenticated user
         user = self.request.user
         user_profile = UserProfile.objects.get(user=user)
@@ -307,6 +338,52 @@ class ClearUserParsedArticles(APIView):
         return Response(status=status.HTTP_200_OK)
 
 
+def enqueue_scrape_job(request, article, parse_from) -> Response:
+    """Queue a scrape job for the article and answer with its id at once."""
+    parse_from = ProductService.resolve_parse_from(parse_from)
+    if not article or not parse_from:
+        return Response(
+            {"statusText": "article and a valid parse_from are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    job_id, created = ScrapeJobs.enqueue(article, parse_from, request.user.id)
+    return Response(
+        {"job_id": job_id, "article": article, "queued": created},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+class ScrapeJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @rate_limit
+    def post(self, request):
+        """
+        Queue a scrape of the article, the result is pushed over ws/scrape/
+        and can be polled on scrape-jobs/<job_id>.
+        """
+        return enqueue_scrape_job(
+            request, request.data.get("article"), request.data.get("parse_from")
+        )
+
+
+class ScrapeJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        if not ScrapeJobs.is_subscriber(job_id, request.user.id):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        result = AsyncResult(job_id)
+        data = {"job_id": job_id, "state": result.state}
+        if result.successful():
+            data["result"] = result.result
+        elif result.failed():
+            data["result"] = {"status": "error", "error": str(result.result)}
+        return Response(data, status=status.HTTP_200_OK)
+
+
 class ShoeDetailedView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -323,6 +400,11 @@ class ShoeDetailedView(APIView):
         """
         Refresh the shoe data by scraping and updating the database.
         """
+        if request.data.get("async"):
+            return enqueue_scrape_job(
+                request, shoe_article, request.data.get("parse_from")
+            )
+
         new_article, error_response, status_code = ProductService.process_scraping(
             shoe_article, request
         )
@@ -336,6 +418,71 @@ class ShoeDetailedView(APIView):
         return Response(error_response, status=status_code)
 
 
+def get_date_range(query_params):
+    """
+    The ?start= and ?end= dates of a chart request, None when missing.
+    Raises ValueError when either isn't a YYYY-MM-DD date.
+    """
+    start = query_params.get("start")
+    end = query_params.get("end")
+    return (
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None,
+    )
+
+
+INVALID_DATE_RANGE = {"detail": "start and end must be dates as YYYY-MM-DD."}
+
+
+class ShoePriceHistoryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, shoe_article):
+        """
+        Price runs of a shoe for the daily chart, optionally limited to
+        the runs overlapping ?start= through ?end=.
+        """
+        try:
+            start, end = get_date_range(request.query_params)
+        except ValueError:
+            return Response(INVALID_DATE_RANGE, status=status.HTTP_400_BAD_REQUEST)
+
+        shoe = get_object_or_404(Shoe.objects.order_by("pk"), article=shoe_article)
+        runs = shoe.price_history.overlapping(start, end)
+        serializer = ShoePriceHistorySerializer(runs, many=True)
+        return Response(serializer.data)
+
+
+class ShoePriceRollupsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, shoe_article):
+        """
+        Weekly or monthly price rollups of a shoe for charts, optionally
+        limited to the periods starting between ?start= and ?end=.
+        """
+        period = request.query_params.get("period", "week")
+        if period not in dict(ShoePriceRollup.PERIOD_CHOICES):
+            return Response(
+                {"detail": "period must be week or month."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start, end = get_date_range(request.query_params)
+        except ValueError:
+            return Response(INVALID_DATE_RANGE, status=status.HTTP_400_BAD_REQUEST)
+
+        shoe = get_object_or_404(Shoe.objects.order_by("pk"), article=shoe_article)
+        rollups = shoe.price_rollups.filter(period=period)
+        if start:
+            rollups = rollups.filter(period_start__gte=start)
+        if end:
+            rollups = rollups.filter(period_start__lte=end)
+
+        serializer = ShoePriceRollupSerializer(rollups, many=True)
+        return Response(serializer.data)
+
+
 class FetchShoesView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [HttponlyCookieAuthentication]
@@ -382,6 +529,14 @@ class FetchShoesView(APIView):
         brand_map,
     ):
         """Scrape the shoe using API-based and non-API-based scrapers."""
+        if settings.SCRAPING_FANOUT:
+            # all brands start at once, start delays keep API-based first
+            return self.fan_out_scrapers(
+                article,
+                selected_api_based_brands + selected_non_api_based_brands,
+                user_profile,
+            )
+
         successful_scrape = None
 
         # Try API-based scrapers first
@@ -404,10 +559,9 @@ class FetchShoesView(APIView):
             if not setup_class:
                 continue
             try:
-                setup_instance = setup_class(article)
-                parser = setup_instance.initialize_parser()
-                new_article, created = ProductService.get_and_save_product_data(
-                    parser, user_profile, brand
+                product_data = ProductService.scrape_product_data(brand, article)
+                new_article, created = ProductService.save_product_data(
+                    product_data, user_profile, brand
                 )
                 if new_article:
                     return new_article
@@ -416,15 +570,22 @@ class FetchShoesView(APIView):
                 continue
         return None
 
+    def fan_out_scrapers(self, article, brands, user_profile):
+        """Scrape all brands concurrently and save the first match."""
+        product_data, brand, _ = ProductService.scrape_first_match(article, brands)
+        if not product_data:
+            return None
+        new_article, created = ProductService.save_product_data(
+            product_data, user_profile, brand
+        )
+        return new_article
+
     @rate_limit
     def post(self, request) -> Response:
         """
         Fetch or scrape shoe data based on the article and selected brands.
         """
-        brand_map = {
-            "Adidas": AdidasSetup,
-            "Nike": NikeSetup,
-        }
+        brand_map = brand_setup_mapping
 
         user_profile = self.get_user_profile(request)
         article = request.data.get("article")
@@ -441,19 +602,24 @@ class FetchShoesView(APIView):
         if article_data:
             return Response(article_data, status=status_code)
 
+        if request.data.get("async"):
+            return enqueue_scrape_job(request, article, parse_from)
+
         # Filter selected brands into API-based and non-API-based brands
         selected_api_based_brands, selected_non_api_based_brands = self.filter_brands(
             parse_from, brand_map
         )
 
         # Try scraping from the selected brands
-        successful_scrape = self.scrape_brands(
-            article,
-            selected_api_based_brands,
-            selected_non_api_based_brands,
-            user_profile,
-            brand_map,
-        )
+        with timing.timed_scrape(article) as timer:
+            successful_scrape = self.scrape_brands(
+                article,
+                selected_api_based_brands,
+                selected_non_api_based_brands,
+                user_profile,
+                brand_map,
+            )
+            timer.outcome = "scraped" if successful_scrape else "failed"
 
         if successful_scrape:
             serializer = ShoeSerializer(successful_scrape)
@@ -472,11 +638,151 @@ class FetchShoesView(APIView):
         return Response({"article_data": article_data.data})
 
 
+class BatchFetchShoesView(APIView):
+    """
+    Fetch or scrape a list of articles in one request. Known articles
+    are answered from the database, the missing ones are scraped a few
+    at a time. Results are streamed as NDJSON, one line per article in
+    the order they complete.
+    """
+
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [HttponlyCookieAuthentication]
+
+    @rate_limit
+    def post(self, request):
+        articles = request.data.get("articles")
+        parse_from = ProductService.resolve_parse_from(request.data.get("parse_from"))
+
+        if not isinstance(articles, list) or not parse_from:
+            return Response(
+                {"statusText": "articles list and a valid parse_from are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # dedupe, keeping the order they were sent in
+        articles = list(
+            dict.fromkeys(
+                article.strip()
+                for article in articles
+                if isinstance(article, str) and article.strip()
+            )
+        )
+        if not articles or len(articles) > settings.BATCH_SCRAPE_MAX_ARTICLES:
+            return Response(
+                {
+                    "statusText": f"Send between 1 and "
+                                  f"{settings.BATCH_SCRAPE_MAX_ARTICLES} articles"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user_profile = get_user_profile(request)
+        known_shoes = self.get_known_shoes(articles, user_profile)
+        missing_articles = [
+            article for article in articles if article not in known_shoes
+        ]
+
+        response = StreamingHttpResponse(
+            self.stream_results(
+                known_shoes, missing_articles, parse_from, user_profile
+            ),
+            content_type="application/x-ndjson",
+        )
+        # let nginx pass every line on as it comes
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def get_known_shoes(articles, user_profile) -> dict:
+        """Shoes already in the database by article, in one query."""
+        known_shoes = {}
+        for shoe in (
+                Shoe.objects.filter(article__in=articles).order_by("pk")
+        ):
+            known_shoes.setdefault(shoe.article, shoe)
+
+        if known_shoes:
+            Shoe.objects.filter(
+                pk__in=[shoe.pk for shoe in known_shoes.values()]
+            ).update(count=F("count") + 1)
+            user_profile.scraped_articles.add(*known_shoes.values())
+        return known_shoes
+
+    def stream_results(self, known_shoes, missing_articles, parse_from, user_profile):
+        for article, shoe in known_shoes.items():
+            yield self.result_line(
+                {
+                    "article": article,
+                    "status": "found",
+                    "shoe": ShoeSerializer(shoe).data,
+                }
+            )
+
+        if not missing_articles:
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=settings.BATCH_SCRAPE_CONCURRENCY,
+            thread_name_prefix="batch-scrape",
+        )
+        futures = [
+            executor.submit(self.scrape_one, article, parse_from, user_profile)
+            for article in missing_articles
+        ]
+        try:
+            for future in as_completed(futures):
+                yield self.result_line(future.result())
+        finally:
+            # the client may hang up before everything is scraped
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def scrape_one(article, parse_from, user_profile) -> dict:
+        try:
+            shoe, error_response, status_code = ProductService.scrape_article(
+                article, parse_from, user_profile
+            )
+            if shoe:
+                return {
+                    "article": article,
+                    "status": "scraped",
+                    "shoe": ShoeSerializer(shoe).data,
+                }
+            return {
+                "article": article,
+                "status": "error",
+                "error": error_response["statusText"],
+                "status_code": status_code,
+            }
+        except Exception as e:
+            print(f"Batch scrape of {article} failed: {e}")
+            return {
+                "article": article,
+                "status": "error",
+                "error": "Failed to scrape data for the article.",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            }
+        finally:
+            # pool threads are not part of the request cycle, which is
+            # what closes connections otherwise
+            connection.close()
+
+    @staticmethod
+    def result_line(result: dict) -> bytes:
+        return (json.dumps(result, cls=DjangoJSONEncoder) + "\n").encode()
+
+
 class ShoesView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         scraped_articles = Shoe.objects.all()
+        size = request.query_params.get("size")
+        if size:
+            # served by the GIN index on sizes
+            sizes = [value.strip() for value in size.split(",") if value.strip()]
+            scraped_articles = scraped_articles.filter(sizes__overlap=sizes)
         serializer = ShoeSerializer(scraped_articles, many=True)
         return Response(serializer.data)
 
@@ -576,3 +882,50 @@ class UserNotificationPreferencesView(APIView):
             )
 
         return Response(data, status=status.HTTP_200_OK)
+
+
+class ScrapingMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {
+                "driver_pools": {
+                    nike_driver_pool.name: {
+                        # local counts are for the worker serving the request
+                        "local": nike_driver_pool.stats(),
+                        "global": metrics.get_metrics("driver_pool:nike"),
+                    },
+                    adidas_driver_pool.name: {
+                        "local": adidas_driver_pool.stats(),
+                        "global": metrics.get_metrics("driver_pool:adidas"),
+                    },
+                },
+                "selenium_grid": {
+                    **grid_scheduler.stats(),
+                    "global": metrics.get_metrics("grid_scheduler:selenium"),
+                },
+                "selenium_fallbacks": {
+                    "adidas": metrics.get_metrics("selenium_fallback:adidas"),
+                },
+                "circuit_breakers": {
+                    breaker.name: breaker.stats()
+                    for breaker in scraper_breakers.values()
+                },
+                "product_cache": ProductDataCache.stats(),
+                "product_writes": metrics.get_metrics("product_writes"),
+                "price_changes": metrics.get_metrics(
+                    f"price_changes:{price_change_stream.key}"
+                ),
+                "single_flight": metrics.get_metrics("single_flight:scrape"),
+                "api_clients": {
+                    adidas_api_client.name: metrics.get_metrics(
+                        "api_client:adidas"
+                    ),
+                    nike_api_client.name: metrics.get_metrics(
+                        "api_client:nike"
+                    ),
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -12,7 +12,9 @@ interface ArticleInfoComponentProps {
 }
 
 // Helper to safely parse the `sizes` field into an array
-const parseShoeSizes = (sizes: string): string[] => {
+const parseShoeSizes = (sizes: string[] | string): string[] => {
+  // The API returns a list, older cached responses the stringified one
+  if (Array.isArray(sizes)) return sizes;
   try {
     // Replace single quotes with double quotes to make it valid JSON
     const sanitizedSizes = sizes.replace(/'/g, '"');
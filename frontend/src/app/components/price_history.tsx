@@ -1,42 +1,103 @@
-import React, {useState} from 'react';
+import React, {useEffect, useState} from 'react';
 import {Chart} from 'react-google-charts';
 import {MenuItem, Select, ThemeProvider, createTheme} from "@mui/material";
-
-interface PriceHistoryEntry {
-    price: number; // Prices are coming as strings from the backend
-    date_recorded: string; // Dates come as strings from the backend
-}
+import {PriceHistory, PriceRollup} from "@/app/interfaces/interfaces";
 
 interface PriceTrendChartProps {
-    priceHistory: PriceHistoryEntry[];
+    article: string;
 }
 
-const PriceTrendChart = ({priceHistory}: PriceTrendChartProps) => {
-    const [view, setView] = useState<'daily' | 'weekly'>('daily'); // State for view selection
+type ChartView = 'daily' | 'weekly' | 'monthly';
 
-    // Function to aggregate data weekly
-    const aggregateWeeklyData = (data: PriceHistoryEntry[]) => {
-        const weeklyData: {
-            [key: string]: { total: number; count: number }
-        } = {};
+const tooltip = (title: string, lines: string[]) =>
+    `<div style="background-color: black; color: white; padding: 5px; border-radius: 5px;">
+        <strong>${title}</strong><br/>
+        ${lines.join('<br/>')}
+    </div>`; // Custom tooltip with styling
 
-        data.forEach((entry) => {
-            const date = new Date(entry.date_recorded);
-            const weekStart = new Date(date.setDate(date.getDate() - date.getDay())); // Get the start of the week (Sunday)
-            const weekKey = weekStart.toISOString().split('T')[0]; // Use the date as the key in YYYY-MM-DD format
+const PriceTrendChart = ({article}: PriceTrendChartProps) => {
+    const [view, setView] = useState<ChartView>('daily'); // State for view selection
+    const [priceHistory, setPriceHistory] = useState<PriceHistory[] | null>(null);
+    const [rollups, setRollups] = useState<PriceRollup[]>([]);
 
-            if (!weeklyData[weekKey]) {
-                weeklyData[weekKey] = {total: 0, count: 0};
+    // The daily view charts the price runs, loaded apart from the shoe
+    useEffect(() => {
+        const fetchPriceHistory = async () => {
+            try {
+                const response = await fetch(
+                    `https://localhost/api/shoes/${article}/price-history`,
+                    {
+                        method: "GET",
+                        credentials: "include",
+                    },
+                );
+                if (!response.ok) {
+                    throw new Error(`Failed to fetch price history: ${response.statusText}`);
+                }
+                setPriceHistory(await response.json());
+            } catch (error) {
+                console.error("Error fetching price history:", error);
+                setPriceHistory([]);
             }
-            weeklyData[weekKey].total += parseFloat(String(entry.price)); // Add price to the total
-            weeklyData[weekKey].count += 1; // Increment count
-        });
-
-        return Object.entries(weeklyData).map(([date, {total, count}]) => [
-            new Date(date), // Ensure date is a Date object
-            (total / count).toFixed(2), // Calculate average price for the week
-        ] as [Date, string]); // Explicitly define the return type
-    };
+        };
+        fetchPriceHistory();
+    }, [article]);
+
+    // Weekly and monthly views chart the rollups computed by the backend
+    useEffect(() => {
+        if (view === 'daily') return;
+
+        const fetchRollups = async () => {
+            try {
+                const response = await fetch(
+                    `https://localhost/api/shoes/${article}/price-rollups?period=${view === 'weekly' ? 'week' : 'month'}`,
+                    {
+                        method: "GET",
+                        credentials: "include",
+                    },
+                );
+                if (!response.ok) {
+                    throw new Error(`Failed to fetch price rollups: ${response.statusText}`);
+                }
+                setRollups(await response.json());
+            } catch (error) {
+                console.error("Error fetching price rollups:", error);
+                setRollups([]);
+            }
+        };
+        fetchRollups();
+    }, [article, view]);
+
+    // Every entry is a price that held until the next one, it is drawn
+    // from its first to its last day so the line steps between prices
+    const dailyPoints = (priceHistory ?? []).flatMap((entry) => {
+        const price = parseFloat(String(entry.price));
+        const start = new Date(entry.date_recorded);
+        const end = entry.valid_to ? new Date(entry.valid_to) : new Date();
+        if (entry.valid_to) {
+            end.setDate(end.getDate() - 1);
+        }
+        const label = `Price: $${price.toFixed(2)}`;
+        return [start, end]
+            .filter((date, index) => index === 0 || date > start)
+            .map((date) => [date, price, tooltip(date.toLocaleDateString(), [label])]);
+    });
+
+    const rollupPoints = rollups.map((rollup) => {
+        const date = new Date(rollup.period_start);
+        return [
+            date,
+            parseFloat(rollup.close_price),
+            tooltip(
+                `${view === 'weekly' ? 'Week' : 'Month'} of ${date.toLocaleDateString()}`,
+                [
+                    `Close: $${parseFloat(rollup.close_price).toFixed(2)}`,
+                    `Low: $${parseFloat(rollup.min_price).toFixed(2)}`,
+                    `High: $${parseFloat(rollup.max_price).toFixed(2)}`,
+                ],
+            ),
+        ];
+    });
 
     // Prepare the data for the Google Chart based on the selected view
     const chartData = [
@@ -45,26 +106,7 @@ const PriceTrendChart = ({priceHistory}: PriceTrendChartProps) => {
             type: 'string',
             p: {html: true}
         }], // Chart headers
-        ...(view === 'daily'
-            ? priceHistory.map((entry) => {
-                const date = new Date(entry.date_recorded);
-                return [
-                    date,
-                    parseFloat(String(entry.price)),
-                    `<div style="background-color: black; color: white; padding: 5px; border-radius: 5px;">
-                        <strong>${date.toLocaleDateString()}</strong><br/>
-                        Price: $${parseFloat(String(entry.price)).toFixed(2)}
-                    </div>`, // Custom tooltip with styling
-                ]; // Tooltip with date and price
-            })
-            : aggregateWeeklyData(priceHistory).map(([date, avgPrice]) => [
-                date,
-                parseFloat(avgPrice),
-                `<div style="background-color: black; color: white; padding: 5px; border-radius: 5px;">
-                    <strong>Week of ${date.toLocaleDateString()}</strong><br/>
-                    Avg Price: $${parseFloat(avgPrice).toFixed(2)}
-                </div>`, // Custom tooltip for weekly average
-            ] as [Date, number, string])) // Explicitly define the return type
+        ...(view === 'daily' ? dailyPoints : rollupPoints),
     ];
 
     const options = {
@@ -72,7 +114,7 @@ const PriceTrendChart = ({priceHistory}: PriceTrendChartProps) => {
         titleTextStyle: {color: 'white'}, // Set title color to white
         hAxis: {
             title: 'Date',
-            format: view === 'daily' ? 'MMM d, yyyy' : 'MMM d', // Format based on view
+            format: view === 'monthly' ? 'MMM yyyy' : view === 'daily' ? 'MMM d, yyyy' : 'MMM d', // Format based on view
             gridlines: {color: '#888'}, // Gray grid lines
             textStyle: {color: 'white'}, // Set axis label color to white
             titleTextStyle: {color: 'white'}, // Set hAxis title color to white
@@ -84,7 +126,7 @@ const PriceTrendChart = ({priceHistory}: PriceTrendChartProps) => {
             titleTextStyle: {color: 'white'}, // Set vAxis title color to white
         },
         legend: 'none',
-        curveType: 'function', // Smooth out the line
+        curveType: 'none', // Prices change in steps
         backgroundColor: {
             fill: 'rgb(17, 19, 19)',
             stroke: 'none',
@@ -100,13 +142,20 @@ const PriceTrendChart = ({priceHistory}: PriceTrendChartProps) => {
         },
     });
 
+    if (priceHistory === null) {
+        return null;
+    }
+    if (priceHistory.length === 0) {
+        return <p className="pb-10">No price history available for this shoe.</p>;
+    }
+
     return (
         <ThemeProvider theme={darkTheme}>
             <div className="w-full">
                 <div className="flex justify-between mt-4 pl-24">
                     <Select
                         value={view}
-                        onChange={(event) => setView(event.target.value as 'daily' | 'weekly')}
+                        onChange={(event) => setView(event.target.value as ChartView)}
                         variant="outlined"
                         sx={{
                             width: 150,
@@ -130,6 +179,7 @@ const PriceTrendChart = ({priceHistory}: PriceTrendChartProps) => {
                     >
                         <MenuItem value="daily">Daily View</MenuItem>
                         <MenuItem value="weekly">Weekly View</MenuItem>
+                        <MenuItem value="monthly">Monthly View</MenuItem>
                     </Select>
 
                 </div>
@@ -23,7 +23,8 @@ interface ShoeItemProps {
   desiredPrices: DesiredPrice[];
 }
 
-const parseShoeSizes = (sizes: string): string[] => {
+const parseShoeSizes = (sizes: string[] | string): string[] => {
+  if (Array.isArray(sizes)) return sizes;
   try {
     const sanitizedSizes = sizes.replace(/'/g, '"');
     const parsedSizes = JSON.parse(sanitizedSizes);
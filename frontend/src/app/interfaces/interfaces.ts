@@ -22,7 +22,6 @@ export interface ClickOutsideRefInterface {
 export interface Shoe {
   sale_price: string;
   parsed_from: string;
-  price_history: PriceHistory[];
   description: string;
   id: number;
   name: string;
@@ -30,12 +29,22 @@ export interface Shoe {
   url: string;
   image: string;
   article: string;
-  sizes: string;
+  sizes: string[];
 }
 
 export interface PriceHistory {
   price: number;
   date_recorded: string;
+  valid_from: string;
+  valid_to: string | null;
+}
+
+export interface PriceRollup {
+  period: "week" | "month";
+  period_start: string;
+  min_price: string;
+  max_price: string;
+  close_price: string;
 }
 
 export interface NumericInputProps {
@@ -2,7 +2,8 @@ import { toast } from "react-toastify";
 import React, { useState } from "react";
 import { NumericInputProps } from "../interfaces/interfaces";
 
-export const parseSizes = (sizes: string): string[] => {
+export const parseSizes = (sizes: string[] | string): string[] => {
+  if (Array.isArray(sizes)) return sizes;
   try {
     return JSON.parse(sizes.replace(/'/g, '"'));
   } catch (e) {
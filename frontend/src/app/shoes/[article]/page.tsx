@@ -202,11 +202,7 @@ const ShoeDetailPage = ({ params }: ShoeDetailPageProps) => {
           </div>
           <div className="mt-8">
             <h2 className="text-2xl font-bold mb-8">Price History</h2>
-            {shoe.price_history.length > 0 ? (
-              <PriceTrendChart priceHistory={shoe.price_history} />
-            ) : (
-              <p className="pb-10">No price history available for this shoe.</p>
-            )}
+            <PriceTrendChart article={article} />
           </div>
 
           {/* Refresh Icon (extra spinner for refresh action) */}
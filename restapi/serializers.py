@@ -1,22 +1,32 @@
 from rest_framework import serializers
 
 import core.models  # noqa: F401
-from core.models import Shoe, ShoePriceHistory, ShoesNews
+from core.models import Shoe, ShoePriceHistory, ShoePriceRollup, ShoesNews
 from members.models import CustomUser, UserProfile, ShoeNotificationPreference
 
 
 class ShoePriceHistorySerializer(serializers.ModelSerializer):
+    # the day the price was first recorded, as the price chart reads it
+    date_recorded = serializers.DateField(source="valid_from", read_only=True)
+
     class Meta:
         model = ShoePriceHistory
-        fields = ["price", "date_recorded"]
+        fields = ["price", "date_recorded", "valid_from", "valid_to"]
 
 
-class ShoeSerializer(serializers.ModelSerializer):
-    price_history = ShoePriceHistorySerializer(many=True, read_only=True)
+class ShoePriceRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShoePriceRollup
+        fields = ["period", "period_start", "min_price", "max_price", "close_price"]
 
+
+class ShoeSerializer(serializers.ModelSerializer):
+    # the price history isn't nested, the charts read it from
+    # shoes/<article>/price-history and /price-rollups
     class Meta:
         model = Shoe
-        fields = "__all__"
+        # the fingerprint of the last scrape is internal to ProductService
+        exclude = ["content_hash"]
 
 
 class ShoesNewsSerializer(serializers.ModelSerializer):